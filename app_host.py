@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Single-process host for all Hotel Bey services.
+
+Imports the six Flask apps into one interpreter and serves them from one
+thread pool. A dispatcher routes each request to the app that declares the
+route, without rewriting the path, so every URL stays what it is today:
+
+    /api/booking/...        BeyBooking      /api/payments/...    BeyPayment
+    /api/clients/...        BeyClient       /api/restaurant/...  BeyResto
+    /api/invoices/...       BeyAccounting   /api/rooms/...       BeyRooms
+
+The combined port answers /api/health and /api/ready for the whole host.
+Unless --single-port is given, each app's usual port is bound too. Those
+ports are served by the same pool and reach only that app, so callers that
+use the per-service ports keep working unchanged.
+
+Long-lived responses (change-feed streams, long polls) hold a pool thread
+while open; size --threads for them.
+
+Usage:
+    python app_host.py                    # :5000 plus the per-service ports
+    python app_host.py --single-port      # :5000 only
+    python app_host.py --threads 64
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Set, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "services"))
+
+from flask import Flask, jsonify
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map, Rule
+from werkzeug.serving import BaseWSGIServer
+
+DEFAULT_PORT = 5000
+DEFAULT_THREADS = 32
+
+# (name, module, port it binds when run on its own)
+APPS = [
+    ("BeyBooking", "booking_service", 5001),
+    ("BeyClient", "client_service", 5002),
+    ("BeyAccounting", "accounting_service", 5006),
+    ("BeyPayment", "payment_service", 5007),
+    ("BeyResto", "restaurant_service", 5008),
+    ("BeyRooms", "room_service", 5009),
+]
+
+# Background jobs a service starts in its __main__ block
+ON_START = {
+    "payment_service": lambda module: module.start_settlement_job(module.ledger, module.SETTLEMENT_INTERVAL_SECONDS),
+}
+
+
+class Dispatcher:
+    """WSGI app that hands each request to the app owning its route, path unchanged"""
+
+    def __init__(self, apps: Dict[str, Flask], fallback: Flask):
+        self.apps = apps
+        self.fallback = fallback
+        owners: Dict[str, Set[str]] = {}
+        for name, app in apps.items():
+            for rule in app.url_map.iter_rules():
+                owners.setdefault(rule.rule, set()).add(name)
+        # Routes every app declares (health, readiness, static) stay with the host
+        self.map = Map([Rule(path, endpoint=next(iter(names))) for path, names in owners.items() if len(names) == 1])
+
+    def __call__(self, environ, start_response):
+        adapter = self.map.bind_to_environ(environ)
+        try:
+            name, _ = adapter.match()
+        except HTTPException:
+            return self.fallback(environ, start_response)
+        return self.apps[name](environ, start_response)
+
+
+def host_app(apps: Dict[str, Flask]) -> Flask:
+    """Host-level health and readiness; readiness aggregates every app's /api/ready"""
+    host = Flask("app_host")
+
+    @host.route('/api/health', methods=['GET'])
+    def health():
+        return jsonify({'status': 'ok', 'service': 'AppHost', 'pid': os.getpid(), 'apps': sorted(apps)})
+
+    @host.route('/api/ready', methods=['GET'])
+    def ready():
+        results = {name: app.test_client().get('/api/ready') for name, app in apps.items()}
+        is_ready = all(response.status_code == 200 for response in results.values())
+        response = jsonify({'status': 'ready' if is_ready else 'not_ready', 'service': 'AppHost',
+                            'apps': {name: r.get_json() for name, r in results.items()}})
+        response.status_code = 200 if is_ready else 503
+        return response
+
+    @host.errorhandler(404)
+    def not_found(_e):
+        return jsonify({'error': 'Not found'}), 404
+
+    return host
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server that handles connections on a shared thread pool"""
+
+    def __init__(self, host: str, port: int, app, pool: ThreadPoolExecutor):
+        super().__init__(host, port, app)
+        self.pool = pool
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def load_apps() -> Tuple[Dict[str, Flask], Dict[str, int]]:
+    apps, ports = {}, {}
+    for name, module_name, port in APPS:
+        module = importlib.import_module(module_name)
+        if module_name in ON_START:
+            ON_START[module_name](module)
+        apps[name] = module.app
+        ports[name] = port
+    return apps, ports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve all Hotel Bey services from one process")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Combined port")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="Shared request threads")
+    parser.add_argument("--single-port", action="store_true", help="Do not bind the per-service ports")
+    args = parser.parse_args()
+
+    apps, ports = load_apps()
+    pool = ThreadPoolExecutor(max_workers=args.threads, thread_name_prefix="app-host")
+    servers = [PooledWSGIServer(args.host, args.port, Dispatcher(apps, host_app(apps)), pool)]
+    if not args.single_port:
+        servers += [PooledWSGIServer(args.host, ports[name], app, pool) for name, app in apps.items()]
+
+    print(f"Hotel Bey app host: {len(apps)} apps, {args.threads} threads")
+    print(f"  combined  http://{args.host}:{args.port}")
+    if not args.single_port:
+        for name, port in ports.items():
+            print(f"  {name:13} http://{args.host}:{port}")
+
+    for server in servers[1:]:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        servers[0].serve_forever()
+    except KeyboardInterrupt:
+        print("\nApp host stopped.")
+    finally:
+        for server in servers:
+            server.server_close()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Static cross-check of the BPMN models against the registered job workers.
+
+Reports:
+  - task types used in a model with no registered handler (jobs would sit
+    until they time out),
+  - handlers registered for task types that no model uses,
+  - variables read by gateways or handlers that nothing writes,
+  - optionally, a critical-path latency estimate per process from recorded
+    per-task timings.
+
+Handlers are found by reading the worker modules with `ast`, nothing is
+imported or connected. A handler's outputs are the keys of the dicts it
+returns, or its declared outputs=[...] when registered on a ProjectingWorker.
+A fused_task(...) composite reads what its steps read, minus what earlier
+steps write, and writes what its steps write.
+
+Usage:
+    python bpmn_analyzer.py
+    python bpmn_analyzer.py --timings task_timings.json --hop-ms 15
+    python bpmn_analyzer.py --json --strict
+"""
+
+import argparse
+import ast
+import glob
+import json
+import os
+import re
+import sys
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, List, Optional, Set
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_WORKER_MODULES = ["workers.py", "complaint_workers.py", "zeebe_job_worker.py"]
+
+BPMN_NS = "{http://www.omg.org/spec/BPMN/20100524/MODEL}"
+ZEEBE_NS = "{http://camunda.org/schema/zeebe/1.0}"
+
+# Variables each process is started with (see camunda8_client.py, quick_test.py, run_demo.py)
+START_VARIABLES = {
+    "HotelReservationProcess": {"first_name", "last_name", "email", "phone", "check_in", "check_out", "guests", "room_type"},
+    "ClientCreationProcess": {"first_name", "last_name", "email", "phone"},
+    "BookingQueryProcess": {"booking_id"},
+    "ClientHistoryProcess": {"client_id"},
+    "ComplaintHandlingProcess": {"client_id", "room_id", "description"},
+}
+START_VARIABLES["HotelReservationProcessFused"] = START_VARIABLES["HotelReservationProcess"]
+START_VARIABLES["ComplaintHandlingProcessFused"] = START_VARIABLES["ComplaintHandlingProcess"]
+
+FEEL_KEYWORDS = {"true", "false", "null", "and", "or", "not", "in", "if", "then", "else",
+                 "for", "some", "every", "satisfies", "return", "between", "instance", "of"}
+
+
+def feel_variables(expression: str) -> Set[str]:
+    """Top-level variable names referenced by a FEEL expression"""
+    expression = re.sub(r'"(?:[^"\\]|\\.)*"', "", expression.lstrip("="))
+    names = set()
+    for match in re.finditer(r"(?<![\w.])([A-Za-z_][\w]*)", expression):
+        name = match.group(1)
+        end = match.end()
+        if name in FEEL_KEYWORDS or expression[end:end + 1] == "(":
+            continue
+        names.add(name)
+    return names
+
+
+# --- Models ---
+
+class Node:
+    def __init__(self, node_id: str, kind: str, name: str = ""):
+        self.id = node_id
+        self.kind = kind
+        self.name = name
+        self.task_type: Optional[str] = None
+        self.reads: Set[str] = set()
+        self.writes: Set[str] = set()
+        self.multi_instance = False
+        self.outgoing: List[str] = []
+
+
+class ProcessModel:
+    def __init__(self, process_id: str, file_name: str):
+        self.id = process_id
+        self.file_name = file_name
+        self.nodes: Dict[str, Node] = {}
+        self.conditions: List[Dict[str, Any]] = []
+
+    @property
+    def service_tasks(self) -> List[Node]:
+        return [n for n in self.nodes.values() if n.task_type]
+
+
+def parse_models(paths: List[str]) -> List[ProcessModel]:
+    models = []
+    for path in paths:
+        root = ET.parse(path).getroot()
+        for process in root.iter(f"{BPMN_NS}process"):
+            model = ProcessModel(process.get("id"), os.path.basename(path))
+            for element in process:
+                kind = element.tag.replace(BPMN_NS, "")
+                if kind == "sequenceFlow":
+                    continue
+                if element.get("id") is None:
+                    continue
+                node = Node(element.get("id"), kind, element.get("name", ""))
+                task_def = element.find(f".//{ZEEBE_NS}taskDefinition")
+                if task_def is not None:
+                    node.task_type = task_def.get("type")
+                for mapping in element.findall(f".//{ZEEBE_NS}input"):
+                    node.reads |= feel_variables(mapping.get("source", ""))
+                for mapping in element.findall(f".//{ZEEBE_NS}output"):
+                    node.writes.add(mapping.get("target", "").split(".")[0])
+                loop = element.find(f".//{ZEEBE_NS}loopCharacteristics")
+                if loop is not None or element.find(f"{BPMN_NS}multiInstanceLoopCharacteristics") is not None:
+                    node.multi_instance = True
+                if loop is not None:
+                    node.reads |= feel_variables(loop.get("inputCollection", ""))
+                    if loop.get("inputElement"):
+                        node.writes.add(loop.get("inputElement"))
+                    if loop.get("outputCollection"):
+                        node.writes.add(loop.get("outputCollection"))
+                model.nodes[node.id] = node
+            for flow in process.findall(f"{BPMN_NS}sequenceFlow"):
+                source = model.nodes.get(flow.get("sourceRef"))
+                if source is not None:
+                    source.outgoing.append(flow.get("targetRef"))
+                condition = flow.find(f"{BPMN_NS}conditionExpression")
+                if condition is not None and condition.text:
+                    model.conditions.append({
+                        "flow": flow.get("id"),
+                        "expression": condition.text.strip(),
+                        "variables": feel_variables(condition.text.strip()),
+                    })
+            models.append(model)
+    return models
+
+
+# --- Handlers ---
+
+class Handler:
+    def __init__(self, task_type: str, function: str, module: str):
+        self.task_type = task_type
+        self.function = function
+        self.module = module
+        self.required: Set[str] = set()
+        self.optional: Set[str] = set()
+        self.writes: Set[str] = set()
+
+
+def _task_type(call: ast.Call) -> Optional[str]:
+    """task_type of a `<x>.task(task_type="...")` call"""
+    if isinstance(call.func, ast.Attribute) and call.func.attr == "task":
+        for keyword in call.keywords:
+            if keyword.arg == "task_type" and isinstance(keyword.value, ast.Constant):
+                return keyword.value.value
+        if call.args and isinstance(call.args[0], ast.Constant):
+            return call.args[0].value
+    return None
+
+
+def _returned_keys(function: ast.AST) -> Set[str]:
+    """Keys of dict literals returned by a handler, including dicts built up in a local name"""
+    keys: Set[str] = set()
+    dict_names: Set[str] = set()
+    for node in ast.walk(function):
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Dict):
+            dict_names |= {t.id for t in node.targets if isinstance(t, ast.Name)}
+    for node in ast.walk(function):
+        if isinstance(node, ast.Return) and isinstance(node.value, ast.Dict):
+            keys |= {k.value for k in node.value.keys if isinstance(k, ast.Constant)}
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name) and target.id in dict_names and isinstance(node.value, ast.Dict):
+                    keys |= {k.value for k in node.value.keys if isinstance(k, ast.Constant)}
+                elif (isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name)
+                      and target.value.id in dict_names and isinstance(target.slice, ast.Constant)):
+                    keys.add(target.slice.value)
+    return keys
+
+
+def _fill_signature(handler: Handler, function: ast.AST) -> None:
+    args = function.args
+    positional = args.posonlyargs + args.args
+    defaults = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+    params = list(zip(positional, defaults)) + list(zip(args.kwonlyargs, args.kw_defaults))
+    for arg, default in params:
+        annotation = ast.unparse(arg.annotation) if arg.annotation is not None else ""
+        if arg.arg in ("self", "job") or annotation == "Job":
+            continue
+        (handler.optional if default is not None else handler.required).add(arg.arg)
+    handler.writes = _returned_keys(function)
+
+
+def _declared_outputs(call: ast.Call) -> Optional[Set[str]]:
+    """outputs=[...] of a ProjectingWorker registration, if given"""
+    for keyword in call.keywords:
+        if keyword.arg == "outputs" and isinstance(keyword.value, (ast.List, ast.Tuple, ast.Set)):
+            return {e.value for e in keyword.value.elts if isinstance(e, ast.Constant)}
+    return None
+
+
+def _fused_steps(call: ast.Call) -> Optional[List[str]]:
+    """steps=[...] of a `<x>.fused_task(...)` call"""
+    if isinstance(call.func, ast.Attribute) and call.func.attr == "fused_task":
+        for keyword in call.keywords:
+            if keyword.arg == "steps" and isinstance(keyword.value, (ast.List, ast.Tuple)):
+                return [e.value for e in keyword.value.elts if isinstance(e, ast.Constant)]
+    return None
+
+
+def _fuse(task_type: str, steps: List[Handler], module: str, declared: Optional[Set[str]]) -> Handler:
+    handler = Handler(task_type, "+".join(step.function for step in steps), module)
+    for step in steps:
+        handler.required |= step.required - handler.writes
+        handler.optional |= step.optional - handler.writes - handler.required
+        handler.writes |= step.writes
+    handler.writes = declared or handler.writes
+    return handler
+
+
+def find_handlers(paths: List[str]) -> List[Handler]:
+    handlers = []
+    for path in paths:
+        module = os.path.basename(path)
+        with open(path) as f:
+            tree = ast.parse(f.read(), filename=path)
+        functions = {n.name: n for n in ast.walk(tree) if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))}
+        for node in ast.walk(tree):
+            # @worker.task(task_type="...") def handler(...)
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                for decorator in node.decorator_list:
+                    if isinstance(decorator, ast.Call) and _task_type(decorator):
+                        handler = Handler(_task_type(decorator), node.name, module)
+                        _fill_signature(handler, node)
+                        handler.writes = _declared_outputs(decorator) or handler.writes
+                        handlers.append(handler)
+            # worker.task(task_type="...")(handler)
+            elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Call)
+                  and _task_type(node.func) and node.args and isinstance(node.args[0], ast.Name)):
+                handler = Handler(_task_type(node.func), node.args[0].id, module)
+                if node.args[0].id in functions:
+                    _fill_signature(handler, functions[node.args[0].id])
+                handler.writes = _declared_outputs(node.func) or handler.writes
+                handlers.append(handler)
+        # worker.fused_task(task_type="...", steps=[...]), steps registered in the same module
+        by_type = {h.task_type: h for h in handlers if h.module == module}
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Call) and _fused_steps(node) is not None:
+                task_type = next((k.value.value for k in node.keywords if k.arg == "task_type"), None)
+                steps = [by_type[step] for step in _fused_steps(node) if step in by_type]
+                if task_type and steps:
+                    handlers.append(_fuse(task_type, steps, module, _declared_outputs(node)))
+    return handlers
+
+
+# --- Analysis ---
+
+def analyze(models: List[ProcessModel], handlers: List[Handler]) -> Dict[str, Any]:
+    by_type: Dict[str, List[Handler]] = {}
+    for handler in handlers:
+        by_type.setdefault(handler.task_type, []).append(handler)
+    used_types = {task.task_type for model in models for task in model.service_tasks}
+
+    missing = [{"process": model.id, "file": model.file_name, "element": task.id, "task_type": task.task_type}
+               for model in models for task in model.service_tasks if task.task_type not in by_type]
+    unused = [{"task_type": h.task_type, "module": h.module, "function": h.function}
+              for h in handlers if h.task_type not in used_types]
+
+    unwritten = []
+    for model in models:
+        written = set(START_VARIABLES.get(model.id, set()))
+        for task in model.service_tasks:
+            written |= task.writes
+            for handler in by_type.get(task.task_type, []):
+                written |= handler.writes
+        for node in model.nodes.values():
+            written |= node.writes
+
+        reads = []
+        for condition in model.conditions:
+            reads += [(v, f"condition {condition['flow']}", True) for v in condition["variables"]]
+        for task in model.service_tasks:
+            reads += [(v, f"mapping {task.id}", True) for v in task.reads]
+            for handler in by_type.get(task.task_type, []):
+                where = f"{handler.module}:{handler.function}"
+                reads += [(v, where, True) for v in handler.required]
+                reads += [(v, where, False) for v in handler.optional]
+        seen = set()
+        for variable, where, required in reads:
+            if variable not in written and (variable, where) not in seen:
+                seen.add((variable, where))
+                unwritten.append({"process": model.id, "variable": variable, "read_by": where, "required": required})
+
+    coverage = {}
+    for module in sorted({h.module for h in handlers}):
+        registered = {h.task_type for h in handlers if h.module == module}
+        coverage[module] = {
+            model.id: sorted({t.task_type for t in model.service_tasks} - registered)
+            for model in models
+        }
+
+    return {"missing_handlers": missing, "unused_handlers": unused,
+            "unwritten_variables": unwritten, "missing_by_module": coverage}
+
+
+def _task_latency(task_type: str, timings: Dict[str, Any], percentile: float) -> Optional[float]:
+    samples = timings.get(task_type)
+    if samples is None:
+        return None
+    if isinstance(samples, (int, float)):
+        return float(samples)
+    ordered = sorted(float(s) for s in samples)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def critical_path(model: ProcessModel, timings: Dict[str, Any], hop_ms: float = 0.0,
+                  percentile: float = 50.0, loop_cardinality: int = 1) -> Dict[str, Any]:
+    """
+    Longest start-to-end path where each service task costs its recorded
+    latency plus one broker round-trip (hop_ms). Exclusive branches take the
+    slowest branch, i.e. this is a worst-case estimate.
+    """
+    memo: Dict[str, Any] = {}
+    unknown: Set[str] = set()
+
+    def cost(node: Node) -> float:
+        if not node.task_type:
+            return 0.0
+        latency = _task_latency(node.task_type, timings, percentile)
+        if latency is None:
+            unknown.add(node.task_type)
+            latency = 0.0
+        return (latency + hop_ms) * (loop_cardinality if node.multi_instance else 1)
+
+    def longest(node_id: str, visiting: frozenset):
+        if node_id in memo:
+            return memo[node_id]
+        node = model.nodes[node_id]
+        best_ms, best_path = 0.0, []
+        for target in node.outgoing:
+            if target in visiting or target not in model.nodes:
+                continue
+            ms, path = longest(target, visiting | {target})
+            if ms > best_ms or not best_path:
+                best_ms, best_path = ms, path
+        result = (cost(node) + best_ms, [node_id] + best_path)
+        memo[node_id] = result
+        return result
+
+    starts = [n.id for n in model.nodes.values() if n.kind == "startEvent"]
+    total, path = max((longest(s, frozenset([s])) for s in starts), default=(0.0, []))
+    return {
+        "process": model.id,
+        "estimated_ms": round(total, 2),
+        "path": [model.nodes[n].task_type or model.nodes[n].id for n in path],
+        "tasks_without_timings": sorted(unknown),
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print("=" * 60)
+    print("  BPMN / Worker Cross-Check")
+    print("=" * 60)
+
+    print("\nMissing handlers (jobs would wait until timeout):")
+    for item in report["missing_handlers"] or [None]:
+        print(f"  - {item['task_type']} ({item['process']} / {item['element']})" if item else "  none")
+
+    print("\nUnused handlers (no model uses the task type):")
+    for item in report["unused_handlers"] or [None]:
+        print(f"  - {item['task_type']} ({item['module']}:{item['function']})" if item else "  none")
+
+    print("\nVariables read but never written:")
+    for item in report["unwritten_variables"] or [None]:
+        if item:
+            flag = "" if item["required"] else " (optional, has default)"
+            print(f"  - {item['process']}: {item['variable']} <- {item['read_by']}{flag}")
+        else:
+            print("  none")
+
+    print("\nTask types not handled, per worker module:")
+    for module, per_process in report["missing_by_module"].items():
+        gaps = {p: t for p, t in per_process.items() if t}
+        print(f"  {module}: " + ("; ".join(f"{p}: {', '.join(t)}" for p, t in gaps.items()) if gaps else "covers all models"))
+
+    for estimate in report.get("critical_paths", []):
+        print(f"\nCritical path {estimate['process']}: ~{estimate['estimated_ms']} ms")
+        print(f"  {' -> '.join(estimate['path'])}")
+        if estimate["tasks_without_timings"]:
+            print(f"  (no timings for: {', '.join(estimate['tasks_without_timings'])})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-check BPMN models against registered job workers")
+    parser.add_argument("--models", nargs="*", help="BPMN files (default: all *.bpmn in the project)")
+    parser.add_argument("--workers", nargs="*", help=f"Worker modules (default: {', '.join(DEFAULT_WORKER_MODULES)})")
+    parser.add_argument("--timings", help="JSON file: {task_type: ms | [samples in ms]}")
+    parser.add_argument("--percentile", type=float, default=50.0, help="Percentile of the samples to use")
+    parser.add_argument("--hop-ms", type=float, default=0.0, help="Broker activate/complete overhead per task")
+    parser.add_argument("--loop-cardinality", type=int, default=1, help="Assumed size of multi-instance loops")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--strict", action="store_true", help="Exit with status 1 if a handler is missing")
+    args = parser.parse_args()
+
+    model_paths = args.models or sorted(glob.glob(os.path.join(BASE_DIR, "*.bpmn")))
+    worker_paths = args.workers or [os.path.join(BASE_DIR, m) for m in DEFAULT_WORKER_MODULES]
+
+    models = parse_models(model_paths)
+    report = analyze(models, find_handlers(worker_paths))
+
+    if args.timings:
+        with open(args.timings) as f:
+            timings = json.load(f)
+        report["critical_paths"] = [critical_path(m, timings, args.hop_ms, args.percentile, args.loop_cardinality)
+                                    for m in models]
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.strict and report["missing_handlers"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
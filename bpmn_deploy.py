@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+BPMN deployment bundling with a local cache of deployed definitions.
+
+The manager hashes every model, compares the hashes with what was last
+deployed to the same broker, and sends only the changed models in a single
+multi-resource deployment. It also keeps the latest definition key and
+version per process id, which Camunda8Client.start_process uses to pin
+versions without asking the broker.
+
+Usage:
+    python bpmn_deploy.py              # deploy changed *.bpmn files
+    python bpmn_deploy.py --force      # redeploy everything
+    python bpmn_deploy.py --dry-run    # show what would be deployed
+"""
+
+import argparse
+import glob
+import hashlib
+import inspect
+import json
+import os
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_FILE = os.path.join(BASE_DIR, ".zeebe-deployments.json")
+BPMN_NS = "{http://www.omg.org/spec/BPMN/20100524/MODEL}"
+
+
+class BpmnModel:
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self.resource_name = os.path.basename(path)
+        with open(path, "rb") as f:
+            content = f.read()
+        self.content_hash = hashlib.sha256(content).hexdigest()
+        root = ET.fromstring(content)
+        self.process_ids = [p.get("id") for p in root.iter(f"{BPMN_NS}process")
+                            if p.get("isExecutable", "true") == "true"]
+
+
+class DeploymentPlan:
+    def __init__(self, changed: List[BpmnModel], unchanged: List[BpmnModel]):
+        self.changed = changed
+        self.unchanged = unchanged
+
+    @property
+    def changed_paths(self) -> List[str]:
+        return [model.path for model in self.changed]
+
+
+class BpmnDeployManager:
+    def __init__(self, broker: str, cache_file: str = DEFAULT_CACHE_FILE):
+        """
+        Args:
+            broker: Broker address; the cache is kept per broker
+            cache_file: JSON file holding the deployed hashes and versions
+        """
+        self.broker = broker
+        self.cache_file = cache_file
+        self._cache = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.cache_file) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        return data.get(self.broker, {"resources": {}, "processes": {}})
+
+    def _save(self) -> None:
+        try:
+            with open(self.cache_file) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data[self.broker] = self._cache
+        tmp_path = self.cache_file + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.cache_file)
+
+    @staticmethod
+    def discover(paths: Optional[List[str]] = None) -> List[BpmnModel]:
+        """Parse the given models, or every *.bpmn next to this file"""
+        if not paths:
+            paths = sorted(glob.glob(os.path.join(BASE_DIR, "*.bpmn")))
+        return [BpmnModel(path) for path in paths]
+
+    def plan(self, paths: Optional[List[str]] = None, force: bool = False) -> DeploymentPlan:
+        changed, unchanged = [], []
+        resources = self._cache["resources"]
+        for model in self.discover(paths):
+            deployed = resources.get(model.resource_name)
+            if not force and deployed and deployed.get("hash") == model.content_hash:
+                unchanged.append(model)
+            else:
+                changed.append(model)
+        return DeploymentPlan(changed, unchanged)
+
+    def record(self, plan: DeploymentPlan, result) -> None:
+        """
+        Store the outcome of a deploy_resource call for the models in `plan`
+
+        Raises:
+            TypeError: `result` is not a deployment response (e.g. an un-awaited coroutine)
+        """
+        if inspect.isawaitable(result) or not hasattr(result, "key"):
+            raise TypeError(f"not a deployment response: {type(result).__name__}")
+        processes = {}
+        for metadata in getattr(result, "deployments", []):
+            process_id = getattr(metadata, "bpmn_process_id", None)
+            if process_id is None:
+                continue
+            processes[process_id] = {
+                "key": metadata.process_definition_key,
+                "version": metadata.version,
+                "resource": os.path.basename(metadata.resource_name),
+            }
+        self._cache["processes"].update(processes)
+        for model in plan.changed:
+            self._cache["resources"][model.resource_name] = {
+                "hash": model.content_hash,
+                "deployment_key": result.key,
+            }
+        self._save()
+
+    def latest(self, bpmn_process_id: str) -> Optional[Dict[str, Any]]:
+        """Latest deployed {key, version, resource} for a process id, if known"""
+        return self._cache["processes"].get(bpmn_process_id)
+
+    @property
+    def processes(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self._cache["processes"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deploy changed BPMN models to Zeebe")
+    parser.add_argument("paths", nargs="*", help="BPMN files (default: all *.bpmn in the project)")
+    parser.add_argument("--address", default="localhost:26500", help="Zeebe gateway address")
+    parser.add_argument("--force", action="store_true", help="Deploy even if unchanged")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the plan")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        plan = BpmnDeployManager(args.address).plan(args.paths, force=args.force)
+        for model in plan.changed:
+            print(f"  deploy    {model.resource_name} ({', '.join(model.process_ids)})")
+        for model in plan.unchanged:
+            print(f"  unchanged {model.resource_name}")
+        return
+
+    from camunda8_client import Camunda8Client
+
+    client = Camunda8Client(args.address)
+    result = client.deploy_all(args.paths, force=args.force)
+    print(f"Deployed: {result['deployed'] or 'nothing (all models unchanged)'}")
+    print(f"Skipped:  {result['skipped']}")
+    for process_id, info in sorted(result["processes"].items()):
+        print(f"  {process_id}: version {info['version']} (key {info['key']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,157 +1,353 @@
-from pyzeebe import ZeebeClient, create_camunda_cloud_client, create_insecure_channel
-from typing import Dict, Any, Optional
-import os
+"""
+Camunda 8 (Zeebe) client for the hotel processes.
 
-class Camunda8Client:
-    def __init__(self, 
+AsyncCamunda8Client is the asyncio API: every call awaits pyzeebe's
+ZeebeClient on a gRPC channel shared by all clients of the same event loop
+and broker, with keepalive pings so idle connections survive NAT/LB idle
+timeouts. One process can therefore keep thousands of engine calls in
+flight over a single HTTP/2 connection.
+
+Calls honour a deadline: the per-call `timeout`, bounded by any enclosing
+`with deadline(seconds):` block, so a caller's remaining time budget carries
+through nested engine calls. A call past its deadline raises TimeoutError
+and the RPC is cancelled.
+
+Camunda8Client is a synchronous facade for existing callers; it runs the
+async client on one background event loop per process.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import grpc
+from pyzeebe import ZeebeClient, create_camunda_cloud_channel, create_insecure_channel
+
+from bpmn_deploy import BpmnDeployManager
+from deadlines import deadline, remaining
+
+# Keepalive: ping every 30s even without calls in flight, give up on a peer after 10s
+CHANNEL_OPTIONS = (
+    ("grpc.keepalive_time_ms", 30_000),
+    ("grpc.keepalive_timeout_ms", 10_000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+)
+DEFAULT_TIMEOUT = 10.0
+DEPLOY_TIMEOUT = 60.0
+
+
+async def _bounded(call: Awaitable, timeout: Optional[float]) -> Any:
+    budget = remaining(timeout)
+    if budget is not None and budget <= 0:
+        if asyncio.iscoroutine(call):
+            call.close()
+        raise TimeoutError("engine call deadline already passed")
+    return await asyncio.wait_for(call, budget)
+
+
+# --- Shared channels: one per event loop and broker ---
+
+_channels: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, Tuple[grpc.aio.Channel, ZeebeClient]]]" = \
+    weakref.WeakKeyDictionary()
+_channels_lock = threading.Lock()
+
+
+def shared_client(key: Tuple, create_channel: Callable[[], grpc.aio.Channel]) -> ZeebeClient:
+    """The ZeebeClient on the running loop's channel for `key`, creating the channel once"""
+    loop = asyncio.get_running_loop()
+    with _channels_lock:
+        per_loop = _channels.setdefault(loop, {})
+        if key not in per_loop:
+            channel = create_channel()
+            per_loop[key] = (channel, ZeebeClient(channel))
+        return per_loop[key][1]
+
+
+async def close_shared_channels() -> None:
+    """Close the channels of the running loop (e.g. on application shutdown)"""
+    with _channels_lock:
+        per_loop = _channels.pop(asyncio.get_running_loop(), {})
+    for channel, _ in per_loop.values():
+        await channel.close()
+
+
+class AsyncCamunda8Client:
+    def __init__(self,
                  zeebe_address: str = "localhost:26500",
                  use_camunda_cloud: bool = False,
                  camunda_cloud_client_id: Optional[str] = None,
                  camunda_cloud_client_secret: Optional[str] = None,
                  camunda_cloud_cluster_id: Optional[str] = None,
-                 camunda_cloud_region: Optional[str] = None):
+                 camunda_cloud_region: Optional[str] = None,
+                 timeout: float = DEFAULT_TIMEOUT):
         """
-        Initialize Camunda 8 client
-        
+        Initialize Camunda 8 client; the channel is opened (or reused) on first use
+
         Args:
             zeebe_address: Zeebe broker address (default: localhost:26500)
             use_camunda_cloud: Whether to use Camunda Cloud
             camunda_cloud_*: Camunda Cloud credentials (if using cloud)
+            timeout: Default per-call timeout in seconds
         """
         if use_camunda_cloud:
-            if not all([camunda_cloud_client_id, camunda_cloud_client_secret, 
-                       camunda_cloud_cluster_id, camunda_cloud_region]):
+            if not all([camunda_cloud_client_id, camunda_cloud_client_secret,
+                        camunda_cloud_cluster_id, camunda_cloud_region]):
                 raise ValueError("Camunda Cloud credentials required when use_camunda_cloud=True")
-            
-            self.client = create_camunda_cloud_client(
+            self._channel_key = ("cloud", camunda_cloud_cluster_id, camunda_cloud_client_id)
+            self._create_channel = lambda: create_camunda_cloud_channel(
                 client_id=camunda_cloud_client_id,
                 client_secret=camunda_cloud_client_secret,
                 cluster_id=camunda_cloud_cluster_id,
-                region=camunda_cloud_region
+                region=camunda_cloud_region,
+                channel_options=CHANNEL_OPTIONS
             )
         else:
-            channel = create_insecure_channel(zeebe_address)
-            self.client = ZeebeClient(channel)
-    
-    def start_process(self, bpmn_process_id: str, variables: Dict[str, Any] = None, version: int = -1) -> Dict[str, Any]:
+            self._channel_key = ("insecure", zeebe_address)
+            self._create_channel = lambda: create_insecure_channel(zeebe_address, channel_options=CHANNEL_OPTIONS)
+
+        broker = f"cloud:{camunda_cloud_cluster_id}" if use_camunda_cloud else zeebe_address
+        self.deployments = BpmnDeployManager(broker)
+        self.timeout = timeout
+
+    @property
+    def client(self) -> ZeebeClient:
+        return shared_client(self._channel_key, self._create_channel)
+
+    async def start_process(self, bpmn_process_id: str, variables: Dict[str, Any] = None, version: int = -1,
+                            pin_version: bool = True, timeout: Optional[float] = None) -> Dict[str, Any]:
         """
         Start a process instance
-        
+
         Args:
             bpmn_process_id: The BPMN process ID (from BPMN file)
             variables: Process variables
             version: Process version (-1 for latest)
-        
+            pin_version: With version=-1, use the version this client last deployed (if known)
+            timeout: Call timeout in seconds (default: the client's)
+
         Returns:
             Process instance result with process_instance_key
         """
-        if variables is None:
-            variables = {}
-        
-        result = self.client.run_process(
+        if version == -1 and pin_version:
+            deployed = self.deployments.latest(bpmn_process_id)
+            if deployed:
+                version = deployed["version"]
+
+        result = await _bounded(self.client.run_process(
             bpmn_process_id=bpmn_process_id,
-            variables=variables,
+            variables=variables or {},
             version=version
-        )
-        
+        ), timeout or self.timeout)
+
         return {
             "process_instance_key": result.process_instance_key,
             "bpmn_process_id": bpmn_process_id,
             "version": result.version
         }
-    
-    def deploy_process(self, bpmn_file_path: str) -> Dict[str, Any]:
+
+    async def deploy_process(self, bpmn_file_path: str, timeout: Optional[float] = None) -> Dict[str, Any]:
         """
         Deploy a BPMN process definition
-        
+
         Args:
             bpmn_file_path: Path to BPMN file
-        
+            timeout: Call timeout in seconds
+
         Returns:
             Deployment result
         """
-        result = self.client.deploy_process(bpmn_file_path)
-        
+        result = await _bounded(self.client.deploy_resource(bpmn_file_path), timeout or DEPLOY_TIMEOUT)
+
         return {
             "key": result.key,
-            "processes": [p.bpmn_process_id for p in result.processes]
+            "processes": [d.bpmn_process_id for d in result.deployments if hasattr(d, "bpmn_process_id")]
+        }
+
+    async def deploy_all(self, bpmn_file_paths: Optional[List[str]] = None, force: bool = False,
+                         timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Deploy every changed BPMN model in one multi-resource deployment
+
+        Args:
+            bpmn_file_paths: Models to consider (default: all *.bpmn in the project)
+            force: Deploy even if the content hash matches the last deployment
+            timeout: Call timeout in seconds
+
+        Returns:
+            Deployed and skipped resource names, and the latest version per process id
+        """
+        plan = self.deployments.plan(bpmn_file_paths, force=force)
+        key = None
+        if plan.changed:
+            result = await _bounded(self.client.deploy_resource(*plan.changed_paths), timeout or DEPLOY_TIMEOUT)
+            self.deployments.record(plan, result)
+            key = result.key
+
+        return {
+            "key": key,
+            "deployed": [m.resource_name for m in plan.changed],
+            "skipped": [m.resource_name for m in plan.unchanged],
+            "processes": self.deployments.processes
         }
-    
-    def cancel_process_instance(self, process_instance_key: int) -> None:
+
+    async def cancel_process_instance(self, process_instance_key: int, timeout: Optional[float] = None) -> None:
         """Cancel a process instance"""
-        self.client.cancel_process_instance(process_instance_key)
-    
-    def publish_message(self, name: str, correlation_key: str, variables: Dict[str, Any] = None, 
-                       time_to_live: int = 60000) -> None:
+        await _bounded(self.client.cancel_process_instance(process_instance_key), timeout or self.timeout)
+
+    async def publish_message(self, name: str, correlation_key: str, variables: Dict[str, Any] = None,
+                              time_to_live: int = 60000, message_id: Optional[str] = None,
+                              timeout: Optional[float] = None) -> None:
         """
         Publish a message to trigger message start events
-        
+
         Args:
             name: Message name
             correlation_key: Correlation key
             variables: Message variables
             time_to_live: TTL in milliseconds
+            message_id: Unique id; the broker rejects duplicates while the first is buffered
+            timeout: Call timeout in seconds
         """
-        if variables is None:
-            variables = {}
-        
-        self.client.publish_message(
+        await _bounded(self.client.publish_message(
             name=name,
             correlation_key=correlation_key,
-            variables=variables,
-            time_to_live=time_to_live
-        )
+            variables=variables or {},
+            time_to_live_in_milliseconds=time_to_live,
+            message_id=message_id
+        ), timeout or self.timeout)
 
 
-class HotelReservationClient:
-    def __init__(self, 
+class _BackgroundLoop:
+    """One event loop in a daemon thread, shared by every synchronous client of the process"""
+
+    _instance: Optional["_BackgroundLoop"] = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="camunda8-client", daemon=True).start()
+
+    @classmethod
+    def get(cls) -> "_BackgroundLoop":
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def run(self, make_call: Callable[[], Awaitable]) -> Any:
+        """Run a coroutine on the loop and wait for it, carrying the caller's deadline over"""
+        budget = remaining()
+
+        async def call():
+            if budget is None:
+                return await make_call()
+            with deadline(budget):
+                return await make_call()
+
+        return asyncio.run_coroutine_threadsafe(call(), self.loop).result()
+
+
+class Camunda8Client:
+    """Synchronous facade over AsyncCamunda8Client; same arguments, blocking methods"""
+
+    def __init__(self, *args, **kwargs):
+        self.aio = AsyncCamunda8Client(*args, **kwargs)
+        self.deployments = self.aio.deployments
+        self._loop = _BackgroundLoop.get()
+
+    def start_process(self, bpmn_process_id: str, variables: Dict[str, Any] = None, version: int = -1,
+                      pin_version: bool = True, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self._loop.run(lambda: self.aio.start_process(bpmn_process_id, variables, version, pin_version, timeout))
+
+    def deploy_process(self, bpmn_file_path: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self._loop.run(lambda: self.aio.deploy_process(bpmn_file_path, timeout))
+
+    def deploy_all(self, bpmn_file_paths: Optional[List[str]] = None, force: bool = False,
+                   timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self._loop.run(lambda: self.aio.deploy_all(bpmn_file_paths, force, timeout))
+
+    def cancel_process_instance(self, process_instance_key: int, timeout: Optional[float] = None) -> None:
+        self._loop.run(lambda: self.aio.cancel_process_instance(process_instance_key, timeout))
+
+    def publish_message(self, name: str, correlation_key: str, variables: Dict[str, Any] = None,
+                        time_to_live: int = 60000, message_id: Optional[str] = None,
+                        timeout: Optional[float] = None) -> None:
+        self._loop.run(lambda: self.aio.publish_message(name, correlation_key, variables, time_to_live,
+                                                        message_id, timeout))
+
+
+def reservation_variables(reservation_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Start variables of HotelReservationProcess"""
+    return {
+        "first_name": reservation_data.get("first_name"),
+        "last_name": reservation_data.get("last_name"),
+        "email": reservation_data.get("email"),
+        "phone": reservation_data.get("phone"),
+        "check_in": reservation_data.get("check_in"),
+        "check_out": reservation_data.get("check_out"),
+        "guests": reservation_data.get("guests", 1),
+        "room_type": reservation_data.get("room_type")
+    }
+
+
+class AsyncHotelReservationClient:
+    def __init__(self,
                  zeebe_address: str = "localhost:26500",
                  use_camunda_cloud: bool = False,
                  **cloud_kwargs):
-        self.camunda = Camunda8Client(zeebe_address, use_camunda_cloud, **cloud_kwargs)
-    
-    def create_reservation(self, reservation_data: Dict[str, Any]) -> Dict[str, Any]:
+        self.camunda = AsyncCamunda8Client(zeebe_address, use_camunda_cloud, **cloud_kwargs)
+
+    async def create_reservation(self, reservation_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a hotel reservation through Camunda 8 process"""
-        variables = {
-            "first_name": reservation_data.get("first_name"),
-            "last_name": reservation_data.get("last_name"),
-            "email": reservation_data.get("email"),
-            "phone": reservation_data.get("phone"),
-            "check_in": reservation_data.get("check_in"),
-            "check_out": reservation_data.get("check_out"),
-            "guests": reservation_data.get("guests", 1),
-            "room_type": reservation_data.get("room_type")
-        }
-        
-        result = self.camunda.start_process("HotelReservationProcess", variables)
+        result = await self.camunda.start_process("HotelReservationProcess", reservation_variables(reservation_data))
         return {
             "process_instance_key": result.get("process_instance_key"),
             "bpmn_process_id": result.get("bpmn_process_id"),
             "status": "started"
         }
-    
-    def get_booking(self, booking_id: str) -> Dict[str, Any]:
+
+    async def get_booking(self, booking_id: str) -> Dict[str, Any]:
         """Get booking details"""
-        variables = {"booking_id": booking_id}
-        result = self.camunda.start_process("BookingQueryProcess", variables)
+        result = await self.camunda.start_process("BookingQueryProcess", {"booking_id": booking_id})
         return {
             "process_instance_key": result.get("process_instance_key"),
             "status": "started"
         }
-    
-    def get_client_history(self, client_id: str) -> Dict[str, Any]:
+
+    async def get_client_history(self, client_id: str) -> Dict[str, Any]:
         """Get client booking history with restaurant orders"""
-        variables = {"client_id": client_id}
-        result = self.camunda.start_process("ClientHistoryProcess", variables)
+        result = await self.camunda.start_process("ClientHistoryProcess", {"client_id": client_id})
         return {
             "process_instance_key": result.get("process_instance_key"),
             "status": "started"
         }
 
 
+class HotelReservationClient:
+    """Blocking HotelReservation API; all instances share the background loop and its channel"""
+
+    def __init__(self,
+                 zeebe_address: str = "localhost:26500",
+                 use_camunda_cloud: bool = False,
+                 **cloud_kwargs):
+        self.aio = AsyncHotelReservationClient(zeebe_address, use_camunda_cloud, **cloud_kwargs)
+        self._loop = _BackgroundLoop.get()
+
+    def create_reservation(self, reservation_data: Dict[str, Any]) -> Dict[str, Any]:
+        return self._loop.run(lambda: self.aio.create_reservation(reservation_data))
+
+    def get_booking(self, booking_id: str) -> Dict[str, Any]:
+        return self._loop.run(lambda: self.aio.get_booking(booking_id))
+
+    def get_client_history(self, client_id: str) -> Dict[str, Any]:
+        return self._loop.run(lambda: self.aio.get_client_history(client_id))
+
+
 if __name__ == "__main__":
     client = HotelReservationClient()
-    
+
     reservation = {
         "first_name": "Jean",
         "last_name": "Dubois",
@@ -162,7 +358,6 @@ if __name__ == "__main__":
         "guests": 2,
         "room_type": "standard"
     }
-    
+
     result = client.create_reservation(reservation)
     print("Reservation Process Started:", result)
-
@@ -1,6 +1,10 @@
 import asyncio
-import requests
-from pyzeebe import ZeebeWorker, create_insecure_channel
+from pyzeebe import Job, create_insecure_channel
+
+import resilience
+from resilience import idempotency_headers, resilience_exception_handler, start_metrics_server
+from services import structured_log
+from task_io import ProjectingWorker
 
 # --- Configuration ---
 # Ports based on the service code you provided:
@@ -9,11 +13,14 @@ CLIENT_SERVICE_URL = "http://localhost:5004/api"
 ACCOUNTING_SERVICE_URL = "http://localhost:5006/api"
 # Mock Maintenance URL (since no code was provided for it)
 MAINTENANCE_SERVICE_URL = "http://localhost:5010/api" 
+METRICS_PORT = 9102
+
+log = structured_log.get_logger("complaint_workers")
 
 # --- Worker Functions ---
 
-def receive_and_log_complaint(client_id: str = "", room_id: str = "", description: str = "", **kwargs):
-    print(f"📝 Logging complaint for Client {client_id} in Room {room_id}")
+def receive_and_log_complaint(job: Job, client_id: str = "", room_id: str = "", description: str = "", **kwargs):
+    log.info("logging complaint", client_id=client_id, room_id=room_id)
     
     payload = {
         "client_id": client_id,
@@ -23,9 +30,10 @@ def receive_and_log_complaint(client_id: str = "", room_id: str = "", descriptio
     }
     
     # Calls the updated ClientService
-    response = requests.post(f"{CLIENT_SERVICE_URL}/complaints/log", json=payload)
+    response = resilience.post("client", f"{CLIENT_SERVICE_URL}/complaints/log", json=payload,
+                               headers=idempotency_headers(job))
     response.raise_for_status()
-    result = response.json()
+    result = resilience.json_body(response)
     
     return {
         "complaint_id": result.get("complaint_id"),
@@ -33,7 +41,7 @@ def receive_and_log_complaint(client_id: str = "", room_id: str = "", descriptio
     }
 
 def classify_and_redirect(complaint_id: str, description: str, **kwargs):
-    print(f"fw Categorizing complaint {complaint_id}...")
+    log.info("classifying complaint", complaint_id=complaint_id)
     
     # Simple logic to classify based on keywords
     category = "general"
@@ -46,7 +54,8 @@ def classify_and_redirect(complaint_id: str, description: str, **kwargs):
     elif "bill" in desc_lower or "money" in desc_lower:
         category = "billing"
         service_target = "payment_service"
-        
+
+    # Pure, so it can be fused; issue-closed records the category on the complaint
     return {
         "category": category,
         "service_target": service_target
@@ -58,7 +67,7 @@ def assess_issue_severity(category: str, description: str, **kwargs):
     if category == "technical":
         severity = "high"
     
-    print(f"⚖️ Issue assessed as: {severity.upper()}")
+    log.info("issue assessed", severity=severity)
     
     return {
         "severity": severity,
@@ -67,15 +76,15 @@ def assess_issue_severity(category: str, description: str, **kwargs):
     }
 
 def redirect_to_other_service(service_target: str, **kwargs):
-    print(f"↪️ Redirecting to external service: {service_target}")
+    log.info("redirecting to service", service_target=service_target)
     # Logic to notify other departments would go here
     return {"redirected": True}
 
 def update_defective_room_status(room_id: str, **kwargs):
-    print(f"🚫 Marking Room {room_id} as Defective/Maintenance")
+    log.info("marking room defective", room_id=room_id)
     
     payload = {"status": "maintenance", "reason": "client_complaint"}
-    response = requests.put(f"{ROOM_SERVICE_URL}/rooms/{room_id}/status", json=payload)
+    response = resilience.put("rooms", f"{ROOM_SERVICE_URL}/rooms/{room_id}/status", json=payload)
     
     # We don't raise error here if room not found, just log it, 
     # but strictly we should check response.status_code
@@ -84,92 +93,105 @@ def update_defective_room_status(room_id: str, **kwargs):
     return {"room_status": "error"}
 
 def execute_immediate_repair(room_id: str, description: str, **kwargs):
-    print(f"🛠️ Dispatching Maintenance team to Room {room_id} for: {description}")
+    log.info("dispatching maintenance", room_id=room_id, description=description)
     # Mocking a call to a maintenance service
-    # requests.post(f"{MAINTENANCE_SERVICE_URL}/tickets/create", ...)
+    # resilience.post("maintenance", f"{MAINTENANCE_SERVICE_URL}/tickets/create", ...)
     return {"repair_ticket_created": True}
 
 def check_room_availability_for_relocation(room_id: str, **kwargs):
     # First, get the type of the current room
-    room_resp = requests.get(f"{ROOM_SERVICE_URL}/rooms/{room_id}")
+    room_resp = resilience.get("rooms", f"{ROOM_SERVICE_URL}/rooms/{room_id}")
     current_type = "standard"
     if room_resp.status_code == 200:
-        current_type = room_resp.json().get('type', 'standard')
+        current_type = resilience.json_body(room_resp).get('type', 'standard')
 
     # Check for available rooms of same type
-    response = requests.get(f"{ROOM_SERVICE_URL}/rooms/available")
-    available_rooms = response.json()
+    response = resilience.get("rooms", f"{ROOM_SERVICE_URL}/rooms/available")
+    available_rooms = resilience.json_body(response)
     
     # Find a different room of similar type
     candidates = [r for r in available_rooms if r['type'] == current_type and r['id'] != room_id]
     
     if candidates:
-        print(f"✅ Found replacement room: {candidates[0]['id']}")
+        log.info("replacement room found", new_room_id=candidates[0]['id'])
         return {"new_room_available": True, "new_room_id": candidates[0]['id']}
     
-    print("❌ No replacement rooms available.")
+    log.warning("no replacement room available")
     return {"new_room_available": False, "new_room_id": None}
 
 def initiate_guest_relocation(client_id: str, room_id: str, **kwargs):
-    print(f"bellhop Initiating relocation protocol for Guest {client_id} from {room_id}")
+    log.info("initiating relocation", client_id=client_id, room_id=room_id)
     return {"relocation_initiated": True}
 
 def assign_new_room_to_guest(client_id: str, new_room_id: str, **kwargs):
     if not new_room_id:
         return {"relocation_success": False}
         
-    print(f"🔑 Assigning Key for Room {new_room_id} to Guest {client_id}")
+    log.info("assigning new room", new_room_id=new_room_id, client_id=client_id)
     
     payload = {"client_id": client_id, "room_id": new_room_id}
-    response = requests.post(f"{ROOM_SERVICE_URL}/rooms/assign", json=payload)
+    response = resilience.post("rooms", f"{ROOM_SERVICE_URL}/rooms/assign", json=payload)
     
     return {"relocation_success": response.status_code == 200}
 
-def propose_compensation(client_id: str, severity: str, **kwargs):
+def propose_compensation(job: Job, client_id: str, severity: str, **kwargs):
     amount = 0
     if severity == "high":
         amount = 100 # 100$ voucher
     elif severity == "medium":
         amount = 50
         
-    print(f"💰 Proposing compensation of ${amount} for Guest {client_id}")
+    log.info("proposing compensation", amount=amount, client_id=client_id)
     
     # Using Accounting Service
     payload = {"client_id": client_id, "amount": amount, "reason": "complaint_compensation"}
-    requests.post(f"{ACCOUNTING_SERVICE_URL}/compensation/create", json=payload)
+    resilience.post("accounting", f"{ACCOUNTING_SERVICE_URL}/compensation/create", json=payload,
+                    headers=idempotency_headers(job))
+
+    # Compensation also earns loyalty points; the source makes a retried job count once
+    if amount > 0:
+        accrual = {"client_id": client_id, "kind": "compensation", "amount": amount,
+                   "source": f"compensation:{job.process_instance_key}"}
+        resilience.post("client", f"{CLIENT_SERVICE_URL}/loyalty/accruals", json={"accruals": [accrual]})
     
     return {"compensation_amount": amount, "compensation_offered": True}
 
-def issue_closed(complaint_id: str, **kwargs):
-    print(f"🏁 Closing Complaint Ticket {complaint_id}")
-    
-    requests.put(f"{CLIENT_SERVICE_URL}/complaints/{complaint_id}/close")
+def issue_closed(complaint_id: str, category: str = "", **kwargs):
+    log.info("closing complaint", complaint_id=complaint_id, category=category)
+
+    # Closing also records the triage category (feeds the complaint KPIs)
+    response = resilience.put("client", f"{CLIENT_SERVICE_URL}/complaints/{complaint_id}/close",
+                              json={"category": category} if category else None)
+    response.raise_for_status()
     return {"process_status": "closed"}
 
 # --- Main Execution ---
 
 async def main():
     channel = create_insecure_channel(grpc_address="localhost:26500")
-    worker = ZeebeWorker(channel)
+    worker = ProjectingWorker(channel, exception_handler=resilience_exception_handler)
+    start_metrics_server(METRICS_PORT)
     
-    # Mapping tasks to BPMN Service Task Types
-    worker.task(task_type="receive-log-complaint")(receive_and_log_complaint)
-    worker.task(task_type="classify-redirect")(classify_and_redirect)
-    worker.task(task_type="assess-severity")(assess_issue_severity)
-    worker.task(task_type="redirect-service")(redirect_to_other_service)
+    # Mapping tasks to BPMN Service Task Types (only the listed outputs reach the process)
+    worker.task(task_type="receive-log-complaint", outputs=["complaint_id"])(receive_and_log_complaint)
+    worker.task(task_type="classify-redirect", outputs=["category", "service_target"], fusable=True)(classify_and_redirect)
+    worker.task(task_type="assess-severity", outputs=["severity"], fusable=True)(assess_issue_severity)
+    worker.fused_task(task_type="triage-complaint", steps=["classify-redirect", "assess-severity"])
+    worker.task(task_type="redirect-service", outputs=["redirected"])(redirect_to_other_service)
     
-    worker.task(task_type="update-defective-status")(update_defective_room_status)
-    worker.task(task_type="execute-repair")(execute_immediate_repair)
+    worker.task(task_type="update-defective-status", outputs=["room_status"])(update_defective_room_status)
+    worker.task(task_type="execute-repair", outputs=["repair_ticket_created"])(execute_immediate_repair)
     
-    worker.task(task_type="initiate-relocation")(initiate_guest_relocation)
-    worker.task(task_type="check-relocation-availability")(check_room_availability_for_relocation)
-    worker.task(task_type="assign-new-room")(assign_new_room_to_guest)
+    worker.task(task_type="initiate-relocation", outputs=["relocation_initiated"])(initiate_guest_relocation)
+    worker.task(task_type="check-relocation-availability", outputs=["new_room_available", "new_room_id"])(check_room_availability_for_relocation)
+    worker.task(task_type="assign-new-room", outputs=["relocation_success"])(assign_new_room_to_guest)
     
-    worker.task(task_type="propose-compensation")(propose_compensation)
-    worker.task(task_type="issue-closed")(issue_closed)
+    worker.task(task_type="propose-compensation", outputs=["compensation_amount"])(propose_compensation)
+    worker.task(task_type="issue-closed", outputs=["process_status"])(issue_closed)
 
-    print("🚀 Complaint Handling Workers running...")
-    await worker.work()
+    log.info("complaint workers running")
+    # Drains on SIGTERM/Ctrl+C: in-flight jobs finish or go straight back to the broker
+    await worker.serve()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
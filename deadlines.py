@@ -0,0 +1,51 @@
+"""
+Deadlines that follow a unit of work through nested calls.
+
+A deadline is a point on the monotonic clock held in a context variable, so it
+reaches coroutines, tasks and asyncio.to_thread() workers started from the
+same context. Engine calls (camunda8_client) and downstream HTTP calls
+(resilience) cap their own timeouts with remaining(); job workers bind the
+job's lock expiry (task_io.bind_job) so no call outlives the job.
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The enclosing deadline passed; the work it bounded is no longer wanted"""
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """Bound every call in the block (and nested blocks) to finish within `seconds`"""
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(current, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def bind(at: float) -> None:
+    """Set the deadline of the current context to the monotonic time `at`, for the rest of the task"""
+    _deadline.set(at)
+
+
+def remaining(timeout: Optional[float] = None) -> Optional[float]:
+    """Seconds left for a call: `timeout`, capped by the enclosing deadline (None: unbounded)"""
+    at = _deadline.get()
+    if at is None:
+        return timeout
+    left = at - time.monotonic()
+    return left if timeout is None else min(timeout, left)
+
+
+def expired() -> bool:
+    at = _deadline.get()
+    return at is not None and time.monotonic() >= at
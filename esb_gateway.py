@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the WSO2 ESB.
+
+Loads the Synapse API definitions from esb-camunda-integration.xml and serves
+them on :8280 with the same routing, call chaining and payload mapping
+(log, property, payloadFactory, call, clone, respond), so full flows can run
+and be benchmarked without a Micro Integrator.
+
+Extras for performance runs:
+  --latency ROUTE=MS        add artificial mediation latency to a route
+  --stub-hq [MS]            answer the HQ (hq.hotelbey.local) calls in-process
+  --endpoint-map FROM=TO    rewrite backend URL prefixes
+Per-route counters, with ESB time separated from backend time, are served on
+GET /_esb/metrics.
+
+Usage:
+    python esb_gateway.py --stub-hq
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import requests
+
+from services import structured_log
+
+SYNAPSE_NS = "{http://ws.apache.org/ns/synapse}"
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "esb-camunda-integration.xml")
+HQ_PREFIX = "http://hq.hotelbey.local:8080"
+STUB_PREFIX = "stub://"
+
+log = structured_log.get_logger("esb")
+
+REASONS = {200: "OK", 201: "Created", 202: "Accepted", 204: "No Content", 400: "Bad Request",
+           404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error", 502: "Bad Gateway"}
+
+
+# --- Synapse expression helpers ---
+
+def json_path(payload: Any, expression: str) -> Any:
+    """Minimal JSONPath: $, $.a.b, $.items[0].id"""
+    expression = expression.strip()
+    if expression.startswith("json-eval(") and expression.endswith(")"):
+        expression = expression[len("json-eval("):-1]
+    if expression == "$":
+        return payload
+    if not expression.startswith("$."):
+        return None
+    value = payload
+    for part in re.findall(r"[^.\[\]]+|\[\d+\]", expression[2:]):
+        if part.startswith("["):
+            index = int(part[1:-1])
+            value = value[index] if isinstance(value, list) and index < len(value) else None
+        else:
+            value = value.get(part) if isinstance(value, dict) else None
+        if value is None:
+            return None
+    return value
+
+
+class MessageContext:
+    def __init__(self, method: str, path: str, payload: Any):
+        self.method = method
+        self.path = path
+        self.payload = payload
+        self.status = 200
+        self.properties: Dict[str, Any] = {}
+        self.backend_ms = 0.0
+
+    def evaluate(self, expression: str) -> Any:
+        match = re.match(r"get-property\('([^']+)'\)", expression.strip())
+        if match:
+            name = match.group(1)
+            if name == "SYSTEM_DATE":
+                return datetime.now().isoformat()
+            return self.properties.get(name)
+        return json_path(self.payload, expression)
+
+    def fork(self) -> "MessageContext":
+        forked = MessageContext(self.method, self.path, copy.deepcopy(self.payload))
+        forked.properties = dict(self.properties)
+        return forked
+
+
+def build_payload(template: str, values: List[Any]) -> Any:
+    """payloadFactory: "$n" becomes a JSON string, a bare $n a JSON literal"""
+    def quoted(match):
+        value = values[int(match.group(1)) - 1]
+        if value is None:
+            value = ""
+        elif not isinstance(value, str):
+            value = json.dumps(value)
+        return json.dumps(value)
+
+    def bare(match):
+        return json.dumps(values[int(match.group(1)) - 1])
+
+    text = re.sub(r'"\$(\d+)"', quoted, template)
+    text = re.sub(r"\$(\d+)", bare, text)
+    return json.loads(text)
+
+
+# --- Mediation ---
+
+class Mediator:
+    def __init__(self, endpoint_map: Dict[str, str], stub_latency_ms: float, call_timeout: float):
+        self.endpoint_map = endpoint_map
+        self.stub_latency_ms = stub_latency_ms
+        self.call_timeout = call_timeout
+        self.session = requests.Session()
+        self._background: set = set()
+
+    def resolve_uri(self, template: str, ctx: MessageContext) -> str:
+        def uri_var(match):
+            name = match.group(1)
+            value = ctx.properties.get(f"uri.var.{name}")
+            if value is None and isinstance(ctx.payload, dict):
+                value = ctx.payload.get(name)
+            return "" if value is None else str(value)
+
+        uri = re.sub(r"\{uri\.var\.([^}]+)\}", uri_var, template)
+        for prefix, target in self.endpoint_map.items():
+            if uri.startswith(prefix):
+                return target + uri[len(prefix):]
+        return uri
+
+    async def run_sequence(self, elements, ctx: MessageContext) -> bool:
+        """Run mediators in order; returns True once <respond/> is reached"""
+        for element in elements:
+            tag = element.tag.replace(SYNAPSE_NS, "")
+            if tag == "log":
+                self.log(element, ctx)
+            elif tag == "property":
+                name = element.get("name")
+                if element.get("expression"):
+                    ctx.properties[name] = ctx.evaluate(element.get("expression"))
+                else:
+                    ctx.properties[name] = element.get("value")
+            elif tag == "payloadFactory":
+                template = element.find(f"{SYNAPSE_NS}format").text
+                args = element.find(f"{SYNAPSE_NS}args")
+                values = [ctx.evaluate(arg.get("expression")) for arg in (args if args is not None else [])]
+                ctx.payload = build_payload(template, values)
+            elif tag == "call":
+                await self.call(element, ctx)
+            elif tag == "clone":
+                # Targets run on a copy of the message, fire-and-forget; the parent continues
+                for target in element.findall(f"{SYNAPSE_NS}target"):
+                    sequence = target.find(f"{SYNAPSE_NS}sequence")
+                    if sequence is not None:
+                        task = asyncio.ensure_future(self.run_clone(list(sequence), ctx.fork()))
+                        self._background.add(task)
+                        task.add_done_callback(self._background.discard)
+            elif tag == "respond":
+                return True
+        return False
+
+    async def run_clone(self, elements, ctx: MessageContext) -> None:
+        try:
+            await self.run_sequence(elements, ctx)
+        except Exception as e:
+            log.warning("clone target failed", error=str(e))
+
+    def log(self, element, ctx: MessageContext) -> None:
+        fields = {}
+        for prop in element.findall(f"{SYNAPSE_NS}property"):
+            value = ctx.evaluate(prop.get("expression")) if prop.get("expression") else prop.get("value")
+            fields[prop.get("name")] = value
+        log.info("log mediator", **fields)
+
+    async def call(self, element, ctx: MessageContext) -> None:
+        http = element.find(f"{SYNAPSE_NS}endpoint/{SYNAPSE_NS}http")
+        uri = self.resolve_uri(http.get("uri-template"), ctx)
+        method = (http.get("method") or ctx.method).upper()
+        headers = {h.get("name"): h.get("value") for h in http.findall(f"{SYNAPSE_NS}headers/{SYNAPSE_NS}header")}
+
+        started = time.perf_counter()
+        try:
+            if uri.startswith(STUB_PREFIX):
+                status, payload = await self.stub_call(uri, method)
+            else:
+                status, payload = await asyncio.get_running_loop().run_in_executor(
+                    None, self.http_call, method, uri, headers, ctx.payload)
+        finally:
+            ctx.backend_ms += (time.perf_counter() - started) * 1000
+        ctx.status = status
+        ctx.payload = payload
+
+    def http_call(self, method: str, uri: str, headers: Dict[str, str], payload: Any) -> Tuple[int, Any]:
+        body = None if method == "GET" else payload
+        response = self.session.request(method, uri, json=body, headers=headers, timeout=self.call_timeout)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, {"text": response.text}
+
+    async def stub_call(self, uri: str, method: str) -> Tuple[int, Any]:
+        if self.stub_latency_ms:
+            await asyncio.sleep(self.stub_latency_ms / 1000)
+        path = uri[len(STUB_PREFIX):]
+        if "/loyalty/" in path:
+            return 200, {"client_id": path.rsplit("/", 1)[-1], "points": 0}
+        return 200, {"status": "accepted", "stub": path, "method": method}
+
+
+class Route:
+    def __init__(self, methods: List[str], path: str, sequence, latency_ms: float = 0.0):
+        self.methods = methods
+        self.path = path
+        self.sequence = sequence
+        self.latency_ms = latency_ms
+        self.counters = {"requests": 0, "errors": 0, "total_ms": 0.0, "backend_ms": 0.0}
+
+    def metrics(self) -> Dict[str, Any]:
+        count = self.counters["requests"] or 1
+        total = self.counters["total_ms"]
+        backend = self.counters["backend_ms"]
+        return {
+            **self.counters,
+            "avg_total_ms": round(total / count, 3),
+            "avg_backend_ms": round(backend / count, 3),
+            "avg_esb_overhead_ms": round((total - backend) / count, 3),
+        }
+
+
+def load_routes(config_path: str) -> List[Route]:
+    """Read every <api>/<resource> from a Synapse configuration file"""
+    root = ET.parse(config_path).getroot()
+    apis = [root] if root.tag == f"{SYNAPSE_NS}api" else root.findall(f".//{SYNAPSE_NS}api")
+    routes = []
+    for api in apis:
+        context = api.get("context", "").rstrip("/")
+        for resource in api.findall(f"{SYNAPSE_NS}resource"):
+            in_sequence = resource.find(f"{SYNAPSE_NS}inSequence")
+            routes.append(Route(
+                methods=resource.get("methods", "GET").upper().split(),
+                path=context + resource.get("uri-template", "/"),
+                sequence=list(in_sequence) if in_sequence is not None else []
+            ))
+    return routes
+
+
+# --- HTTP front end ---
+
+class ESBGateway:
+    def __init__(self, routes: List[Route], mediator: Mediator):
+        self.routes = {route.path: route for route in routes}
+        self.mediator = mediator
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+        path = path.split("?", 1)[0]
+        if method == "GET" and path == "/_esb/metrics":
+            return 200, {r.path: r.metrics() for r in self.routes.values()}
+
+        route = self.routes.get(path)
+        if route is None:
+            return 404, {"error": f"No API resource for {path}"}
+        if method not in route.methods:
+            return 405, {"error": f"{method} not allowed on {path}"}
+
+        started = time.perf_counter()
+        ctx = None
+        try:
+            payload = json.loads(body) if body else {}
+            ctx = MessageContext(method, path, payload)
+            if route.latency_ms:
+                await asyncio.sleep(route.latency_ms / 1000)
+            await self.mediator.run_sequence(route.sequence, ctx)
+            status, result = ctx.status, ctx.payload
+        except Exception as e:
+            route.counters["errors"] += 1
+            status, result = 502, {"error": "Mediation failed", "detail": str(e)}
+        route.counters["requests"] += 1
+        route.counters["total_ms"] += (time.perf_counter() - started) * 1000
+        if ctx is not None:
+            route.counters["backend_ms"] += ctx.backend_ms
+        return status, result
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0) or 0)
+                body = await reader.readexactly(length) if length else b""
+
+                status, result = await self.dispatch(method.upper(), target, body)
+                data = json.dumps(result).encode()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+def parse_pairs(values: List[str]) -> Dict[str, str]:
+    pairs = {}
+    for value in values or []:
+        key, _, target = value.partition("=")
+        pairs[key] = target
+    return pairs
+
+
+async def serve(args) -> None:
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=args.workers))
+
+    endpoint_map = parse_pairs(args.endpoint_map)
+    if args.stub_hq is not None:
+        endpoint_map.setdefault(HQ_PREFIX, STUB_PREFIX + "hq")
+
+    routes = load_routes(args.config)
+    for path, latency in parse_pairs(args.latency).items():
+        for route in routes:
+            if route.path == path or route.path.endswith(path):
+                route.latency_ms = float(latency)
+
+    gateway = ESBGateway(routes, Mediator(endpoint_map, args.stub_hq or 0.0, args.call_timeout))
+    server = await asyncio.start_server(gateway.handle_connection, args.host, args.port)
+
+    print("=" * 60)
+    print("  HOTEL BEY - ESB Gateway (local stand-in)")
+    print("=" * 60)
+    for route in routes:
+        extra = f" (+{route.latency_ms:g}ms)" if route.latency_ms else ""
+        print(f"  {' '.join(route.methods):6} {route.path}{extra}")
+    print(f"\nListening on http://{args.host}:{args.port}  (metrics: /_esb/metrics)")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Python stand-in for the WSO2 ESB")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="Synapse API configuration file")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8280)
+    parser.add_argument("--latency", action="append", metavar="ROUTE=MS",
+                        help="Inject mediation latency on a route, e.g. /finance/transaction=20")
+    parser.add_argument("--stub-hq", nargs="?", type=float, const=0.0, default=None, metavar="MS",
+                        help="Answer hq.hotelbey.local calls in-process, optionally after MS milliseconds")
+    parser.add_argument("--endpoint-map", action="append", metavar="FROM=TO",
+                        help="Rewrite a backend URL prefix, e.g. http://hq.hotelbey.local:8080=http://localhost:9000")
+    parser.add_argument("--call-timeout", type=float, default=10.0, help="Backend call timeout in seconds")
+    parser.add_argument("--workers", type=int, default=32, help="Threads for backend calls")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("\nESB gateway stopped.")
+
+
+if __name__ == "__main__":
+    main()
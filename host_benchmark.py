@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Startup time and idle memory: six service processes vs the single app host.
+
+Starts each layout with service_launcher (parallel start, readiness polling),
+waits for it to settle, sums the resident memory of every process it spawned
+(including Flask's debug reloader children) and stops it again. RSS is read
+from /proc, so the memory columns need Linux.
+
+Usage:
+    python host_benchmark.py
+    python host_benchmark.py --settle 5
+"""
+
+import argparse
+import os
+import subprocess
+import time
+from typing import List
+
+from service_launcher import SERVICES, launch_all, stop_all
+
+HOST = [{"name": "AppHost", "port": 5000, "file": "app_host.py"}]
+
+
+def process_tree(pid: int) -> List[int]:
+    pids = [pid]
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                for child in f.read().split():
+                    pids += process_tree(int(child))
+    except OSError:
+        pass
+    return pids
+
+
+def rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def measure(name: str, services, settle: float) -> dict:
+    start = time.monotonic()
+    results = launch_all(services, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    startup = time.monotonic() - start
+    try:
+        failed = [r["name"] for r in results if r["error"] or r["reused"]]
+        if failed:
+            raise RuntimeError(f"{name}: not started cleanly (already running or failed): {failed}")
+        time.sleep(settle)
+        pids = [pid for r in results for pid in process_tree(r["proc"].pid)]
+        return {"layout": name, "processes": len(pids), "startup": startup,
+                "rss_mb": sum(rss_kb(pid) for pid in pids) / 1024}
+    finally:
+        stop_all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process services vs single-process app host")
+    parser.add_argument("--settle", type=float, default=2.0, help="Seconds to idle before reading RSS")
+    args = parser.parse_args()
+
+    rows = [measure("6 processes", SERVICES, args.settle)]
+    time.sleep(1)  # let the ports be released
+    rows.append(measure("app host", HOST, args.settle))
+
+    print(f"{'layout':14} {'processes':>9} {'startup s':>10} {'idle RSS MB':>12}")
+    for row in rows:
+        print(f"{row['layout']:14} {row['processes']:>9} {row['startup']:>10.2f} {row['rss_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
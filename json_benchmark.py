@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for services/json_codec.
+
+For each list endpoint, seeds the service's in-memory store, fetches one page
+through the in-process test client (no network) and times encoding that page
+with Flask's default JSON provider vs the codec, and decoding it the way the
+workers do (requests' stdlib json vs json_codec.loads). The last column is
+the full request time with the codec.
+
+Usage:
+    python json_benchmark.py
+    python json_benchmark.py --records 5000 --requests 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "services"))
+
+from flask.json.provider import DefaultJSONProvider
+
+import json_codec
+
+
+def seed(records: int):
+    import booking_service
+    import payment_service
+    import restaurant_service
+    import room_service
+
+    for i in range(records):
+        room_id = str(1000 + i)
+        room_service.rooms[room_id] = {"id": room_id, "type": "standard", "price": 250, "status": "available",
+                                       "features": ["TV", "WiFi"]}
+        booking_id = str(uuid.uuid4())
+        booking_service.bookings.insert({
+            "id": booking_id, "client_id": "bench-client", "room_id": room_id, "check_in": "2024-01-15",
+            "check_out": "2024-01-18", "guests": 2, "status": "confirmed", "total_amount": 750.0,
+            "created_at": datetime.now().isoformat()
+        })
+        restaurant_service.menu_items[str(100 + i)] = {"id": str(100 + i), "name": f"Dish {i}", "price": 20 + i % 50,
+                                                       "category": "dinner"}
+    payment_service.ledger.append_many(["bench-booking"] * records, [100.0 + i for i in range(records)],
+                                       ["credit_card"] * records)
+
+    return [
+        ("GET /api/rooms", room_service.app, "/api/rooms?limit=1000"),
+        ("GET /api/booking/client/<id>", booking_service.app, "/api/booking/client/bench-client?limit=1000"),
+        ("GET /api/restaurant/menu", restaurant_service.app, "/api/restaurant/menu?limit=1000"),
+        ("GET /api/payment/history/<id>", payment_service.app, "/api/payment/history/bench-booking?limit=1000"),
+    ]
+
+
+def time_request(app, path: str, requests_count: int):
+    client = app.test_client()
+    body = client.get(path).data  # warm up
+    start = time.perf_counter()
+    for _ in range(requests_count):
+        client.get(path).data
+    return (time.perf_counter() - start) / requests_count * 1000, body
+
+
+def time_call(function, argument, requests_count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests_count):
+        function(argument)
+    return (time.perf_counter() - start) / requests_count * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Flask's default JSON provider with json_codec")
+    parser.add_argument("--records", type=int, default=1000, help="Records per list endpoint (one page of up to 1000 is returned)")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per measurement")
+    args = parser.parse_args()
+
+    print(f"Backend: {json_codec.BACKEND}, {args.records} records, {args.requests} requests each\n")
+    print(f"{'endpoint':32} {'bytes':>8} {'encode stdlib':>14} {'encode codec':>13} {'x':>6} "
+          f"{'decode stdlib':>14} {'decode codec':>13} {'request ms':>11}")
+
+    for name, app, path in seed(args.records):
+        app.debug = False
+        request_ms, body = time_request(app, path, args.requests)
+        payload = json_codec.loads(body)
+        encode_stdlib = time_call(DefaultJSONProvider(app).dumps, payload, args.requests)
+        encode_codec = time_call(json_codec.dumps_bytes, payload, args.requests)
+        decode_stdlib = time_call(lambda b: json.loads(b.decode("utf-8")), body, args.requests)
+        decode_codec = time_call(json_codec.loads, body, args.requests)
+        print(f"{name:32} {len(body):>8} {encode_stdlib:>14.3f} {encode_codec:>13.3f} "
+              f"{encode_stdlib / encode_codec:>5.1f}x {decode_stdlib:>14.3f} {decode_codec:>13.3f} {request_ms:>11.2f}")
+
+if __name__ == "__main__":
+    main()
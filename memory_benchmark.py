@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for services/compact_store.
+
+Builds the same synthetic bookings, restaurant orders and invoice records as
+the old `{id: dict}` stores and as RecordTables, and reports the bytes per
+record allocated for each (tracemalloc, so only Python heap is counted).
+
+Usage:
+    python memory_benchmark.py
+    python memory_benchmark.py --records 500000
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "services"))
+
+import accounting_service
+import booking_service
+import restaurant_service
+from compact_store import RecordTable
+
+
+def bookings(count: int):
+    start = datetime(2024, 1, 1)
+    clients = [str(uuid.uuid4()) for _ in range(max(1, count // 3))]
+    for i in range(count):
+        check_in = start + timedelta(days=i % 365)
+        yield {
+            "id": str(uuid.uuid4()), "client_id": random.choice(clients), "room_id": random.choice(["101", "102", "201", "202", "301"]),
+            "check_in": check_in.date().isoformat(), "check_out": (check_in + timedelta(days=3)).date().isoformat(),
+            "guests": 2, "status": "confirmed", "total_amount": 750.0,
+            "created_at": (start + timedelta(seconds=i * 7, microseconds=i)).isoformat()
+        }
+
+
+def orders(count: int):
+    start = datetime(2024, 1, 1)
+    booking_ids = [str(uuid.uuid4()) for _ in range(max(1, count // 4))]
+    for i in range(count):
+        yield {
+            "id": str(uuid.uuid4()), "booking_id": random.choice(booking_ids), "room_number": str(100 + i % 50),
+            "items": ["1", "3"], "total_amount": 140.0, "status": "pending", "order_type": "room_service",
+            "created_at": (start + timedelta(seconds=i * 7, microseconds=i)).isoformat()
+        }
+
+
+def invoices(count: int):
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        doc_id = str(uuid.uuid4())
+        yield {
+            "doc_id": doc_id, "invoice_id": doc_id, "type": "invoice", "booking_id": str(uuid.uuid4()),
+            "payment_id": str(uuid.uuid4()), "client_name": f"Guest {i}", "total_amount": 750.0,
+            "generated_at": (start + timedelta(seconds=i * 7, microseconds=i)).isoformat(), "status": "generated",
+            "content_hash": uuid.uuid4().hex + uuid.uuid4().hex, "size": 497
+        }
+
+
+def measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    store = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    return size
+
+
+def as_dicts(records, key):
+    store = {}
+    for record in records:
+        store[record[key]] = record
+    return store
+
+
+def as_table(records, schema):
+    table = RecordTable(schema)
+    table.insert_many(records)
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes per record: dict stores vs RecordTable")
+    parser.add_argument("--records", type=int, default=100000, help="Records per store")
+    args = parser.parse_args()
+    n = args.records
+
+    stores = [
+        ("bookings", bookings, "id", booking_service.bookings),
+        ("restaurant orders", orders, "id", restaurant_service.restaurant_orders),
+        ("invoices", invoices, "doc_id", accounting_service.documents),
+    ]
+
+    print(f"{n} records per store\n")
+    print(f"{'store':20} {'dict B/rec':>11} {'table B/rec':>12} {'ratio':>7}")
+    for name, generate, key, service_table in stores:
+        schema = [(field, service_table.columns[field].kind) for field in service_table.fields]
+        # Records are generated inside the measurement, so the strings a store keeps are counted
+        random.seed(1)
+        dict_bytes = measure(lambda: as_dicts(generate(n), key))
+        random.seed(1)
+        table_bytes = measure(lambda: as_table(generate(n), schema))
+        print(f"{name:20} {dict_bytes / n:>11.0f} {table_bytes / n:>12.0f} {dict_bytes / table_bytes:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
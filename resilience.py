@@ -0,0 +1,393 @@
+"""
+Client-side resilience for the job workers' HTTP calls.
+
+Every downstream service (BeyPayment, the ESB, ...) gets its own guard made of:
+  - a token bucket that caps the request rate,
+  - a bulkhead that caps the number of concurrent in-flight calls,
+  - a circuit breaker that fails fast while the service is unhealthy.
+
+Rejected calls raise DependencyUnavailableError, which the worker exception
+handler turns into a Zeebe failure with a retry backoff instead of letting the
+job hang on a degraded dependency. Nothing was sent to the service, so the
+failure keeps the job's retries: a long local rejection delays jobs but never
+exhausts them into an incident.
+
+Call timeouts are capped by the enclosing deadline (the job's lock expiry in a
+worker, see deadlines.py). A call that cannot start or finish before it raises
+DeadlineExceeded; the exception handler then abandons the job without
+reporting, because Zeebe has already handed it to another worker.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+import requests
+from pyzeebe import Job, JobController, JobStatus, default_exception_handler
+
+import deadlines
+from deadlines import DeadlineExceeded
+from services import json_codec, structured_log
+
+# Per-service limits: requests/second, burst size, max concurrent calls,
+# consecutive failures before opening, seconds before a half-open probe.
+DEFAULT_LIMITS = {
+    "booking":    {"rate": 50.0, "burst": 100, "max_concurrent": 20, "failure_threshold": 5, "reset_timeout": 15.0},
+    "rooms":      {"rate": 50.0, "burst": 100, "max_concurrent": 20, "failure_threshold": 5, "reset_timeout": 15.0},
+    "restaurant": {"rate": 30.0, "burst": 60,  "max_concurrent": 10, "failure_threshold": 5, "reset_timeout": 15.0},
+    "client":     {"rate": 50.0, "burst": 100, "max_concurrent": 20, "failure_threshold": 5, "reset_timeout": 15.0},
+    "payment":    {"rate": 20.0, "burst": 40,  "max_concurrent": 8,  "failure_threshold": 3, "reset_timeout": 30.0},
+    "accounting": {"rate": 20.0, "burst": 40,  "max_concurrent": 8,  "failure_threshold": 3, "reset_timeout": 30.0},
+    "esb":        {"rate": 10.0, "burst": 20,  "max_concurrent": 4,  "failure_threshold": 3, "reset_timeout": 30.0},
+}
+FALLBACK_LIMITS = {"rate": 20.0, "burst": 40, "max_concurrent": 8, "failure_threshold": 5, "reset_timeout": 15.0}
+
+DEFAULT_TIMEOUT = 10.0
+# Seconds to keep trying a busy metrics port (the previous worker may still be draining)
+METRICS_BIND_RETRY = 60.0
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class DependencyUnavailableError(Exception):
+    """A downstream call was rejected locally before reaching the service"""
+
+    def __init__(self, service: str, reason: str, retry_after: float):
+        super().__init__(f"{service} unavailable ({reason}), retry in {retry_after:.1f}s")
+        self.service = service
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_ms(self) -> int:
+        return max(int(self.retry_after * 1000), 100)
+
+
+class RateLimitedError(DependencyUnavailableError):
+    pass
+
+
+class BulkheadFullError(DependencyUnavailableError):
+    pass
+
+
+class CircuitOpenError(DependencyUnavailableError):
+    pass
+
+
+class TokenBucket:
+    """Non-blocking token bucket; try_acquire returns the wait time when empty"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return 0.0
+            return (1.0 - self.tokens) / self.rate
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> float:
+        """Returns 0 if the call may proceed, otherwise seconds until the next probe"""
+        with self._lock:
+            if self.state == CLOSED:
+                return 0.0
+            now = time.monotonic()
+            if self.state == OPEN:
+                remaining = self.opened_at + self.reset_timeout - now
+                if remaining > 0:
+                    return remaining
+                self.state = HALF_OPEN
+            if self._probe_in_flight:
+                return self.reset_timeout
+            self._probe_in_flight = True
+            return 0.0
+
+    def cancel_probe(self) -> None:
+        """A half-open probe that was rejected before being sent must not block the next one"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+
+class ServiceGuard:
+    """Rate limit + bulkhead + circuit breaker for one downstream service"""
+
+    def __init__(self, name: str, rate: float, burst: int, max_concurrent: int,
+                 failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.counters = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "rejected_rate_limit": 0,
+            "rejected_bulkhead": 0,
+            "rejected_circuit_open": 0,
+            "in_flight": 0,
+        }
+
+    def _count(self, key: str, delta: int = 1) -> None:
+        with self._lock:
+            self.counters[key] += delta
+
+    def acquire(self) -> None:
+        """Admit one call or raise; the caller must release() after an admitted call"""
+        wait = self.breaker.before_call()
+        if wait > 0:
+            self._count("rejected_circuit_open")
+            raise CircuitOpenError(self.name, "circuit open", wait)
+
+        wait = self.bucket.try_acquire()
+        if wait > 0:
+            self._count("rejected_rate_limit")
+            self.breaker.cancel_probe()
+            raise RateLimitedError(self.name, "rate limited", wait)
+
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected_bulkhead")
+            self.breaker.cancel_probe()
+            raise BulkheadFullError(self.name, "bulkhead full", 1.0)
+
+        self._count("calls")
+        self._count("in_flight")
+
+    def release(self, success: Optional[bool]) -> None:
+        """success=None: the call was cut short by the caller's deadline and says nothing about the service"""
+        self._count("in_flight", -1)
+        self._slots.release()
+        if success is None:
+            self.breaker.cancel_probe()
+        elif success:
+            self._count("successes")
+            self.breaker.record_success()
+        else:
+            self._count("failures")
+            self.breaker.record_failure()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            data = dict(self.counters)
+        data["state"] = self.breaker.state
+        data["consecutive_failures"] = self.breaker.consecutive_failures
+        data["tokens"] = round(self.bucket.tokens, 2)
+        data["max_concurrent"] = self.max_concurrent
+        return data
+
+
+class GuardRegistry:
+    def __init__(self, limits: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.limits = dict(limits or DEFAULT_LIMITS)
+        self._guards: Dict[str, ServiceGuard] = {}
+        self._lock = threading.Lock()
+
+    def get(self, service: str) -> ServiceGuard:
+        guard = self._guards.get(service)
+        if guard is None:
+            with self._lock:
+                guard = self._guards.get(service)
+                if guard is None:
+                    guard = ServiceGuard(service, **self.limits.get(service, FALLBACK_LIMITS))
+                    self._guards[service] = guard
+        return guard
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: guard.snapshot() for name, guard in list(self._guards.items())}
+
+    def render_prometheus(self) -> str:
+        states = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+        lines = []
+        for service, data in sorted(self.snapshot().items()):
+            for key in ("calls", "successes", "failures", "rejected_rate_limit",
+                        "rejected_bulkhead", "rejected_circuit_open"):
+                lines.append(f'worker_downstream_{key}_total{{service="{service}"}} {data[key]}')
+            lines.append(f'worker_downstream_in_flight{{service="{service}"}} {data["in_flight"]}')
+            lines.append(f'worker_downstream_tokens{{service="{service}"}} {data["tokens"]}')
+            lines.append(f'worker_downstream_circuit_state{{service="{service}"}} {states[data["state"]]}')
+        return "\n".join(lines) + "\n"
+
+
+registry = GuardRegistry()
+log = structured_log.get_logger("resilience")
+
+
+def request(service: str, method: str, url: str, **kwargs) -> requests.Response:
+    """
+    Perform an HTTP call through the guard of `service`.
+
+    Connection errors, timeouts and 5xx responses count as failures for the
+    circuit breaker; 4xx responses are the caller's problem and count as successes.
+    JSON bodies are encoded with services/json_codec (decode responses with
+    json_body()), and the current log correlation fields are forwarded as headers.
+
+    The timeout is capped by the remaining deadline. Raises DeadlineExceeded
+    if the deadline has passed, or passes while waiting for the response.
+    """
+    timeout = kwargs.get("timeout", DEFAULT_TIMEOUT)
+    budget = deadlines.remaining(timeout)
+    if budget is not None and budget <= 0:
+        raise DeadlineExceeded(f"{service}: deadline passed before the call")
+    guard = registry.get(service)
+    guard.acquire()
+    kwargs["timeout"] = budget
+    kwargs["headers"] = {**structured_log.correlation_headers(), **(kwargs.get("headers") or {})}
+    body = kwargs.pop("json", None)
+    if body is not None:
+        kwargs["data"] = json_codec.dumps_bytes(body)
+        kwargs["headers"] = {"Content-Type": "application/json", **kwargs["headers"]}
+    success: Optional[bool] = False
+    try:
+        response = requests.request(method, url, **kwargs)
+        success = response.status_code < 500
+        return response
+    except requests.Timeout as e:
+        if deadlines.expired():
+            success = None
+            raise DeadlineExceeded(f"{service}: deadline passed during the call") from e
+        raise
+    finally:
+        guard.release(success)
+
+
+def json_body(response: requests.Response) -> Any:
+    """Decode a JSON response with services/json_codec; bodies not in UTF-8 are decoded as text first"""
+    encoding = (response.encoding or "utf-8").lower().replace("_", "-")
+    if encoding in ("utf-8", "utf8", "ascii", "us-ascii"):
+        return json_codec.loads(response.content)
+    return json_codec.loads(response.text)
+
+
+def idempotency_headers(job: Job) -> Dict[str, str]:
+    """Idempotency-Key derived from the Zeebe job key, which is stable across redeliveries"""
+    return {IDEMPOTENCY_HEADER: f"zeebe-job-{job.key}"}
+
+
+def get(service: str, url: str, **kwargs) -> requests.Response:
+    return request(service, "GET", url, **kwargs)
+
+
+def post(service: str, url: str, **kwargs) -> requests.Response:
+    return request(service, "POST", url, **kwargs)
+
+
+def put(service: str, url: str, **kwargs) -> requests.Response:
+    return request(service, "PUT", url, **kwargs)
+
+
+async def fail_keeping_retries(job: Job, job_controller: JobController, message: str, retry_back_off_ms: int) -> None:
+    """Like set_failure_status, but with the job's retries unchanged (the failure was local)"""
+    job._set_status(JobStatus.Failed)
+    # JobController only offers a failure that costs one retry, so go to its adapter
+    await job_controller._zeebe_adapter.fail_job(job_key=job.key, retries=job.retries, message=message,
+                                                 retry_back_off_ms=retry_back_off_ms, variables={})
+
+
+async def resilience_exception_handler(e: Exception, job: Job, job_controller: JobController) -> None:
+    """Fail fast with a backoff when a dependency is unavailable, default handling otherwise"""
+    if isinstance(e, DeadlineExceeded):
+        # The job's lock has expired: it belongs to another worker now, so neither fail nor complete it
+        log.warning("job deadline passed, abandoning job", error=str(e))
+    elif isinstance(e, DependencyUnavailableError):
+        log.warning("dependency unavailable, failing job", error=str(e), retry_back_off_ms=e.retry_after_ms)
+        await fail_keeping_retries(job, job_controller, str(e), e.retry_after_ms)
+    else:
+        await default_exception_handler(e, job, job_controller)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body = json.dumps(registry.snapshot()).encode()
+            content_type = "application/json"
+        elif self.path.startswith("/metrics"):
+            body = registry.render_prometheus().encode()
+            content_type = "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, retry_for: float = METRICS_BIND_RETRY) -> Optional[ThreadingHTTPServer]:
+    """
+    Expose guard state on /metrics (Prometheus text) and /metrics.json
+
+    If the port is taken (the worker being replaced is still draining), keep
+    trying in the background for `retry_for` seconds instead of delaying startup.
+    """
+    def bind() -> Optional[ThreadingHTTPServer]:
+        try:
+            server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+        except OSError:
+            return None
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        log.info("metrics server started", url=f"http://localhost:{port}/metrics")
+        return server
+
+    server = bind()
+    if server is None:
+        log.warning("metrics port busy, retrying in the background", port=port, retry_for=retry_for)
+
+        def retry() -> None:
+            until = time.monotonic() + retry_for
+            while time.monotonic() < until:
+                time.sleep(1.0)
+                if bind() is not None:
+                    return
+            log.warning("metrics server disabled", port=port)
+
+        threading.Thread(target=retry, name="metrics-bind", daemon=True).start()
+    return server
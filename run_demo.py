@@ -21,16 +21,11 @@ import threading
 import os
 from datetime import datetime
 
+from service_launcher import SERVICES, launch_all, wait_ready
+
 # Configuration
 CAMUNDA_URL = "http://localhost:8080"
-SERVICES = [
-    {"name": "BeyBooking", "port": 5001, "file": "services/booking_service.py"},
-    {"name": "BeyRooms", "port": 5002, "file": "services/room_service.py"},
-    {"name": "BeyResto", "port": 5003, "file": "services/restaurant_service.py"},
-    {"name": "BeyClient", "port": 5004, "file": "services/client_service.py"},
-    {"name": "BeyPayment", "port": 5005, "file": "services/payment_service.py"},
-    {"name": "BeyAccounting", "port": 5006, "file": "services/accounting_service.py"},
-]
+WORKER_METRICS_URL = "http://localhost:9100/metrics"
 
 # Colors for terminal output
 class Colors:
@@ -70,37 +65,19 @@ def check_camunda():
     except:
         return False
 
-def check_service(port):
-    """Check if a service is running on a port"""
-    try:
-        response = requests.get(f"http://localhost:{port}/", timeout=2)
-        return True
-    except:
-        try:
-            # Try a common health endpoint
-            response = requests.get(f"http://localhost:{port}/api/health", timeout=2)
-            return True
-        except:
-            return False
-
-def start_service(service, processes):
-    """Start a Flask service"""
-    if check_service(service["port"]):
-        print_flow(f"{service['name']} already running on :{service['port']}")
-        return None
-    
-    print_flow(f"Starting {service['name']} on :{service['port']}...")
-    
-    # Start the service in a subprocess
-    proc = subprocess.Popen(
-        [sys.executable, service["file"]],
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-        cwd=os.path.dirname(os.path.abspath(__file__))
-    )
-    processes.append(proc)
-    time.sleep(0.5)
-    return proc
+def start_services(processes):
+    """Start all Flask services in parallel and wait until each reports ready"""
+    print_flow(f"Starting {len(SERVICES)} services in parallel...")
+    results = launch_all(SERVICES, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    processes.extend(r["proc"] for r in results if r["proc"] is not None)
+    for result in results:
+        if result["reused"]:
+            print_flow(f"{result['name']} already running on :{result['port']}")
+        elif result["error"]:
+            print_flow(f"{result['name']} failed: {result['error']}")
+        else:
+            print_flow(f"{result['name']} ready on :{result['port']} in {result['seconds']:.2f}s")
+    return not any(r["error"] for r in results)
 
 def start_job_worker(processes):
     """Start the Zeebe job worker"""
@@ -197,10 +174,10 @@ def run_demo():
         
         # Step 2: Start services
         print_header("STEP 2: Starting Local App Services")
-        for service in SERVICES:
-            start_service(service, processes)
-        time.sleep(2)
-        print_success("All services started")
+        if not start_services(processes):
+            print_error("Some services did not become ready")
+            return
+        print_success("All services ready")
         
         # Step 3: Start job worker
         print_header("STEP 3: Starting Zeebe Job Worker")
@@ -213,7 +190,12 @@ def run_demo():
             daemon=True
         )
         monitor_thread.start()
-        time.sleep(3)
+        # The worker serves its metrics once it is up and registered
+        try:
+            wait_ready(WORKER_METRICS_URL, proc=worker_proc)
+        except (RuntimeError, TimeoutError) as e:
+            print_error(f"Job Worker did not start: {e}")
+            return
         print_success("Job Worker started")
         
         # Step 4: Create reservation
@@ -291,28 +273,37 @@ def run_demo():
         ]
         
         completed_steps = set()
+        seen_messages = set()
         timeout = 60
         start_time = time.time()
         
         while time.time() - start_time < timeout:
-            # Check worker output for completed steps
+            # Worker log lines are JSON, tagged with the job's process instance and task type
             for line in worker_output:
-                for step_id, step_name in steps:
-                    if step_id in line.lower() and step_id not in completed_steps:
-                        completed_steps.add(step_id)
-                        status = "✓" if ">>>" in line or "complete" in line.lower() else "→"
-                        print(f"  {Colors.GREEN}{status}{Colors.END} {step_name}")
-                        
-                        # Show special messages
-                        if "BOOKING CONFIRMED" in line:
-                            booking_id = line.split("ID")[-1].strip().replace("<<<", "").strip()
-                            print(f"    {Colors.CYAN}Booking ID: {booking_id}{Colors.END}")
-                        if "PAYMENT SUCCESS" in line:
-                            print(f"    {Colors.CYAN}Payment processed successfully{Colors.END}")
-                        if "INVOICE GENERATED" in line:
-                            print(f"    {Colors.CYAN}Invoice generated{Colors.END}")
-                        if "ESB SYNC" in line:
-                            print(f"    {Colors.CYAN}Synced to HQ{Colors.END}")
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if str(entry.get("process_instance_key")) != str(process_key):
+                    continue
+                step_id = entry.get("task_type")
+                step_name = dict(steps).get(step_id)
+                if step_name and step_id not in completed_steps:
+                    completed_steps.add(step_id)
+                    print(f"  {Colors.GREEN}✓{Colors.END} {step_name}")
+
+                message = entry.get("msg")
+                if message in seen_messages:
+                    continue
+                seen_messages.add(message)
+                if message == "booking confirmed":
+                    print(f"    {Colors.CYAN}Booking ID: {entry.get('booking_id')}{Colors.END}")
+                elif message == "payment succeeded":
+                    print(f"    {Colors.CYAN}Payment processed successfully{Colors.END}")
+                elif message == "invoice generated":
+                    print(f"    {Colors.CYAN}Invoice generated{Colors.END}")
+                elif message == "transaction pushed to HQ":
+                    print(f"    {Colors.CYAN}Synced to HQ{Colors.END}")
             
             # Check if process completed
             if len(completed_steps) >= len(steps) - 2:  # Allow some flexibility
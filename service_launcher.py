@@ -0,0 +1,125 @@
+"""
+Parallel launcher for the Flask services.
+
+All services are started at once and each is polled on /api/ready with
+exponential backoff, so a full cold start takes about as long as the slowest
+service instead of the sum of fixed sleeps. Services that already answer
+/api/ready are reused, not started again.
+"""
+
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Ports the services bind (see app.run in each file)
+SERVICES = [
+    {"name": "BeyBooking", "port": 5001, "file": "services/booking_service.py"},
+    {"name": "BeyClient", "port": 5002, "file": "services/client_service.py"},
+    {"name": "BeyAccounting", "port": 5006, "file": "services/accounting_service.py"},
+    {"name": "BeyPayment", "port": 5007, "file": "services/payment_service.py"},
+    {"name": "BeyResto", "port": 5008, "file": "services/restaurant_service.py"},
+    {"name": "BeyRooms", "port": 5009, "file": "services/room_service.py"},
+]
+
+READY_TIMEOUT = 30.0
+FIRST_DELAY = 0.05
+MAX_DELAY = 1.0
+
+
+def is_ready(url: str) -> bool:
+    try:
+        return requests.get(url, timeout=1).status_code == 200
+    except requests.RequestException:
+        return False
+
+
+def wait_ready(url: str, timeout: float = READY_TIMEOUT, proc: Optional[subprocess.Popen] = None) -> float:
+    """
+    Poll `url` until it answers 200, doubling the delay between attempts
+
+    Args:
+        url: Readiness URL
+        timeout: Seconds to wait before giving up
+        proc: The process serving it; a process that exits stops the wait
+
+    Returns:
+        Seconds until ready
+    """
+    start = time.monotonic()
+    delay = FIRST_DELAY
+    while True:
+        if is_ready(url):
+            return time.monotonic() - start
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"{url}: process exited with code {proc.returncode}")
+        elapsed = time.monotonic() - start
+        if elapsed >= timeout:
+            raise TimeoutError(f"{url} not ready after {timeout:.0f}s")
+        time.sleep(min(delay, timeout - elapsed))
+        delay = min(delay * 2, MAX_DELAY)
+
+
+def launch_all(services: List[Dict] = SERVICES, timeout: float = READY_TIMEOUT,
+               stdout=None, stderr=None) -> List[Dict]:
+    """
+    Start every service that is not already ready, then wait for all of them in parallel
+
+    Returns:
+        One entry per service: name, port, proc (None if reused), seconds, reused, error
+    """
+    start = time.monotonic()
+    results = []
+    for service in services:
+        url = f"http://localhost:{service['port']}/api/ready"
+        reused = is_ready(url)
+        proc = None if reused else subprocess.Popen(
+            [sys.executable, service["file"]], cwd=BASE_DIR, stdout=stdout, stderr=stderr
+        )
+        results.append({"name": service["name"], "port": service["port"], "url": url,
+                        "proc": proc, "reused": reused, "seconds": 0.0, "error": None})
+
+    def wait(result: Dict) -> None:
+        if result["reused"]:
+            return
+        try:
+            wait_ready(result["url"], max(timeout - (time.monotonic() - start), 0.0), result["proc"])
+        except (RuntimeError, TimeoutError) as e:
+            result["error"] = str(e)
+        # Measured from the common start, so the slowest service equals the total
+        result["seconds"] = time.monotonic() - start
+
+    with ThreadPoolExecutor(max_workers=len(results) or 1) as pool:
+        list(pool.map(wait, results))
+    return results
+
+
+def report(results: List[Dict]) -> None:
+    for result in results:
+        if result["reused"]:
+            status = "already running"
+        elif result["error"]:
+            status = f"FAILED: {result['error']}"
+        else:
+            status = f"ready in {result['seconds']:.2f}s"
+        print(f"  {result['name']:14} :{result['port']}  {status}")
+    started = [r["seconds"] for r in results if not r["reused"]]
+    if started:
+        print(f"  Cold start: {max(started):.2f}s")
+
+
+def stop_all(results: List[Dict]) -> None:
+    procs = [r["proc"] for r in results if r["proc"] is not None]
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
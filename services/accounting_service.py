@@ -1,50 +1,88 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file
+import os
 import uuid
 from datetime import datetime
 
+import health
+import json_codec
+import structured_log
+from idempotency import IdempotencyCache, idempotent
+from document_store import CONTENT_TYPE, DocumentRenderer, DocumentStore, select_for_day
+from compact_store import CATEGORY, FLOAT, INT, OBJECT, TIMESTAMP, UUID, RecordTable
+
 app = Flask(__name__)
+json_codec.install(app)
+structured_log.install(app)
+health.install(app, 'BeyAccounting', {'document_store': lambda: os.access(document_store.root, os.W_OK)})
+log = structured_log.get_logger("accounting")
+# Let a fronting nginx/Apache stream the file itself (X-Sendfile) when configured
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
+
+# Mock database for invoices/documents (metadata; rendered bytes live in the store)
+documents = RecordTable([
+    ('doc_id', UUID), ('invoice_id', UUID), ('type', CATEGORY), ('booking_id', UUID),
+    ('payment_id', OBJECT), ('client_name', OBJECT), ('total_amount', FLOAT), ('amount_billed', FLOAT),
+    ('generated_at', TIMESTAMP), ('status', CATEGORY), ('content_hash', OBJECT), ('size', INT),
+    ('error', OBJECT)
+], omit_none=True)
+idempotency_cache = IdempotencyCache()
+document_store = DocumentStore()
+renderer = DocumentRenderer(document_store,
+                            on_change=lambda document, changes: documents.update(document['doc_id'], **changes))
+
+def _download_url(doc_id):
+    return f"/api/documents/{doc_id}"
 
-# Mock database for invoices/documents
-documents = {}
+def _with_download_url(document):
+    document['download_url'] = _download_url(document['doc_id'])
+    return document
 
 class AccountingService:
     @app.route('/api/invoices/create', methods=['POST'])
+    @idempotent(idempotency_cache)
     def create_invoice():
-        """Create invoice for a booking"""
+        """Create invoice for a booking; rendering is queued, or deferred to the bulk run"""
         data = request.json
         booking_id = data.get('booking_id')
         payment_id = data.get('payment_id')
-        
+
         invoice_id = str(uuid.uuid4())
-        
+
         invoice = {
             'invoice_id': invoice_id,
+            'doc_id': invoice_id,
             'booking_id': booking_id,
             'payment_id': payment_id,
+            'client_name': data.get('client_name'),
+            'total_amount': data.get('total_amount'),
             'type': 'invoice',
             'generated_at': datetime.now().isoformat(),
-            'status': 'generated'
+            'status': 'pending'
         }
-        
-        documents[invoice_id] = invoice
-        
-        print(f"Invoice {invoice_id} generated for booking {booking_id}")
-        
+
+        documents.insert(invoice)
+        if not data.get('defer_render'):
+            renderer.submit(invoice)
+
+        log.info("invoice queued", invoice_id=invoice_id, booking_id=booking_id)
+
         return jsonify({
             'invoice_id': invoice_id,
-            'status': 'generated'
+            'status': invoice['status'],
+            'download_url': _download_url(invoice_id)
         })
-    
+
     @app.route('/api/accounting/generate-confirmation', methods=['POST'])
+    @idempotent(idempotency_cache)
     def generate_confirmation():
         """Generate booking confirmation"""
         data = request.json
         booking_id = data.get('booking_id')
         client_data = data.get('client_data', {})
         total_amount = data.get('total_amount')
-        
+
         doc_id = str(uuid.uuid4())
-        
+
         document = {
             'doc_id': doc_id,
             'type': 'booking_confirmation',
@@ -52,19 +90,66 @@ class AccountingService:
             'client_name': f"{client_data.get('first_name')} {client_data.get('last_name')}",
             'amount_billed': total_amount,
             'generated_at': datetime.now().isoformat(),
-            'status': 'sent',
-            'download_url': f"/documents/{doc_id}.pdf" 
+            'status': 'pending'
         }
-        
-        documents[doc_id] = document
-        
-        print(f"Confirmation generated and sent to {client_data.get('email')}")
-        
+
+        documents.insert(document)
+        renderer.submit(document)
+
+        log.info("confirmation queued", doc_id=doc_id, email=client_data.get('email'))
+
         return jsonify({
             'document_id': doc_id,
-            'status': 'generated',
-            'download_url': document['download_url']
+            'status': document['status'],
+            'download_url': _download_url(doc_id)
         })
 
+    @app.route('/api/documents/<doc_id>', methods=['GET'])
+    def download_document(doc_id):
+        """
+        Stream a rendered document. Range and If-None-Match requests are
+        answered by send_file (206/304); under a WSGI server with a
+        file_wrapper (e.g. gunicorn) the body is sent with sendfile(2).
+        """
+        document = documents.get(doc_id)
+        if not document:
+            return jsonify({'error': 'Document not found'}), 404
+        digest = document.get('content_hash')
+        if not digest:
+            if document['status'] == 'failed':
+                return jsonify({'error': 'Rendering failed', 'detail': document.get('error')}), 500
+            response = jsonify({'status': document['status']})
+            response.status_code = 202
+            response.headers['Retry-After'] = '1'
+            return response
+        return send_file(
+            document_store.path_for(digest),
+            mimetype=CONTENT_TYPE,
+            as_attachment=request.args.get('download') == '1',
+            download_name=f"{document['type']}-{doc_id}.html",
+            conditional=True,
+            etag=digest,
+            max_age=86400
+        )
+
+    @app.route('/api/documents/<doc_id>/meta', methods=['GET'])
+    def get_document_meta(doc_id):
+        document = documents.get(doc_id)
+        if document:
+            return jsonify(_with_download_url(document))
+        return jsonify({'error': 'Document not found'}), 404
+
+    @app.route('/api/invoices/bulk-render', methods=['POST'])
+    def bulk_render_invoices():
+        """Render every not-yet-rendered invoice of a day (YYYY-MM-DD, default today) in one background pass"""
+        data = request.get_json(silent=True) or {}
+        day = data.get('date') or datetime.now().date().isoformat()
+        batch = select_for_day(documents.values(), day, include_rendered=bool(data.get('force')))
+        if batch:
+            renderer.submit_bulk(batch)
+        response = jsonify({'date': day, 'queued': len(batch)})
+        response.status_code = 202
+        return response
+
 if __name__ == '__main__':
-    app.run(port=5006, debug=True)
\ No newline at end of file
+    app.run(port=5006, debug=True)
@@ -0,0 +1,148 @@
+"""
+Incrementally maintained KPI aggregates.
+
+Each service feeds its write paths (booking create/cancel, payments,
+complaints) into a DayGrid: a NumPy matrix with one row per calendar day and
+one column per category (room type, payment method, complaint category).
+Range KPIs are then slice reductions over that matrix and never scan the
+transactional stores.
+
+Both dimensions are fed from request data, so both are bounded: a grid built
+with a list of categories counts any other one as OTHER, and days further
+than WINDOW_DAYS from today are rejected (services answer 400 before adding).
+"""
+
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+DayLike = Union[date, datetime, str]
+
+INITIAL_DAYS = 366
+# Days before or after today a grid accepts
+WINDOW_DAYS = 2 * 366
+OTHER = 'other'
+
+
+def to_day(value: DayLike) -> date:
+    """A date from a date, a datetime or an ISO string (time part ignored)"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def check_day(value: DayLike) -> date:
+    """
+    `value` as a date within WINDOW_DAYS of today
+
+    Raises:
+        ValueError: Not a date, or outside the window
+    """
+    day = to_day(value)
+    if abs(day.toordinal() - date.today().toordinal()) > WINDOW_DAYS:
+        raise ValueError(f"{day.isoformat()} is more than {WINDOW_DAYS} days from today")
+    return day
+
+
+def parse_range(start: Optional[str], end: Optional[str], default_days: int = 30) -> tuple:
+    """[start, end) from ?from=/?to= query values; defaults to the last `default_days` days"""
+    end_day = to_day(end) if end else date.today() + timedelta(days=1)
+    start_day = to_day(start) if start else end_day - timedelta(days=default_days)
+    if start_day > end_day:
+        raise ValueError("'from' must not be after 'to'")
+    return start_day, end_day
+
+
+class DayGrid:
+    """
+    Per-day, per-category running totals (values and event counts).
+
+    The matrix grows in both directions as days outside the covered range
+    (but within WINDOW_DAYS of today) arrive, and gains a column per new
+    category, or once for OTHER if the grid has a fixed list of categories.
+    """
+
+    def __init__(self, categories: Optional[Iterable[str]] = None, initial_days: int = INITIAL_DAYS):
+        self.known = frozenset(categories) if categories is not None else None
+        self.origin = date.today().toordinal() - initial_days // 2
+        self.values = np.zeros((initial_days, 0), dtype=np.float64)
+        self.counts = np.zeros((initial_days, 0), dtype=np.int64)
+        self.categories: List[str] = []
+        self._category_index: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _column(self, category: str) -> int:
+        if self.known is not None and (not isinstance(category, str) or category not in self.known):
+            category = OTHER
+        column = self._category_index.get(category)
+        if column is None:
+            column = len(self.categories)
+            self._category_index[category] = column
+            self.categories.append(category)
+            self.values = np.hstack([self.values, np.zeros((self.values.shape[0], 1))])
+            self.counts = np.hstack([self.counts, np.zeros((self.counts.shape[0], 1), dtype=np.int64)])
+        return column
+
+    def _rows(self, first: int, last: int) -> None:
+        """Make sure ordinals [first, last) are covered, growing by at least doubling"""
+        days = self.values.shape[0]
+        if first < self.origin:
+            extra = max(self.origin - first, days)
+            self.values = np.vstack([np.zeros((extra, self.values.shape[1])), self.values])
+            self.counts = np.vstack([np.zeros((extra, self.counts.shape[1]), dtype=np.int64), self.counts])
+            self.origin -= extra
+            days += extra
+        if last > self.origin + days:
+            extra = max(last - self.origin - days, days)
+            self.values = np.vstack([self.values, np.zeros((extra, self.values.shape[1]))])
+            self.counts = np.vstack([self.counts, np.zeros((extra, self.counts.shape[1]), dtype=np.int64)])
+
+    def add_span(self, start: DayLike, end: DayLike, category: str, value: float = 1.0, count: int = 1) -> None:
+        """
+        Add `value`/`count` to every day in [start, end) for `category`
+
+        Raises:
+            ValueError: A day is not a date or outside the window (see check_day)
+        """
+        first, last = check_day(start).toordinal(), check_day(end).toordinal()
+        if last <= first:
+            return
+        with self._lock:
+            column = self._column(category)
+            self._rows(first, last)
+            self.values[first - self.origin:last - self.origin, column] += value
+            self.counts[first - self.origin:last - self.origin, column] += count
+
+    def add(self, day: DayLike, category: str, value: float = 1.0, count: int = 1) -> None:
+        first = check_day(day)
+        self.add_span(first, first + timedelta(days=1), category, value, count)
+
+    def _window(self, start: date, end: date):
+        """Views of values/counts for [start, end), clipped to the covered range"""
+        days = self.values.shape[0]
+        lo = min(max(start.toordinal() - self.origin, 0), days)
+        hi = min(max(end.toordinal() - self.origin, 0), days)
+        return self.values[lo:hi], self.counts[lo:hi], lo
+
+    def totals(self, start: DayLike, end: DayLike) -> Dict[str, Dict[str, float]]:
+        """{category: {value, count}} summed over [start, end)"""
+        with self._lock:
+            values, counts, _ = self._window(to_day(start), to_day(end))
+            value_sums = values.sum(axis=0)
+            count_sums = counts.sum(axis=0)
+            return {category: {'value': float(value_sums[i]), 'count': int(count_sums[i])}
+                    for i, category in enumerate(self.categories)}
+
+    def daily(self, start: DayLike, end: DayLike) -> List[Dict[str, Any]]:
+        """One entry per day in [start, end) that has any activity"""
+        with self._lock:
+            values, counts, lo = self._window(to_day(start), to_day(end))
+            active = np.flatnonzero(counts.any(axis=1))
+            day_values = values.sum(axis=1)
+            day_counts = counts.sum(axis=1)
+            return [{'date': date.fromordinal(self.origin + lo + int(i)).isoformat(),
+                     'value': float(day_values[i]), 'count': int(day_counts[i])} for i in active]
@@ -1,20 +1,110 @@
 from flask import Flask, request, jsonify
+import threading
+import time
 import uuid
 from datetime import datetime, timedelta
 import json
 
 import requests
 
+import health
+import json_codec
+import structured_log
+from analytics import DayGrid, check_day, parse_range
+from compact_store import CATEGORY, FLOAT, INT, TIMESTAMP, UUID, RecordTable
+from pagination import paginated_response
+from idempotency import IdempotencyCache, idempotent
+
 app = Flask(__name__)
+json_codec.install(app)
+structured_log.install(app)
+health.install(app, 'BeyBooking')
+log = structured_log.get_logger("booking")
 
-# Mock database
-bookings = {}
+# Mock database (column-oriented; records become dicts only when read)
+bookings = RecordTable([
+    ('id', UUID), ('client_id', UUID), ('room_id', CATEGORY), ('check_in', CATEGORY),
+    ('check_out', CATEGORY), ('guests', INT), ('status', CATEGORY), ('total_amount', FLOAT),
+    ('created_at', TIMESTAMP)
+], indexed=('client_id',))
 clients = {}
+idempotency_cache = IdempotencyCache()
+
+# Booked room-nights per day and room type, maintained on create/cancel
+ROOM_SERVICE_URL = "http://localhost:5009/api/rooms"
+CATALOG_RETRY_SECONDS = 60
+ROOM_TYPES = ('standard', 'superior', 'suite')
+occupancy = DayGrid(ROOM_TYPES + ('unknown',))
+room_types = {}
+catalog = {'loaded': False, 'loading': False, 'tried_at': 0.0}
+catalog_lock = threading.Lock()
+# Stays whose room type is unknown until the running catalog load finishes
+waiting_stays = []
+
+def _load_catalog():
+    """Fetch room types from BeyRooms, then place the stays that were waiting for them"""
+    try:
+        response = requests.get(ROOM_SERVICE_URL, params={'limit': 1000, 'fields': 'id,type'}, timeout=2)
+        response.raise_for_status()
+        types = {str(room['id']): room['type'] for room in response.json()}
+    except (requests.RequestException, ValueError) as e:
+        log.warning("room catalog unavailable", error=str(e))
+        types = None
+    with catalog_lock:
+        if types is not None:
+            room_types.update(types)
+            catalog['loaded'] = True
+        catalog['loading'] = False
+        stays = waiting_stays[:]
+        del waiting_stays[:]
+    for booking, sign in stays:
+        _add_stay(booking, sign, room_types.get(str(booking['room_id']), 'unknown'))
+
+def _refresh_catalog():
+    """Start a background catalog load; None if one is running or was tried recently"""
+    with catalog_lock:
+        if catalog['loading'] or time.time() - catalog['tried_at'] < CATALOG_RETRY_SECONDS:
+            return None
+        catalog['loading'] = True
+        catalog['tried_at'] = time.time()
+    thread = threading.Thread(target=_load_catalog, name='room-catalog', daemon=True)
+    thread.start()
+    return thread
+
+def _add_stay(booking, sign, room_type):
+    try:
+        occupancy.add_span(booking['check_in'], booking['check_out'], room_type, value=sign, count=sign)
+    except (TypeError, ValueError):
+        pass  # dates the grid can't place don't count toward occupancy
+
+def _record_stay(booking, sign, room_type=None):
+    """
+    Count a stay toward occupancy under its room type: the one the caller
+    sent if it is one of ROOM_TYPES, else the catalog's. An unknown room never blocks the request; the
+    stay waits for a background catalog load ('unknown' if that fails).
+    """
+    room_id = str(booking['room_id'])
+    if room_type in ROOM_TYPES:
+        room_types[room_id] = room_type
+    elif room_id not in room_types:
+        _refresh_catalog()
+        with catalog_lock:
+            if catalog['loading']:
+                waiting_stays.append((booking, sign))
+                return
+    _add_stay(booking, sign, room_types.get(room_id, 'unknown'))
 
 class BookingService:
     @app.route('/api/booking/create', methods=['POST'])
+    @idempotent(idempotency_cache)
     def create_booking_endpoint():
         data = request.json
+        try:
+            check_in, check_out = check_day(data.get('check_in')), check_day(data.get('check_out'))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid stay dates: {e}'}), 400
+        if check_out <= check_in:
+            return jsonify({'error': 'check_out must be after check_in'}), 400
         booking_id = str(uuid.uuid4())
     
         booking = {
@@ -29,7 +119,8 @@ class BookingService:
             "created_at": datetime.now().isoformat()
         }
     
-        bookings[booking_id] = booking
+        bookings.insert(booking)
+        _record_stay(booking, 1, data.get("room_type"))
         return jsonify({"booking_id": booking_id, "status": "success"})
 
 
@@ -43,15 +134,47 @@ class BookingService:
 
     @app.route('/api/booking/<booking_id>/cancel', methods=['PUT'])
     def cancel_booking(booking_id):
-        if booking_id in bookings:
-            bookings[booking_id]['status'] = 'cancelled'
+        booking = bookings.get(booking_id)
+        if booking:
+            if booking['status'] != 'cancelled':
+                bookings.update(booking_id, status='cancelled')
+                _record_stay(booking, -1)
             return jsonify({'status': 'cancelled'})
         return jsonify({'error': 'Booking not found'}), 404
 
     @app.route('/api/booking/client/<client_id>', methods=['GET'])
     def get_client_bookings(client_id):
-        client_bookings = [b for b in bookings.values() if b['client_id'] == client_id]
-        return jsonify(client_bookings)
+        return paginated_response(bookings.select_rows('client_id', client_id), render=bookings.record)
+
+    @app.route('/api/analytics/occupancy', methods=['GET'])
+    def get_occupancy():
+        """Occupancy by room type over [?from, ?to) (default: last 30 days); ?daily=1 adds a per-day series"""
+        try:
+            start, end = parse_range(request.args.get('from'), request.args.get('to'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        days = (end - start).days
+        if not catalog['loaded']:
+            # Capacity needs the whole catalog, not just the rooms booked so far
+            thread = _refresh_catalog()
+            if thread:
+                thread.join()
+        inventory = {}
+        for room_type in room_types.values():
+            inventory[room_type] = inventory.get(room_type, 0) + 1
+
+        by_type = {}
+        for room_type, totals in occupancy.totals(start, end).items():
+            capacity = inventory.get(room_type, 0) * days
+            by_type[room_type] = {
+                'room_nights': int(totals['value']),
+                'capacity_nights': capacity,
+                'occupancy_rate': round(totals['value'] / capacity, 4) if capacity else None
+            }
+        result = {'from': start.isoformat(), 'to': end.isoformat(), 'by_room_type': by_type}
+        if request.args.get('daily') == '1':
+            result['daily'] = [{'date': d['date'], 'room_nights': int(d['value'])} for d in occupancy.daily(start, end)]
+        return jsonify(result)
 
 if __name__ == '__main__':
     app.run(port=5001, debug=True)
\ No newline at end of file
@@ -0,0 +1,166 @@
+"""
+Version counters, conditional GET and change feeds for reference data.
+
+A ChangeFeed numbers every change to a store (rooms, menu). The current
+version makes a cheap ETag, so clients revalidate with If-None-Match and get
+a 304 instead of the whole document. Clients that want to stay in sync
+follow the feed instead of polling:
+
+  GET <prefix>/changes?since=<version>&timeout=25   long-poll, JSON
+  GET <prefix>/changes/stream                        Server-Sent Events
+
+Versions restart with the process, so each feed also has a random epoch.
+ETags include it, and a feed position is the token "<epoch>-<version>"
+(`cursor` in long-poll responses, the SSE event id). A token from another
+epoch, a version the feed has not reached or one older than the retained
+history gets "reset": true, and the client should refetch the collection once.
+"""
+
+import secrets
+import threading
+import zlib
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from flask import Response, jsonify, make_response, request
+
+import json_codec
+
+DEFAULT_HISTORY = 1000
+MAX_POLL_SECONDS = 60.0
+HEARTBEAT_SECONDS = 15.0
+
+
+class ChangeFeed:
+    def __init__(self, name: str, history: int = DEFAULT_HISTORY):
+        self.name = name
+        self.epoch = secrets.token_hex(4)
+        self.version = 0
+        self.key_versions: Dict[str, int] = {}
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._changed = threading.Condition()
+
+    def publish(self, change_type: str, key: str, data: Optional[Dict[str, Any]] = None) -> int:
+        """Record a change to item `key` and wake up waiting clients; returns the new version"""
+        with self._changed:
+            self.version += 1
+            self.key_versions[str(key)] = self.version
+            self._events.append({
+                'version': self.version,
+                'type': change_type,
+                'key': str(key),
+                'data': dict(data) if data is not None else None,
+                'at': datetime.now().isoformat()
+            })
+            self._changed.notify_all()
+            return self.version
+
+    def since(self, version: int) -> Optional[List[Dict[str, Any]]]:
+        """Changes after `version`, or None if the history no longer reaches back that far"""
+        with self._changed:
+            if version > self.version:
+                return None
+            if version == self.version:
+                return []
+            if not self._events or self._events[0]['version'] > version + 1:
+                return None
+            return [event for event in self._events if event['version'] > version]
+
+    def wait(self, version: int, timeout: float) -> Optional[List[Dict[str, Any]]]:
+        """Like since(), but blocks up to `timeout` seconds for the next change"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout=timeout)
+        return self.since(version)
+
+    def cursor(self, version: Optional[int] = None) -> str:
+        """Feed position token for `version` (default: the current one)"""
+        return f"{self.epoch}-{self.version if version is None else version}"
+
+    def position(self, token: Optional[str]) -> Optional[int]:
+        """
+        Version a `since` token points at; None if it is from another epoch
+
+        A bare version is accepted too. Missing or unreadable tokens mean "now".
+        """
+        if token is None:
+            return self.version
+        epoch, _, number = token.rpartition('-')
+        try:
+            version = int(float(number))
+        except ValueError:
+            return self.version
+        if epoch and epoch != self.epoch:
+            return None
+        return version
+
+    def etag(self, *parts: Any) -> str:
+        """ETag of a collection view: epoch and store version plus a digest of the view parameters"""
+        view = "|".join(str(part) for part in parts).encode("utf-8")
+        return f"{self.name}-{self.epoch}-{self.version}-{zlib.crc32(view):08x}"
+
+    def item_etag(self, key: str) -> str:
+        return f"{self.name}-{self.epoch}-{key}-{self.key_versions.get(str(key), 0)}"
+
+
+def conditional(etag: str, build: Callable[[], Any], weak: bool = False) -> Response:
+    """Answer 304 if the client's If-None-Match matches `etag`, else build the response and tag it"""
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+    response.set_etag(etag, weak=weak)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _number_arg(value: Optional[str], default: float) -> float:
+    try:
+        return float(value) if value is not None else default
+    except ValueError:
+        return default
+
+
+def poll_response(feed: ChangeFeed) -> Response:
+    """Long-poll: changes after ?since= (default: now), waiting up to ?timeout= seconds"""
+    since = feed.position(request.args.get('since'))
+    timeout = min(max(_number_arg(request.args.get('timeout'), 25.0), 0.0), MAX_POLL_SECONDS)
+    changes = feed.wait(since, timeout) if since is not None else None
+    version = changes[-1]['version'] if changes else feed.version
+    return jsonify({'version': version, 'epoch': feed.epoch, 'cursor': feed.cursor(version),
+                    'reset': changes is None, 'changes': changes or []})
+
+
+def _sse(feed: ChangeFeed, event: Dict[str, Any]) -> bytes:
+    return (f"id: {feed.cursor(event['version'])}\nevent: {event['type']}\ndata: ".encode("utf-8")
+            + json_codec.dumps_bytes(event) + b"\n\n")
+
+
+def stream_response(feed: ChangeFeed) -> Response:
+    """Server-Sent Events from Last-Event-ID (or ?since=, default: now) onwards"""
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+    start = feed.position(last_id)
+
+    def events() -> Iterator[bytes]:
+        # -1 forces an initial reset for a position from another epoch
+        version = start if start is not None else -1
+        yield b"retry: 3000\n\n"
+        while True:
+            changes = feed.wait(version, HEARTBEAT_SECONDS) if version >= 0 else None
+            if changes is None:
+                version = feed.version
+                yield (f"id: {feed.cursor(version)}\nevent: reset\ndata: ".encode("utf-8")
+                       + json_codec.dumps_bytes({'version': version, 'epoch': feed.epoch}) + b"\n\n")
+            elif changes:
+                for event in changes:
+                    yield _sse(feed, event)
+                version = changes[-1]['version']
+            else:
+                yield b": keep-alive\n\n"
+
+    response = Response(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,15 +1,120 @@
 from flask import Flask, request, jsonify
+import threading
+import time
 import uuid
 from datetime import datetime
 
+import health
+import json_codec
+import structured_log
+from analytics import DayGrid, parse_range
+from compact_store import CATEGORY, OBJECT, TIMESTAMP, UUID, RecordTable
+from guest_index import MATCH_THRESHOLD, GuestIndex
+from idempotency import IdempotencyCache, idempotent
+from loyalty import MAX_POINTS, LoyaltyLedger, valid_accrual
+from pagination import paginated_response
+
 app = Flask(__name__)
+json_codec.install(app)
+structured_log.install(app)
+health.install(app, 'BeyClient')
+log = structured_log.get_logger("client")
 
 # Mock database
 clients = {}
-complaints_db = {}
+complaints_db = RecordTable([
+    ('id', UUID), ('client_id', UUID), ('room_id', CATEGORY), ('description', OBJECT),
+    ('category', CATEGORY), ('status', CATEGORY), ('created_at', TIMESTAMP), ('closed_at', TIMESTAMP)
+], indexed=('client_id',))
+# Complaints per day and category, maintained on log/classify/close
+COMPLAINT_CATEGORIES = ('unclassified', 'general', 'technical', 'billing')
+complaint_stats = DayGrid(COMPLAINT_CATEGORIES)
+idempotency_cache = IdempotencyCache()
+# Append-only points ledger; balances are counters, accruals are applied in background batches
+loyalty = LoyaltyLedger()
+MAX_ACCRUAL_BATCH = 5000
+
+
+# Fuzzy name/email/phone index; merged duplicates stay indexed and resolve to the surviving client
+guest_index = GuestIndex()
+merged_into = {}
+merge_lock = threading.Lock()
+dedup_report = {'status': 'idle'}
+dedup_lock = threading.Lock()
+MAX_SEARCH_RESULTS = 50
+
+
+def _with_balance(client):
+    return {**client, 'loyalty_points': loyalty.balance(client['id'])}
+
+
+def _reclassify(complaint, category):
+    """Move a complaint to another category and KPI bucket"""
+    if category != complaint['category']:
+        complaints_db.update(complaint['id'], category=category)
+        complaint_stats.add(complaint['created_at'], complaint['category'], -1.0, -1)
+        complaint_stats.add(complaint['created_at'], category)
+
+
+def _resolve(client_id):
+    while client_id in merged_into:
+        client_id = merged_into[client_id]
+    return client_id
+
+
+def merge_clients(survivor_id, duplicate_ids):
+    """Fold duplicates into the surviving client: missing fields, loyalty points and complaints"""
+    with merge_lock:
+        survivor = clients[survivor_id]
+        for duplicate_id in duplicate_ids:
+            duplicate = clients.pop(duplicate_id, None)
+            if duplicate is None:
+                continue
+            merged_into[duplicate_id] = survivor_id
+            for field in ('first_name', 'last_name', 'email', 'phone'):
+                if not survivor.get(field) and duplicate.get(field):
+                    survivor[field] = duplicate[field]
+            survivor['preferences'] = {**(duplicate.get('preferences') or {}), **(survivor.get('preferences') or {})}
+            survivor['merged_from'] = survivor.get('merged_from', []) + [duplicate_id]
+            points = loyalty.balance(duplicate_id)
+            if points:
+                loyalty.adjust(duplicate_id, -points, f"merge-out:{duplicate_id}")
+                loyalty.adjust(survivor_id, points, f"merge-in:{duplicate_id}")
+            for complaint in list(complaints_db.select('client_id', duplicate_id)):
+                complaints_db.update(complaint['id'], client_id=survivor_id)
+
+
+def run_dedup(threshold, dry_run):
+    """Batch job: merge every group of near-duplicate clients into its oldest member"""
+    started = time.monotonic()
+    groups = []
+    for group in guest_index.duplicate_groups(threshold):
+        live = list(dict.fromkeys(_resolve(client_id) for client_id in group))
+        live = [client_id for client_id in live if client_id in clients]
+        if len(live) < 2:
+            continue
+        if not dry_run:
+            merge_clients(live[0], live[1:])
+        groups.append(live)
+    dedup_report.update({
+        'status': 'done', 'dry_run': dry_run, 'threshold': threshold, 'groups': groups,
+        'merged_clients': sum(len(group) - 1 for group in groups),
+        'seconds': round(time.monotonic() - started, 3), 'finished_at': datetime.now().isoformat()
+    })
+
+
+def _run_dedup_job(threshold, dry_run):
+    """run_dedup in the background thread; a failure ends the report as 'failed' instead of 'running'"""
+    try:
+        run_dedup(threshold, dry_run)
+    except Exception as e:
+        log.exception("dedup job failed")
+        dedup_report.update({'status': 'failed', 'error': str(e), 'finished_at': datetime.now().isoformat()})
+
 
 class ClientService:
     @app.route('/api/clients/create', methods=['POST'])
+    @idempotent(idempotency_cache)
     def create_client():
         data = request.json
         client_id = str(uuid.uuid4())
@@ -20,60 +125,180 @@ class ClientService:
             'last_name': data.get('last_name'),
             'email': data.get('email'),
             'phone': data.get('phone'),
-            'loyalty_points': 0,
             'preferences': data.get('preferences', {})
         }
         
         clients[client_id] = client
+        guest_index.add(client_id, client)
         return jsonify({'client_id': client_id, 'status': 'created'})
 
     @app.route('/api/clients/<client_id>', methods=['GET'])
     def get_client(client_id):
-        client = clients.get(client_id)
+        """A merged duplicate id returns the client it was merged into"""
+        client = clients.get(_resolve(client_id))
         if client:
-            return jsonify(client)
+            return jsonify(_with_balance(client))
         return jsonify({'error': 'Client not found'}), 404
 
+    @app.route('/api/clients/<client_id>/loyalty', methods=['GET'])
+    def get_loyalty_points(client_id):
+        """Balance from the running counter; does not wait for pending accruals"""
+        if client_id not in clients:
+            return jsonify({'error': 'Client not found'}), 404
+        return jsonify({'client_id': client_id, 'loyalty_points': loyalty.balance(client_id)})
+
     @app.route('/api/clients/<client_id>/loyalty', methods=['PUT'])
-    def update_loyalty_points():
-        data = request.json
-        client_id = data.get('client_id')
+    @idempotent(idempotency_cache)
+    def update_loyalty_points(client_id):
+        """Add (or, with negative points, redeem) points right away: {"points": n, "reference": "..."}"""
+        data = request.json or {}
+        if client_id not in clients:
+            return jsonify({'error': 'Client not found'}), 404
         points = data.get('points', 0)
-        
-        if client_id in clients:
-            clients[client_id]['loyalty_points'] += points
-            return jsonify({'loyalty_points': clients[client_id]['loyalty_points']})
-        return jsonify({'error': 'Client not found'}), 404
+        if not isinstance(points, int) or isinstance(points, bool) or abs(points) > MAX_POINTS:
+            return jsonify({'error': f'points must be an integer within ±{MAX_POINTS}'}), 400
+        if not isinstance(data.get('reference'), (str, type(None))):
+            return jsonify({'error': 'reference must be a string'}), 400
+        try:
+            balance = loyalty.adjust(client_id, points, data.get('reference'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 409
+        return jsonify({'client_id': client_id, 'loyalty_points': balance})
+
+    @app.route('/api/clients/<client_id>/loyalty/history', methods=['GET'])
+    def get_loyalty_history(client_id):
+        if client_id not in clients:
+            return jsonify({'error': 'Client not found'}), 404
+        return paginated_response(loyalty.history(client_id), render=loyalty.row)
+
+    @app.route('/api/loyalty/accruals', methods=['POST'])
+    def post_accruals():
+        """
+        Queue accruals for the background applier: {"accruals": [{client_id, kind, amount|points, source}, ...]}
+
+        kind is payment or compensation; 202 once queued, 503 if the queue is full (retry later).
+        """
+        accruals = (request.json or {}).get('accruals')
+        if not isinstance(accruals, list) or not accruals:
+            return jsonify({'error': 'accruals must be a non-empty list'}), 400
+        if len(accruals) > MAX_ACCRUAL_BATCH:
+            return jsonify({'error': f'Batch too large (max {MAX_ACCRUAL_BATCH})'}), 400
+        valid = [{**accrual, 'client_id': _resolve(accrual['client_id'])}
+                 for accrual in accruals if valid_accrual(accrual)]
+        if valid and not loyalty.enqueue(valid):
+            return jsonify({'error': 'Accrual queue full'}), 503
+        return jsonify({'queued': len(valid), 'rejected': len(accruals) - len(valid)}), 202
 
     @app.route('/api/clients/search', methods=['GET'])
     def search_clients():
-        email = request.args.get('email')
-        if email:
-            found_clients = [client for client in clients.values() if client.get('email') == email]
-            return jsonify(found_clients)
-        return jsonify([])
+        """
+        Ranked fuzzy match on ?email= ?phone= ?first_name= ?last_name= (or ?name=)
+
+        Each client carries its match_score. Only matches scoring at least
+        ?min_score= (default: the auto-match threshold) are returned, so an
+        email-only search still returns exact matches only.
+        """
+        fields = {field: request.args.get(field) for field in ('email', 'phone', 'first_name', 'last_name', 'name')
+                  if request.args.get(field)}
+        if not fields:
+            return jsonify([])
+        min_score = request.args.get('min_score', MATCH_THRESHOLD, type=float)
+        limit = min(request.args.get('limit', 10, type=int), MAX_SEARCH_RESULTS)
+        found_clients, seen = [], set()
+        for client_id, score in guest_index.search(limit=limit * 2, min_score=min_score, **fields):
+            client_id = _resolve(client_id)
+            if client_id in clients and client_id not in seen:
+                seen.add(client_id)
+                found_clients.append({**_with_balance(clients[client_id]), 'match_score': score})
+        return jsonify(found_clients[:limit])
+
+    @app.route('/api/clients/dedup', methods=['POST'])
+    def start_dedup():
+        """Run the duplicate merge job in the background: {"threshold": 0.85, "dry_run": false}"""
+        data = request.get_json(silent=True) or {}
+        try:
+            threshold = float(data.get('threshold', MATCH_THRESHOLD))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'threshold must be a number'}), 400
+        dry_run = bool(data.get('dry_run', False))
+        with dedup_lock:
+            if dedup_report.get('status') == 'running':
+                return jsonify({'error': 'Dedup job already running'}), 409
+            dedup_report.clear()
+            dedup_report.update({'status': 'running', 'threshold': threshold, 'dry_run': dry_run})
+            report = dict(dedup_report)
+        threading.Thread(target=_run_dedup_job, name="client-dedup", daemon=True, args=(threshold, dry_run)).start()
+        return jsonify(report), 202
+
+    @app.route('/api/clients/dedup', methods=['GET'])
+    def get_dedup_report():
+        return jsonify(dedup_report)
 
     @app.route('/api/complaints/log', methods=['POST'])
+    @idempotent(idempotency_cache)
     def log_complaint():
         data = request.json
+        if not isinstance(data.get('category') or '', str):
+            return jsonify({'error': 'category must be a string'}), 400
         complaint_id = str(uuid.uuid4())
         complaint = {
             'id': complaint_id,
             'client_id': data.get('client_id'),
             'room_id': data.get('room_id'),
             'description': data.get('description'),
+            'category': data.get('category') or 'unclassified',
             'status': 'open',
             'created_at': datetime.now().isoformat()
         }
-        # Store complaint in in‑memory dict (demo only)
-        complaints_db[complaint_id] = complaint
+        # Store complaint in the in-memory table (demo only)
+        complaints_db.insert(complaint)
+        complaint_stats.add(complaint['created_at'], complaint['category'])
 
         return jsonify({'complaint_id': complaint_id, 'status': 'logged'})
 
     @app.route('/api/complaints/<complaint_id>/close', methods=['PUT'])
     def close_complaint(complaint_id):
-        # Mock closing
-        return jsonify({'status': 'closed', 'closed_at': datetime.now().isoformat()})
+        """Close a complaint; an optional category (the process's triage) is recorded as by /classify"""
+        category = (request.get_json(silent=True) or {}).get('category')
+        if not isinstance(category or '', str):
+            return jsonify({'error': 'category must be a string'}), 400
+        complaint = complaints_db.get(complaint_id)
+        if category and complaint:
+            _reclassify(complaint, category)
+        closed_at = datetime.now().isoformat()
+        complaints_db.update(complaint_id, status='closed', closed_at=closed_at)
+        return jsonify({'status': 'closed', 'closed_at': closed_at})
+
+    @app.route('/api/complaints/<complaint_id>/classify', methods=['PUT'])
+    def classify_complaint(complaint_id):
+        """Set the category chosen by the complaint process (moves the complaint between KPI buckets)"""
+        category = (request.json or {}).get('category')
+        complaint = complaints_db.get(complaint_id)
+        if not complaint:
+            return jsonify({'error': 'Complaint not found'}), 404
+        if not category or not isinstance(category, str):
+            return jsonify({'error': 'category is required'}), 400
+        _reclassify(complaint, category)
+        return jsonify({'complaint_id': complaint_id, 'category': category})
+
+    @app.route('/api/analytics/complaints', methods=['GET'])
+    def get_complaint_kpis():
+        """Complaints by category over [?from, ?to) (default: last 30 days), with each category's share"""
+        try:
+            start, end = parse_range(request.args.get('from'), request.args.get('to'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        by_category = {category: totals['count'] for category, totals in complaint_stats.totals(start, end).items()
+                       if totals['count']}
+        total = sum(by_category.values())
+        return jsonify({
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'total': total,
+            'by_category': {category: {'complaints': count, 'share': round(count / total, 4)}
+                            for category, count in by_category.items()},
+            'by_day': [{'date': d['date'], 'complaints': d['count']} for d in complaint_stats.daily(start, end)]
+        })
 
 
 if __name__ == '__main__':
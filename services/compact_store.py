@@ -0,0 +1,269 @@
+"""
+Column-oriented record tables for the high-volume service stores.
+
+A dict per booking/order/document repeats every key string and keeps uuid4
+ids and ISO timestamps as ~80-byte str objects. A RecordTable stores each
+field in its own column instead, the same way the payment ledger does:
+
+  uuid       16 bytes per row in one bytearray (primary keys and references
+             to other records); a value that is not a canonical lowercase
+             UUID string is kept as a str on the side, so every id reads
+             back exactly as it was written
+  timestamp  int64 microseconds since the epoch (local time, as isoformat())
+  category   dictionary-encoded to a uint32 code (statuses, room numbers,
+             dates: values that repeat)
+  int/float  array('q') / array('d'), with None kept in a side set
+  object     plain list for free text and nested values
+
+Records are turned back into dicts only when read, i.e. at the API boundary.
+Category and uuid columns listed in `indexed` also keep the rows of every
+value, so select() on them reads only the matching rows.
+"""
+
+import bisect
+import threading
+import uuid
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+UUID = 'uuid'
+TIMESTAMP = 'timestamp'
+CATEGORY = 'category'
+INT = 'int'
+FLOAT = 'float'
+OBJECT = 'object'
+
+_FIXED_WIDTH = (UUID, TIMESTAMP, INT, FLOAT)
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _to_micros(value: str) -> int:
+    delta = datetime.fromisoformat(value) - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _from_micros(value: int) -> str:
+    return (_EPOCH + timedelta(microseconds=value)).isoformat()
+
+
+class _Column:
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.nulls = set()
+        if kind == UUID:
+            self.data = bytearray()
+            # row -> value that is not a UUID (stored as a zero placeholder)
+            self.other: Dict[int, str] = {}
+        elif kind == TIMESTAMP or kind == INT:
+            self.data = array('q')
+        elif kind == FLOAT:
+            self.data = array('d')
+        elif kind == CATEGORY:
+            self.data = array('I')
+            self.keys: List[Any] = []
+            self.index: Dict[Any, int] = {}
+            # Inserts and updates encode outside the table lock
+            self._grow = threading.Lock()
+        elif kind == OBJECT:
+            self.data = []
+        else:
+            raise ValueError(f"Unknown column kind: {kind}")
+
+    def encode(self, value: Any) -> Any:
+        if self.kind == CATEGORY:
+            code = self.index.get(value)
+            if code is None:
+                with self._grow:
+                    code = self.index.get(value)
+                    if code is None:
+                        code = len(self.keys)
+                        self.keys.append(value)
+                        self.index[value] = code
+            return code
+        if value is None:
+            return None
+        if self.kind == UUID:
+            text = str(value)
+            try:
+                parsed = uuid.UUID(text)
+            except ValueError:
+                return text
+            return parsed.bytes if str(parsed) == text else text
+        if self.kind == TIMESTAMP:
+            return _to_micros(value)
+        if self.kind == INT:
+            return int(value)
+        if self.kind == FLOAT:
+            return float(value)
+        return value
+
+    def _null(self, row: int, stored: Any) -> Any:
+        # Fixed-width columns keep a placeholder and remember the row in `nulls`
+        if self.kind not in _FIXED_WIDTH:
+            return stored
+        if self.kind == UUID:
+            if isinstance(stored, str):
+                self.other[row] = stored
+                self.nulls.discard(row)
+                return bytes(16)
+            self.other.pop(row, None)
+        if stored is None:
+            self.nulls.add(row)
+            return bytes(16) if self.kind == UUID else 0
+        self.nulls.discard(row)
+        return stored
+
+    def key(self, row: int) -> Any:
+        """The encoded value of a row, as encode() returns it"""
+        if self.kind == CATEGORY:
+            return self.data[row]
+        if self.kind == UUID:
+            if row in self.other:
+                return self.other[row]
+            if row in self.nulls:
+                return None
+            return bytes(self.data[row * 16:row * 16 + 16])
+        return self.get(row)
+
+    def append(self, row: int, encoded: Any) -> None:
+        stored = self._null(row, encoded)
+        if self.kind == UUID:
+            self.data += stored
+        else:
+            self.data.append(stored)
+
+    def set(self, row: int, encoded: Any) -> None:
+        stored = self._null(row, encoded)
+        if self.kind == UUID:
+            self.data[row * 16:row * 16 + 16] = stored
+        else:
+            self.data[row] = stored
+
+    def get(self, row: int) -> Any:
+        if self.kind == CATEGORY:
+            return self.keys[self.data[row]]
+        if row in self.nulls:
+            return None
+        if self.kind == UUID:
+            if row in self.other:
+                return self.other[row]
+            return str(uuid.UUID(bytes=bytes(self.data[row * 16:row * 16 + 16])))
+        if self.kind == TIMESTAMP:
+            return _from_micros(self.data[row])
+        return self.data[row]
+
+
+class RecordTable:
+    """
+    Compact replacement for a `{id: dict}` store.
+
+    Args:
+        schema: (field, kind) pairs; the first field is the uuid primary key
+        omit_none: Leave fields that are None out of materialized records
+        indexed: Category or uuid fields whose rows are indexed by value for select()
+    """
+
+    def __init__(self, schema: Sequence[Tuple[str, str]], omit_none: bool = False, indexed: Sequence[str] = ()):
+        if not schema or schema[0][1] != UUID:
+            raise ValueError("The first field must be the uuid primary key")
+        self.fields = [name for name, _ in schema]
+        self.key_field = self.fields[0]
+        self.columns = {name: _Column(kind) for name, kind in schema}
+        for name in indexed:
+            if self.columns[name].kind not in (CATEGORY, UUID):
+                raise ValueError(f"Only category and uuid fields can be indexed: {name}")
+        # field -> encoded value -> rows in ascending order
+        self._postings: Dict[str, Dict[Any, array]] = {name: {} for name in indexed}
+        # encoded key (bytes, or the str of a non-canonical id) -> row
+        self._rows: Dict[Any, int] = {}
+        self._count = 0
+        self.omit_none = omit_none
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _row(self, record_id: Any) -> Optional[int]:
+        if record_id is None:
+            return None
+        return self._rows.get(self.columns[self.key_field].encode(record_id))
+
+    def __contains__(self, record_id: Any) -> bool:
+        return self._row(record_id) is not None
+
+    def insert(self, record: Dict[str, Any]) -> None:
+        """Add a record; fields outside the schema are not stored"""
+        key = self.columns[self.key_field].encode(record[self.key_field])
+        if key is None:
+            raise KeyError(f"Missing {self.key_field}")
+        # Encode everything first so a bad value can't leave the columns misaligned
+        encoded = [(self.columns[name], self.columns[name].encode(record.get(name))) for name in self.fields]
+        with self._lock:
+            if key in self._rows:
+                raise KeyError(f"Duplicate {self.key_field}: {record[self.key_field]}")
+            row = self._count
+            for column, value in encoded:
+                column.append(row, value)
+            for name, postings in self._postings.items():
+                postings.setdefault(self.columns[name].key(row), array('q')).append(row)
+            self._rows[key] = row
+            self._count += 1
+
+    def record(self, row: int) -> Dict[str, Any]:
+        record = {name: self.columns[name].get(row) for name in self.fields}
+        if self.omit_none:
+            return {name: value for name, value in record.items() if value is not None}
+        return record
+
+    def get(self, record_id: Any) -> Optional[Dict[str, Any]]:
+        row = self._row(record_id)
+        return self.record(row) if row is not None else None
+
+    def update(self, record_id: Any, **changes: Any) -> bool:
+        """Change fields of a record in place; False if it does not exist"""
+        row = self._row(record_id)
+        if row is None:
+            return False
+        encoded = [(name, self.columns[name].encode(value)) for name, value in changes.items()]
+        with self._lock:
+            for name, value in encoded:
+                column = self.columns[name]
+                postings = self._postings.get(name)
+                old = column.key(row) if postings is not None else None
+                column.set(row, value)
+                if postings is not None and old != value:
+                    postings[old].remove(row)
+                    bisect.insort(postings.setdefault(value, array('q')), row)
+        return True
+
+    def values(self) -> Iterator[Dict[str, Any]]:
+        """All records in insertion order, materialized one at a time"""
+        for row in range(self._count):
+            yield self.record(row)
+
+    def select_rows(self, field: str, value: Any) -> Sequence[int]:
+        """
+        Ascending rows whose column `field` equals `value`
+
+        For an indexed field this is the live posting list (no copy), so a
+        paginated reader can binary-search it; don't modify it.
+        """
+        column = self.columns[field]
+        if column.kind == CATEGORY:
+            code = column.index.get(value)
+            if code is None:
+                return ()
+        else:
+            code = column.encode(value)
+        if field in self._postings:
+            return self._postings[field].get(code, ())
+        return [row for row in range(self._count) if column.key(row) == code]
+
+    def select(self, field: str, value: Any) -> Iterator[Dict[str, Any]]:
+        """Records whose column `field` equals `value`, without materializing the others"""
+        return (self.record(row) for row in list(self.select_rows(field, value)))
+
+    def insert_many(self, records: Iterable[Dict[str, Any]]) -> None:
+        for record in records:
+            self.insert(record)
@@ -0,0 +1,170 @@
+"""
+Document pipeline for BeyAccounting: template rendering and a content-addressed
+on-disk store.
+
+Documents are rendered from string templates in a background thread pool, so
+the request that asks for an invoice returns as soon as the render is queued.
+Rendered bytes are stored under their SHA-256 digest; identical documents are
+written once and the digest doubles as a strong ETag for downloads.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from html import escape
+from string import Template
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'documents')
+
+INVOICE_TEMPLATE = Template("""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Invoice $invoice_id</title></head>
+<body>
+<h1>Hotel Bey - Invoice</h1>
+<table>
+<tr><th>Invoice</th><td>$invoice_id</td></tr>
+<tr><th>Booking</th><td>$booking_id</td></tr>
+<tr><th>Payment</th><td>$payment_id</td></tr>
+<tr><th>Guest</th><td>$client_name</td></tr>
+<tr><th>Amount</th><td>$total_amount</td></tr>
+<tr><th>Issued</th><td>$generated_at</td></tr>
+</table>
+</body></html>
+""")
+
+CONFIRMATION_TEMPLATE = Template("""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Booking confirmation $doc_id</title></head>
+<body>
+<h1>Hotel Bey - Booking Confirmation</h1>
+<p>Dear $client_name,</p>
+<p>Your booking <strong>$booking_id</strong> is confirmed.</p>
+<p>Amount billed: $amount_billed</p>
+<p>Issued: $generated_at</p>
+</body></html>
+""")
+
+TEMPLATES = {
+    'invoice': INVOICE_TEMPLATE,
+    'booking_confirmation': CONFIRMATION_TEMPLATE,
+}
+
+CONTENT_TYPE = 'text/html; charset=utf-8'
+
+
+def render(doc_type: str, fields: Dict[str, Any]) -> bytes:
+    """Render a document; missing fields are left blank and every value is HTML-escaped"""
+    template = TEMPLATES[doc_type]
+    values = {key: escape('' if value is None else str(value)) for key, value in fields.items()}
+    return template.safe_substitute(_Blank(values)).encode('utf-8')
+
+
+class _Blank(dict):
+    def __missing__(self, key):
+        return ''
+
+
+class DocumentStore:
+    """Content-addressed file store: <root>/<2 hex chars>/<sha256>"""
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path_for(digest))
+
+    def put(self, content: bytes) -> str:
+        """Store bytes and return their digest; existing content is not rewritten"""
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial document
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest
+
+
+class DocumentRenderer:
+    """
+    Renders document records off the request path.
+
+    Status changes are applied to the record dict and, if given, passed to
+    on_change(document, changes) so a separate store can be kept in sync.
+    """
+
+    def __init__(self, store: DocumentStore, max_workers: int = 2,
+                 on_change: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None):
+        self.store = store
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='doc-render')
+        self.on_change = on_change
+        self._lock = threading.Lock()
+
+    def _set(self, document: Dict[str, Any], **changes: Any) -> None:
+        with self._lock:
+            document.update(changes)
+        if self.on_change:
+            self.on_change(document, changes)
+
+    def _render_one(self, document: Dict[str, Any]) -> str:
+        content = render(document['type'], document)
+        digest = self.store.put(content)
+        self._set(document, content_hash=digest, size=len(content), status='generated')
+        return digest
+
+    def submit(self, document: Dict[str, Any],
+               on_error: Optional[Callable[[Dict[str, Any], Exception], None]] = None) -> Future:
+        """Queue one document; its record gets status 'generated' and a content_hash when done"""
+        self._set(document, status='rendering')
+
+        def task():
+            try:
+                return self._render_one(document)
+            except Exception as e:
+                self._set(document, status='failed', error=str(e))
+                if on_error:
+                    on_error(document, e)
+                raise
+
+        return self.executor.submit(task)
+
+    def submit_bulk(self, documents: Iterable[Dict[str, Any]]) -> Future:
+        """Render a whole batch (e.g. a day's invoices) as a single background job"""
+        batch = list(documents)
+        for document in batch:
+            self._set(document, status='rendering')
+
+        def task() -> Dict[str, Any]:
+            rendered, failed = 0, []
+            for document in batch:
+                try:
+                    self._render_one(document)
+                    rendered += 1
+                except Exception as e:
+                    self._set(document, status='failed', error=str(e))
+                    failed.append(document.get('doc_id'))
+            return {'rendered': rendered, 'failed': failed}
+
+        return self.executor.submit(task)
+
+
+def select_for_day(documents: Iterable[Dict[str, Any]], day: str, doc_type: str = 'invoice',
+                   include_rendered: bool = False) -> List[Dict[str, Any]]:
+    """Documents of one type generated on `day` (YYYY-MM-DD)"""
+    return [d for d in documents
+            if d.get('type') == doc_type
+            and str(d.get('generated_at', '')).startswith(day)
+            and (include_rendered or d.get('status') in ('pending', 'failed'))]
@@ -0,0 +1,251 @@
+"""
+Fuzzy guest search over names, emails and phone numbers.
+
+Profiles are normalized (accents and punctuation stripped from names, +tags
+and gmail dots from emails, phones reduced to their last PHONE_DIGITS
+digits) and indexed in an inverted index of:
+
+  n:<trigram>   name trigrams, so "Jon Smiht" still finds "John Smith"
+  m:<trigram>   email local-part trigrams
+  e:<email>     the whole normalized email
+  p:<phone>     the last PHONE_KEY_DIGITS digits of the phone number, so
+                numbers with and without country code share a key
+
+A lookup adds the IDF weight of every query gram to the profiles in its
+posting list (numpy fancy indexing over int64 postings), re-scores the best
+CANDIDATES with match_score() and returns the ranked matches. Common grams
+are skipped while rarer ones exist, so a lookup stays in the low
+milliseconds with hundreds of thousands of profiles.
+
+match_score() compares only the fields both sides have. A different email is
+not held against a match (guests book with several addresses), and a match on
+the name alone is capped at NAME_ONLY_CAP so it never passes MATCH_THRESHOLD:
+an equal email or a matching phone is needed for that. Conversely an equal
+email or an exact phone match scores at least MATCH_THRESHOLD whatever the
+name, so a typo in the name doesn't hide the guest; a stricter threshold
+still asks the names to agree.
+"""
+
+import math
+import re
+import threading
+import unicodedata
+from array import array
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+PHONE_DIGITS = 9
+PHONE_KEY_DIGITS = 7
+CANDIDATES = 50
+# Grams in more than this share of the profiles (and at least COMMON_GRAM_MIN) are "common"
+COMMON_GRAM_RATIO = 0.05
+COMMON_GRAM_MIN = 1000
+MATCH_THRESHOLD = 0.85
+NAME_ONLY_CAP = 0.7
+FIELD_WEIGHTS = {'name': 0.4, 'email': 0.35, 'phone': 0.25}
+MAX_BLOCK = 100
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_name(*parts: Optional[str]) -> str:
+    text = " ".join(part for part in parts if part)
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").lower()
+    return " ".join(_NON_WORD.split(text)).strip()
+
+
+def normalize_email(email: Optional[str]) -> str:
+    email = (email or "").strip().lower()
+    if "@" not in email:
+        return email
+    local, domain = email.rsplit("@", 1)
+    local = local.split("+", 1)[0]
+    if domain in ("gmail.com", "googlemail.com"):
+        local, domain = local.replace(".", ""), "gmail.com"
+    return f"{local}@{domain}"
+
+
+def normalize_phone(phone: Optional[str]) -> str:
+    digits = re.sub(r"\D", "", str(phone or ""))
+    return digits[-PHONE_DIGITS:] if len(digits) >= PHONE_KEY_DIGITS else ""
+
+
+def trigrams(text: str) -> Set[str]:
+    grams = set()
+    for word in text.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class Profile:
+    __slots__ = ('client_id', 'name', 'email', 'phone', 'name_grams', 'compact_grams')
+
+    def __init__(self, client_id: str, name: str, email: str, phone: str):
+        self.client_id = client_id
+        self.name = name
+        self.email = email
+        self.phone = phone
+        self.name_grams = trigrams(name)
+        # "Ben Ali" and "Benali" differ per word but not once the spaces are gone
+        self.compact_grams = trigrams(name.replace(" ", ""))
+
+    @classmethod
+    def of(cls, client_id: str, first_name: Optional[str] = None, last_name: Optional[str] = None,
+           email: Optional[str] = None, phone: Optional[str] = None, name: Optional[str] = None) -> "Profile":
+        return cls(client_id, normalize_name(name) if name else normalize_name(first_name, last_name),
+                   normalize_email(email), normalize_phone(phone))
+
+    def grams(self) -> Set[str]:
+        grams = {"n:" + gram for gram in self.name_grams}
+        if self.email:
+            grams.add("e:" + self.email)
+            grams.update("m:" + gram for gram in trigrams(self.email.split("@", 1)[0]))
+        if self.phone:
+            grams.add("p:" + self.phone[-PHONE_KEY_DIGITS:])
+        return grams
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def _phone_similarity(a: str, b: str) -> float:
+    """1.0 if the trailing digits agree (with or without country code), 0.8 for one mistyped digit"""
+    length = min(len(a), len(b))
+    mismatches = sum(x != y for x, y in zip(a[-length:], b[-length:]))
+    return 1.0 if mismatches == 0 else 0.8 if mismatches == 1 else 0.0
+
+
+def match_score(query: Profile, profile: Profile) -> float:
+    """0..1 similarity over the fields both profiles have; see the module docstring"""
+    scores = {}
+    if query.name and profile.name:
+        scores['name'] = max(_jaccard(query.name_grams, profile.name_grams),
+                             _jaccard(query.compact_grams, profile.compact_grams))
+    if query.email and profile.email == query.email:
+        scores['email'] = 1.0
+    if query.phone and profile.phone:
+        scores['phone'] = _phone_similarity(query.phone, profile.phone)
+    if not scores:
+        return 0.0
+    score = sum(FIELD_WEIGHTS[field] * value for field, value in scores.items()) / sum(
+        FIELD_WEIGHTS[field] for field in scores)
+    if scores.get('email', 0.0) < 1.0 and scores.get('phone', 0.0) < 0.8:
+        score = min(score, NAME_ONLY_CAP)
+    elif scores.get('email', 0.0) == 1.0 or scores.get('phone', 0.0) == 1.0:
+        score = max(score, MATCH_THRESHOLD)
+    return round(score, 4)
+
+
+class GuestIndex:
+    def __init__(self):
+        self.profiles: List[Profile] = []
+        self._doc: Dict[str, int] = {}
+        self._postings: Dict[str, array] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, client_id: str, client: Dict[str, Any]) -> None:
+        """Index (or re-index) a client record"""
+        profile = Profile.of(client_id, client.get('first_name'), client.get('last_name'),
+                             client.get('email'), client.get('phone'))
+        with self._lock:
+            if client_id in self._doc:
+                self._remove(client_id)
+            doc = len(self.profiles)
+            self.profiles.append(profile)
+            self._doc[client_id] = doc
+            if doc >= len(self._alive):
+                self._alive = np.concatenate([self._alive, np.zeros(max(doc + 1, 1024, len(self._alive)), dtype=bool)])
+            self._alive[doc] = True
+            self._count += 1
+            for gram in profile.grams():
+                self._postings.setdefault(gram, array('q')).append(doc)
+
+    def remove(self, client_id: str) -> bool:
+        with self._lock:
+            return self._remove(client_id)
+
+    def _remove(self, client_id: str) -> bool:
+        # Postings keep the doc; it is masked out by _alive
+        doc = self._doc.pop(client_id, None)
+        if doc is None:
+            return False
+        self._alive[doc] = False
+        self._count -= 1
+        return True
+
+    def search(self, limit: int = 10, min_score: float = 0.0, **fields: Optional[str]) -> List[Tuple[str, float]]:
+        """
+        Ranked (client_id, score) matches
+
+        Args:
+            limit: Most matches to return
+            min_score: Drop matches scoring lower
+            **fields: Any of first_name, last_name, name, email, phone
+        """
+        query = Profile.of('', **fields)
+        grams = query.grams()
+        if not grams:
+            return []
+        with self._lock:
+            total = len(self.profiles)
+            weighted = []
+            for gram in grams:
+                postings = self._postings.get(gram)
+                if postings:
+                    weighted.append((len(postings), math.log(1 + total / len(postings)), postings))
+            if not weighted:
+                return []
+            rare = [entry for entry in weighted if entry[0] <= max(COMMON_GRAM_RATIO * total, COMMON_GRAM_MIN)]
+            scores = np.zeros(total, dtype=np.float32)
+            for _, weight, postings in rare or weighted:
+                scores[np.frombuffer(postings, dtype=np.int64)] += weight
+            scores[~self._alive[:total]] = 0
+            hits = np.flatnonzero(scores)
+            if len(hits) > CANDIDATES:
+                hits = hits[np.argpartition(scores[hits], -CANDIDATES)[-CANDIDATES:]]
+            candidates = [self.profiles[int(doc)] for doc in hits]
+        ranked = sorted(((profile.client_id, match_score(query, profile)) for profile in candidates),
+                        key=lambda match: -match[1])
+        return [match for match in ranked if match[1] >= min_score and match[1] > 0][:limit]
+
+    def duplicate_groups(self, threshold: float = MATCH_THRESHOLD) -> List[List[str]]:
+        """
+        Groups of client ids that look like the same guest, oldest first
+
+        Profiles are only compared within blocks sharing an exact email or
+        phone; blocks larger than MAX_BLOCK (a switchboard number) are skipped.
+        """
+        with self._lock:
+            blocks = [np.frombuffer(postings, dtype=np.int64) for gram, postings in self._postings.items()
+                      if gram[:2] in ("e:", "p:") and 1 < len(postings) <= MAX_BLOCK]
+            blocks = [block[self._alive[block]] for block in blocks]
+            profiles = self.profiles
+
+        parent: Dict[int, int] = {}
+
+        def find(doc: int) -> int:
+            while parent.get(doc, doc) != doc:
+                parent[doc] = parent.get(parent[doc], parent[doc])
+                doc = parent[doc]
+            return doc
+
+        for block in blocks:
+            docs = [int(doc) for doc in block]
+            for i, first in enumerate(docs):
+                for second in docs[i + 1:]:
+                    if find(first) != find(second) and match_score(profiles[first], profiles[second]) >= threshold:
+                        a, b = sorted((find(first), find(second)))
+                        parent[b] = a
+
+        groups: Dict[int, List[int]] = {}
+        for doc in parent:
+            groups.setdefault(find(doc), []).append(doc)
+        return [[profiles[doc].client_id for doc in sorted({root, *docs})] for root, docs in groups.items()]
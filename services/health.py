@@ -0,0 +1,48 @@
+"""
+Liveness and readiness endpoints for the Flask services.
+
+  GET /api/health   200 as soon as the app serves requests (liveness)
+  GET /api/ready    200 when every readiness check passes, 503 otherwise
+
+Launchers poll /api/ready instead of sleeping; see service_launcher.py.
+"""
+
+import os
+import time
+from typing import Callable, Dict, Optional
+
+from flask import jsonify
+
+STARTED_AT = time.time()
+
+
+def install(app, service: str, checks: Optional[Dict[str, Callable[[], bool]]] = None) -> None:
+    """
+    Args:
+        app: The Flask app
+        service: Service name reported by both endpoints
+        checks: Readiness checks by name; a check fails if it returns False or raises
+    """
+    checks = checks or {}
+
+    @app.route('/api/health', methods=['GET'])
+    def health():
+        return jsonify({
+            'status': 'ok',
+            'service': service,
+            'pid': os.getpid(),
+            'uptime_seconds': round(time.time() - STARTED_AT, 3)
+        })
+
+    @app.route('/api/ready', methods=['GET'])
+    def ready():
+        results = {}
+        for name, check in checks.items():
+            try:
+                results[name] = 'ok' if check() else 'failed'
+            except Exception as e:
+                results[name] = f'failed: {e}'
+        is_ready = all(result == 'ok' for result in results.values())
+        response = jsonify({'status': 'ready' if is_ready else 'not_ready', 'service': service, 'checks': results})
+        response.status_code = 200 if is_ready else 503
+        return response
@@ -0,0 +1,145 @@
+"""
+Idempotency-Key support for the services' create endpoints.
+
+Zeebe redelivers a job when its worker times out, so the same create request
+can arrive several times. Callers send an `Idempotency-Key` header; the first
+response for a key is stored in a bounded, expiring cache and replayed for
+every retry instead of creating a duplicate record.
+"""
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from flask import make_response, request
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# Stored response: (body, status code, mimetype)
+StoredResponse = Tuple[bytes, int, str]
+
+
+class _Pending:
+    """Marker for a key whose first request is still being processed"""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class IdempotencyCache:
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 24 * 3600):
+        """
+        Args:
+            max_entries: Oldest keys are evicted beyond this size
+            ttl_seconds: Stored responses expire after this many seconds
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _evict(self, now: float) -> None:
+        # Oldest first: drop entries over the size bound or past their TTL
+        while self._entries:
+            stored_at, value = next(iter(self._entries.values()))
+            if len(self._entries) <= self.max_entries and now - stored_at < self.ttl_seconds:
+                break
+            self._entries.popitem(last=False)
+            if isinstance(value, _Pending):
+                value.done.set()
+
+    def begin(self, key: str):
+        """
+        Claim a key. Returns the stored response if the key was already
+        completed, a _Pending marker to wait on if another request holds it,
+        or None if the caller now owns the key and must call finish()/abort().
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl_seconds:
+                if not isinstance(entry[1], _Pending):
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                return entry[1]
+            self.misses += 1
+            self._entries[key] = (now, _Pending())
+            self._entries.move_to_end(key)
+            self._evict(now)
+            return None
+
+    def finish(self, key: str, response: StoredResponse) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            self._entries[key] = (time.monotonic(), response)
+        if entry is not None and isinstance(entry[1], _Pending):
+            entry[1].done.set()
+
+    def abort(self, key: str) -> None:
+        """Forget a key whose request failed, so a retry is processed again"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is not None and isinstance(entry[1], _Pending):
+            entry[1].done.set()
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or isinstance(entry[1], _Pending):
+            return None
+        return entry[1]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _replay(stored: StoredResponse):
+    body, status, mimetype = stored
+    response = make_response(body, status)
+    response.mimetype = mimetype
+    response.headers[REPLAYED_HEADER] = "true"
+    return response
+
+
+def idempotent(cache: IdempotencyCache, wait_timeout: float = 30.0):
+    """
+    Decorator for Flask view functions. Requests without an Idempotency-Key
+    header are processed normally. 5xx responses and exceptions are not
+    stored, so the caller may retry them.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            header = request.headers.get(IDEMPOTENCY_HEADER)
+            if not header:
+                return view(*args, **kwargs)
+
+            # Keys are scoped per endpoint so one job key can be reused across services
+            key = f"{request.path}:{header}"
+            claimed = cache.begin(key)
+            if isinstance(claimed, _Pending):
+                claimed.done.wait(wait_timeout)
+                stored = cache.get(key)
+                if stored is None:
+                    return make_response({"error": "Request with this idempotency key is still in progress"}, 409)
+                return _replay(stored)
+            if claimed is not None:
+                return _replay(claimed)
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                cache.abort(key)
+                raise
+            if response.status_code >= 500:
+                cache.abort(key)
+            else:
+                cache.finish(key, (response.get_data(), response.status_code, response.mimetype))
+            return response
+        return wrapper
+    return decorator
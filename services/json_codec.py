@@ -0,0 +1,86 @@
+"""
+JSON encoding shared by the Flask services and the job workers.
+
+Uses orjson when it is installed and falls back to the stdlib json module.
+Both backends produce the same documents: compact output, datetimes and dates
+as ISO-8601 strings, UUIDs as strings, non-string dict keys as strings and
+numpy scalars/arrays as plain numbers/lists.
+
+Services call install(app); workers decode responses with loads(). Flask is
+only imported by install(), so a worker starts without loading it.
+"""
+
+import functools
+import json
+import uuid
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj: Any) -> Any:
+    """Types neither backend encodes natively"""
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, "tolist"):  # numpy arrays and scalars
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def dumps(obj: Any) -> str:
+    return dumps_bytes(obj).decode("utf-8")
+
+
+def loads(data: Union[bytes, bytearray, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+@functools.lru_cache(maxsize=None)
+def provider_class() -> type:
+    """The Flask JSON provider backed by dumps_bytes/loads (jsonify, request.json)"""
+    from flask.json.provider import JSONProvider
+
+    class FastJSONProvider(JSONProvider):
+        mimetype = "application/json"
+
+        def dumps(self, obj: Any, **kwargs: Any) -> str:
+            return dumps(obj)
+
+        def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+            return loads(s)
+
+        def response(self, *args: Any, **kwargs: Any):
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+    return FastJSONProvider
+
+
+def install(app) -> None:
+    """Make jsonify/request.json of a Flask app use this codec"""
+    app.json_provider_class = provider_class()
+    app.json = app.json_provider_class(app)
@@ -0,0 +1,234 @@
+"""
+Kitchen queue: per-station priority queues and a ticket dispatcher.
+
+An order is split into one ticket per kitchen station its items need
+(STATION_BY_CATEGORY). Each station keeps a heap ordered by promised time,
+then order type (seated restaurant guests before room service), then arrival.
+Every station has a fixed number of cooks; the dispatcher hands the head of
+the heap to a free cook as soon as a ticket is queued or a cook finishes, so
+there is no polling loop and queue operations stay O(log n) however long the
+dinner rush gets.
+
+Order status follows its tickets:
+
+  queued      every ticket is waiting for a cook
+  preparing   at least one ticket is being cooked
+  ready       every ticket is done
+
+Status changes are reported through `on_status(order_id, status, detail)`.
+"""
+
+import heapq
+import itertools
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Menu category -> station that cooks it
+STATION_BY_CATEGORY = {
+    'breakfast': 'breakfast',
+    'lunch': 'hot_line',
+    'dinner': 'hot_line',
+    'room_service': 'room_service',
+}
+DEFAULT_STATION = 'hot_line'
+DEFAULT_COOKS = {'breakfast': 2, 'hot_line': 4, 'room_service': 2}
+
+# Promised time when the order does not carry one, and the tie-break rank
+PROMISE_MINUTES = {'restaurant': 20, 'room_service': 30}
+ORDER_TYPE_RANK = {'restaurant': 0, 'room_service': 1}
+
+StatusCallback = Callable[[str, str, Dict[str, Any]], None]
+
+
+class Ticket:
+    __slots__ = ('id', 'order_id', 'station', 'items', 'order_type', 'promised_at',
+                 'status', 'cook', 'queued_at', 'started_at')
+
+    def __init__(self, order_id: str, station: str, items: List[str], order_type: str, promised_at: datetime):
+        self.id = str(uuid.uuid4())
+        self.order_id = order_id
+        self.station = station
+        self.items = items
+        self.order_type = order_type
+        self.promised_at = promised_at
+        self.status = 'queued'
+        self.cook: Optional[str] = None
+        self.queued_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'order_id': self.order_id,
+            'station': self.station,
+            'items': self.items,
+            'order_type': self.order_type,
+            'promised_at': self.promised_at.isoformat(),
+            'status': self.status,
+            'cook': self.cook,
+            'queued_at': self.queued_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None
+        }
+
+
+class Station:
+    def __init__(self, name: str, cooks: int):
+        self.name = name
+        self.cooks = cooks
+        self.free_cooks = [f"{name}-{i}" for i in range(cooks, 0, -1)]
+        # (promised_at, order type rank, arrival, ticket id); cancelled tickets are skipped on pop
+        self.heap: List[Tuple[float, int, int, str]] = []
+        self.waiting = 0
+        self.completed = 0
+
+
+class Kitchen:
+    def __init__(self, cooks: Optional[Dict[str, int]] = None, on_status: Optional[StatusCallback] = None):
+        """
+        Args:
+            cooks: Cooks per station (default: DEFAULT_COOKS)
+            on_status: Called with (order_id, status, detail) on every order status change
+        """
+        self.stations = {name: Station(name, count) for name, count in (cooks or DEFAULT_COOKS).items()}
+        self.on_status = on_status
+        self.tickets: Dict[str, Ticket] = {}
+        self._order_tickets: Dict[str, List[str]] = {}
+        self._order_status: Dict[str, str] = {}
+        self._arrivals = itertools.count()
+        self._lock = threading.Lock()
+
+    def station_for(self, category: str) -> str:
+        station = STATION_BY_CATEGORY.get(category, DEFAULT_STATION)
+        return station if station in self.stations else next(iter(self.stations))
+
+    def submit(self, order_id: str, items: Iterable[Tuple[str, str]], order_type: str = 'room_service',
+               promised_at: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Queue the tickets of an order and dispatch whatever can start now
+
+        Args:
+            order_id: The order
+            items: (menu item id, menu category) pairs
+            order_type: room_service or restaurant
+            promised_at: When the guest was promised the order (default: now + PROMISE_MINUTES)
+
+        Returns:
+            The order's tickets
+        """
+        promised_at = promised_at or datetime.now() + timedelta(minutes=PROMISE_MINUTES.get(order_type, 30))
+        by_station: Dict[str, List[str]] = {}
+        for item_id, category in items:
+            by_station.setdefault(self.station_for(category), []).append(item_id)
+
+        events = []
+        with self._lock:
+            tickets = [Ticket(order_id, station, station_items, order_type, promised_at)
+                       for station, station_items in by_station.items()]
+            self._order_tickets[order_id] = [ticket.id for ticket in tickets]
+            for ticket in tickets:
+                self.tickets[ticket.id] = ticket
+                station = self.stations[ticket.station]
+                heapq.heappush(station.heap, (promised_at.timestamp(), ORDER_TYPE_RANK.get(order_type, 1),
+                                              next(self._arrivals), ticket.id))
+                station.waiting += 1
+            if tickets:
+                self._set_status(order_id, 'queued', events)
+            for station_name in by_station:
+                self._dispatch(self.stations[station_name], events)
+            result = [ticket.to_dict() for ticket in tickets]
+        self._notify(events)
+        return result
+
+    def complete(self, ticket_id: str) -> Optional[Dict[str, Any]]:
+        """Mark a ticket done, free its cook and dispatch the next ticket; None if not being cooked"""
+        events = []
+        with self._lock:
+            ticket = self.tickets.get(ticket_id)
+            if ticket is None or ticket.status != 'preparing':
+                return None
+            ticket.status = 'done'
+            station = self.stations[ticket.station]
+            station.free_cooks.append(ticket.cook)
+            station.completed += 1
+            del self.tickets[ticket_id]
+            remaining = [t for t in self._order_tickets[ticket.order_id] if t in self.tickets]
+            if remaining:
+                self._order_tickets[ticket.order_id] = remaining
+            else:
+                del self._order_tickets[ticket.order_id]
+                if self._order_status.get(ticket.order_id) != 'cancelled':
+                    self._set_status(ticket.order_id, 'ready', events)
+                self._order_status.pop(ticket.order_id, None)
+            self._dispatch(station, events)
+            result = ticket.to_dict()
+        self._notify(events)
+        return result
+
+    def cancel(self, order_id: str) -> int:
+        """Drop the order's queued tickets (tickets already cooking finish); returns how many were dropped"""
+        with self._lock:
+            dropped = 0
+            for ticket_id in self._order_tickets.get(order_id, []):
+                ticket = self.tickets[ticket_id]
+                if ticket.status == 'queued':
+                    ticket.status = 'cancelled'
+                    self.stations[ticket.station].waiting -= 1
+                    del self.tickets[ticket_id]
+                    dropped += 1
+            remaining = [t for t in self._order_tickets.pop(order_id, []) if t in self.tickets]
+            if remaining:
+                self._order_tickets[order_id] = remaining
+                self._order_status[order_id] = 'cancelled'
+            else:
+                self._order_status.pop(order_id, None)
+            return dropped
+
+    def queue(self, station_name: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Waiting tickets of a station in the order they will be dispatched"""
+        with self._lock:
+            station = self.stations[station_name]
+            head = heapq.nsmallest(limit + len(station.heap) - station.waiting, station.heap)
+            tickets = [self.tickets[entry[3]] for entry in head if entry[3] in self.tickets]
+            return [ticket.to_dict() for ticket in tickets[:limit]]
+
+    def cooking(self, station_name: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [ticket.to_dict() for ticket in self.tickets.values()
+                    if ticket.station == station_name and ticket.status == 'preparing']
+
+    def order_tickets(self, order_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self.tickets[ticket_id].to_dict() for ticket_id in self._order_tickets.get(order_id, [])]
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {name: {'cooks': station.cooks, 'busy': station.cooks - len(station.free_cooks),
+                           'waiting': station.waiting, 'completed': station.completed}
+                    for name, station in self.stations.items()}
+
+    def _dispatch(self, station: Station, events: List) -> None:
+        # Caller holds the lock
+        while station.free_cooks and station.heap:
+            _, _, _, ticket_id = heapq.heappop(station.heap)
+            ticket = self.tickets.get(ticket_id)
+            if ticket is None or ticket.status != 'queued':
+                continue
+            ticket.status = 'preparing'
+            ticket.cook = station.free_cooks.pop()
+            ticket.started_at = datetime.now()
+            station.waiting -= 1
+            self._set_status(ticket.order_id, 'preparing', events)
+
+    def _set_status(self, order_id: str, status: str, events: List) -> None:
+        if self._order_status.get(order_id) == status:
+            return
+        self._order_status[order_id] = status
+        events.append((order_id, status, {'tickets': len(self._order_tickets.get(order_id, []))}))
+
+    def _notify(self, events: List) -> None:
+        if self.on_status is None:
+            return
+        for order_id, status, detail in events:
+            self.on_status(order_id, status, detail)
@@ -0,0 +1,264 @@
+"""
+Append-only loyalty points ledger with batched accrual.
+
+Every change to a client's points is a ledger entry (client, points, kind,
+source, time), stored column-wise like the payment ledger. Balances are
+running counters updated in the same critical section as the append, so a
+balance read is a dict lookup: it never scans history and never waits for a
+batch that is being applied.
+
+Accruals arrive asynchronously. Producers post them in batches to
+POST /api/loyalty/accruals; the client service queues each batch and a
+background applier appends everything it drains under one lock acquisition.
+Each accrual names its `source` (payment transaction, compensation); a source
+that was already applied is skipped, so redelivered batches don't count twice.
+
+AccrualBatcher is the producer side: it buffers accruals in memory and posts
+them every FLUSH_SECONDS or FLUSH_SIZE accruals, whichever comes first.
+"""
+
+import math
+import queue
+import threading
+import time
+from array import array
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence
+
+import requests
+
+import structured_log
+
+# Points per currency unit, by accrual kind
+POINTS_PER_UNIT = {'payment': 1.0, 'compensation': 10.0}
+KINDS = ('payment', 'compensation', 'adjustment')
+
+QUEUE_BATCHES = 1000
+APPLY_BATCH = 5000
+FLUSH_SIZE = 500
+FLUSH_SECONDS = 1.0
+MAX_BUFFER = 100000
+# Largest points of one entry; far inside the int64 points column
+MAX_POINTS = 10 ** 12
+
+log = structured_log.get_logger("loyalty")
+
+
+def valid_accrual(accrual: Any) -> bool:
+    """An object with a client_id, a known kind, a str (or no) source and a positive number of points"""
+    try:
+        return (isinstance(accrual, dict) and bool(accrual.get('client_id'))
+                and accrual.get('kind') in POINTS_PER_UNIT
+                and isinstance(accrual.get('source'), (str, type(None)))
+                and accrual_points(accrual) > 0)
+    except (TypeError, ValueError, OverflowError):
+        return False
+
+
+def check_points(points: int) -> int:
+    """`points` if it is an int within ±MAX_POINTS; raises ValueError otherwise"""
+    if not isinstance(points, int) or isinstance(points, bool) or abs(points) > MAX_POINTS:
+        raise ValueError(f"points must be an integer within ±{MAX_POINTS}")
+    return points
+
+
+def accrual_points(accrual: Dict[str, Any]) -> int:
+    """
+    Points of an accrual: explicit `points`, or `amount` times the rate of its kind
+
+    Raises:
+        ValueError: A non-finite amount or points outside ±MAX_POINTS
+    """
+    if accrual.get('points') is not None:
+        return check_points(int(accrual['points']))
+    amount = float(accrual.get('amount', 0))
+    if not math.isfinite(amount):
+        raise ValueError("amount must be finite")
+    return check_points(int(amount * POINTS_PER_UNIT.get(accrual.get('kind'), 0.0)))
+
+
+class LoyaltyLedger:
+    def __init__(self):
+        self.client_codes = array('q')
+        self.points = array('q')
+        self.kind_codes = array('B')
+        self.timestamps = array('d')
+        self.sources: List[Optional[str]] = []
+        self.client_keys: List[str] = []
+        self._client_index: Dict[str, int] = {}
+        self._rows_by_client: Dict[int, array] = {}
+        self._applied_sources = set()
+        self.balances: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[List[Dict[str, Any]]]" = queue.Queue(maxsize=QUEUE_BATCHES)
+        self._applier: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def balance(self, client_id: str) -> int:
+        """Current points; lock-free, never scans history"""
+        return self.balances.get(client_id, 0)
+
+    def _append_row(self, client_id: str, points: int, kind: str, source: Optional[str], timestamp: float) -> None:
+        # Everything that can raise happens before the first column grows, so columns stay aligned
+        check_points(points)
+        kind_code = KINDS.index(kind)
+        code = self._client_index.get(client_id)
+        if code is None:
+            code = self._client_index[client_id] = len(self.client_keys)
+            self.client_keys.append(client_id)
+        self._rows_by_client.setdefault(code, array('q')).append(len(self.points))
+        self.client_codes.append(code)
+        self.points.append(points)
+        self.kind_codes.append(kind_code)
+        self.timestamps.append(timestamp)
+        self.sources.append(source)
+        if source is not None:
+            self._applied_sources.add(source)
+        self.balances[client_id] = self.balances.get(client_id, 0) + points
+
+    def adjust(self, client_id: str, points: int, source: Optional[str] = None) -> int:
+        """
+        Apply a manual change (redemptions are negative) right away
+
+        Returns:
+            The new balance
+
+        Raises:
+            ValueError: The balance would become negative, or points is outside ±MAX_POINTS
+        """
+        points = check_points(points)
+        with self._lock:
+            if source is not None and source in self._applied_sources:
+                return self.balances.get(client_id, 0)
+            if self.balances.get(client_id, 0) + points < 0:
+                raise ValueError('Insufficient loyalty points')
+            self._append_row(client_id, points, 'adjustment', source, time.time())
+            return self.balances[client_id]
+
+    def apply(self, accruals: Iterable[Dict[str, Any]]) -> int:
+        """Append a batch of accruals under one lock acquisition; returns how many were applied"""
+        rows = [(str(accrual['client_id']), accrual_points(accrual), accrual['kind'], accrual.get('source'))
+                for accrual in accruals if valid_accrual(accrual)]
+        now = time.time()
+        applied = 0
+        with self._lock:
+            for client_id, points, kind, source in rows:
+                if source is not None and source in self._applied_sources:
+                    continue
+                self._append_row(client_id, points, kind, source, now)
+                applied += 1
+        return applied
+
+    def enqueue(self, accruals: List[Dict[str, Any]]) -> bool:
+        """Queue a batch for the background applier; False if the queue is full"""
+        if self._applier is None:
+            self.start_applier()
+        try:
+            self._queue.put_nowait(accruals)
+            return True
+        except queue.Full:
+            return False
+
+    def pending_batches(self) -> int:
+        return self._queue.qsize()
+
+    def start_applier(self) -> threading.Thread:
+        """Drain queued batches in a daemon thread, merging them into batches of up to APPLY_BATCH"""
+        with self._lock:
+            if self._applier is not None:
+                return self._applier
+
+            def run():
+                while True:
+                    batch = list(self._queue.get())
+                    while len(batch) < APPLY_BATCH:
+                        try:
+                            batch += self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                    try:
+                        self.apply(batch)
+                    except Exception:
+                        log.exception("loyalty accrual batch failed", size=len(batch))
+
+            self._applier = threading.Thread(target=run, name="loyalty-applier", daemon=True)
+            self._applier.start()
+            return self._applier
+
+    def history(self, client_id: str) -> Sequence[int]:
+        """Ledger rows of a client, oldest first (the live index: don't modify it)"""
+        code = self._client_index.get(client_id)
+        return self._rows_by_client.get(code, ()) if code is not None else ()
+
+    def row(self, row: int) -> Dict[str, Any]:
+        return {
+            'client_id': self.client_keys[self.client_codes[row]],
+            'points': self.points[row],
+            'kind': KINDS[self.kind_codes[row]],
+            'source': self.sources[row],
+            'created_at': datetime.fromtimestamp(self.timestamps[row]).isoformat()
+        }
+
+
+class AccrualBatcher:
+    """Buffers accruals and posts them to the client service in batches from a daemon thread"""
+
+    def __init__(self, url: str, flush_size: int = FLUSH_SIZE, flush_seconds: float = FLUSH_SECONDS,
+                 max_buffer: int = MAX_BUFFER):
+        """
+        Args:
+            url: The accruals endpoint (POST /api/loyalty/accruals)
+            flush_size: Post as soon as this many accruals are buffered
+            flush_seconds: Post at least this often while anything is buffered
+            max_buffer: Oldest accruals are dropped beyond this while the endpoint is down
+        """
+        self.url = url
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self.max_buffer = max_buffer
+        self.dropped = 0
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._ready = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, accrual: Dict[str, Any]) -> None:
+        with self._ready:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="loyalty-batcher", daemon=True)
+                self._thread.start()
+            if len(self._buffer) >= self.max_buffer:
+                self._buffer.popleft()
+                self.dropped += 1
+            self._buffer.append(accrual)
+            if len(self._buffer) >= self.flush_size:
+                self._ready.notify()
+
+    def flush(self) -> int:
+        """Post everything buffered; returns how many accruals were delivered"""
+        with self._ready:
+            batch = list(self._buffer)
+            self._buffer.clear()
+        if not batch:
+            return 0
+        try:
+            response = requests.post(self.url, json={'accruals': batch}, timeout=5)
+            response.raise_for_status()
+            return len(batch)
+        except requests.RequestException as e:
+            with self._ready:
+                # Put the batch back in front; sources make the redelivery safe
+                self._buffer.extendleft(reversed(batch))
+                while len(self._buffer) > self.max_buffer:
+                    self._buffer.popleft()
+                    self.dropped += 1
+            log.warning("loyalty accruals not delivered", size=len(batch), error=str(e))
+            return 0
+
+    def _run(self) -> None:
+        while True:
+            with self._ready:
+                self._ready.wait_for(lambda: len(self._buffer) >= self.flush_size, timeout=self.flush_seconds)
+            self.flush()
@@ -0,0 +1,173 @@
+"""
+Cursor pagination, field projection and streamed JSON for list endpoints.
+
+The body stays a JSON array, so existing callers keep working; the cursor
+for the next page is returned in the Link (rel="next") and X-Next-Cursor
+headers. Query parameters:
+
+  limit   page size (default 100, max 1000)
+  cursor  opaque cursor from the previous page
+  fields  comma-separated keys to keep in each item, e.g. fields=id,price
+
+Only one page (limit + 1 items) is held at a time and it is written out in
+chunks, so memory per request does not grow with the store.
+
+A source is either a sequence of ascending row numbers (RecordTable postings,
+ledger histories) or a mapping (a catalog dict), which is paged in key order.
+The cursor is the last key of the previous page, and a page starts with a
+binary search for it, so reading page N costs the same as reading page 1.
+A cursor whose record has been removed resumes at the next key.
+"""
+
+import base64
+import bisect
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+from urllib.parse import urlencode
+
+from flask import Response, jsonify, request
+
+import json_codec
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+CHUNK_SIZE = 50
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def encode_cursor(key: Any) -> str:
+    return base64.urlsafe_b64encode(str(key).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return base64.b64decode(padded.encode("ascii"), altchars=b"-_", validate=True).decode("utf-8")
+    except (ValueError, UnicodeError):
+        raise PaginationError("Invalid cursor")
+
+
+def parse_limit(value: Optional[str], default: int = DEFAULT_LIMIT, maximum: int = MAX_LIMIT) -> int:
+    if value is None:
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+    if limit < 1:
+        raise PaginationError("limit must be at least 1")
+    return min(limit, maximum)
+
+
+def parse_fields(value: Optional[str]) -> Optional[List[str]]:
+    if not value:
+        return None
+    return [field.strip() for field in value.split(",") if field.strip()]
+
+
+def project(item: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    if fields is None:
+        return item
+    return {field: item[field] for field in fields if field in item}
+
+
+# id(mapping) -> (mapping, version, sorted keys)
+_sorted_keys: Dict[int, Tuple[Mapping, Any, List[Any]]] = {}
+
+
+def ordered_keys(mapping: Mapping, version: Optional[Any] = None) -> List[Any]:
+    """
+    The mapping's keys in sorted order
+
+    With a `version` (a counter bumped on every change, e.g. ChangeFeed.version)
+    they are re-sorted only when it changes; without one, on every call.
+    """
+    if version is None:
+        return sorted(mapping)
+    cached = _sorted_keys.get(id(mapping))
+    if cached is None or cached[0] is not mapping or cached[1] != version:
+        cached = _sorted_keys[id(mapping)] = (mapping, version, sorted(mapping))
+    return cached[2]
+
+
+def page(keys: Sequence[Any], after: Optional[Any], limit: int,
+         where: Optional[Callable[[Any], bool]] = None) -> List[Any]:
+    """
+    Up to limit + 1 keys of the ascending `keys` that come after `after`.
+
+    The position is found by binary search on the unfiltered keys, so an item
+    that stops matching `where` between two requests (e.g. a room that got
+    blocked) does not lose the position.
+    """
+    position = bisect.bisect_right(keys, after) if after is not None else 0
+    result = []
+    while position < len(keys) and len(result) <= limit:
+        key = keys[position]
+        if where is None or where(key):
+            result.append(key)
+        position += 1
+    return result
+
+
+def _stream(items: List[Dict[str, Any]]) -> Iterator[bytes]:
+    yield b"["
+    for start in range(0, len(items), CHUNK_SIZE):
+        chunk = json_codec.dumps_bytes(items[start:start + CHUNK_SIZE])[1:-1]
+        yield chunk if start == 0 else b"," + chunk
+    yield b"]"
+
+
+def paginated_response(source: Union[Sequence[int], Mapping[Any, Any]],
+                       where: Optional[Callable[[Any], bool]] = None,
+                       render: Optional[Callable[[Any], Dict[str, Any]]] = None,
+                       version: Optional[Any] = None) -> Response:
+    """
+    Stream one page of `source` according to the request's limit/cursor/fields.
+
+    Args:
+        source: Ascending row numbers, or a mapping of key -> item
+        where: Optional filter on items, applied after the cursor position
+        render: Row or item -> dict conversion, applied to the page only
+        version: Change counter of a mapping source; its sorted keys are
+            cached until it changes (see ordered_keys)
+    """
+    mapping = source if isinstance(source, Mapping) else None
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        cursor = request.args.get("cursor")
+        after = decode_cursor(cursor) if cursor else None
+        if after is not None and mapping is None:
+            try:
+                after = int(after)
+            except ValueError:
+                raise PaginationError("Invalid cursor")
+        fields = parse_fields(request.args.get("fields"))
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if mapping is not None:
+        keys = ordered_keys(mapping, version)
+        fetch = mapping.get
+        test = (lambda key: where(mapping[key]) if key in mapping else False) if where is not None else None
+    else:
+        keys = source
+        fetch = render or (lambda row: row)
+        render = None
+        test = (lambda key: where(fetch(key))) if where is not None else None
+    page_keys = page(keys, after, limit, test)
+    next_cursor = encode_cursor(page_keys[limit - 1]) if len(page_keys) > limit else None
+    # A key removed from a mapping since its keys were sorted is skipped, not a KeyError
+    items = [item for item in map(fetch, page_keys[:limit]) if item is not None]
+    if render is not None:
+        items = [render(item) for item in items]
+    items = [project(item, fields) for item in items]
+
+    response = Response(_stream(items), mimetype="application/json")
+    if next_cursor:
+        args = request.args.to_dict()
+        args.update(cursor=next_cursor, limit=str(limit))
+        response.headers["Link"] = f'<{request.path}?{urlencode(args)}>; rel="next"'
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
@@ -0,0 +1,205 @@
+"""
+Append-only payment ledger with incremental settlement.
+
+Transactions are stored column-wise (typed arrays) instead of one dict per
+charge. Booking ids and payment methods are dictionary-encoded to small ints,
+so settlement can aggregate new rows with numpy reductions and never rescans
+rows that were already settled. Payment methods come from PAYMENT_METHODS;
+timestamps are rendered and settled by UTC day.
+"""
+
+import threading
+import time
+import uuid
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400
+PAYMENT_METHODS = ('credit_card', 'debit_card', 'bank_transfer', 'cash', 'paypal', 'voucher')
+
+
+class PaymentLedger:
+    def __init__(self):
+        self.transaction_ids: List[str] = []
+        self.booking_codes = array('q')
+        self.amounts = array('d')
+        self.timestamps = array('d')
+        self.method_codes = array('H')
+        self.booking_keys: List[str] = []
+        self.method_keys: List[str] = []
+        self._booking_index: Dict[str, int] = {}
+        self._method_index: Dict[str, int] = {}
+        self._rows_by_booking: Dict[int, List[int]] = {}
+        self._row_by_id: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        # Settlement state: rows [0, settled_rows) are already aggregated
+        self.settled_rows = 0
+        self.last_settled_at: Optional[float] = None
+        self.booking_totals = np.zeros(0, dtype=np.float64)
+        self.booking_counts = np.zeros(0, dtype=np.int64)
+        self.daily_totals: Dict[int, float] = {}
+        self.daily_counts: Dict[int, int] = {}
+        self._settle_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def _encode(self, index: Dict[str, int], keys: List[str], value: str) -> int:
+        code = index.get(value)
+        if code is None:
+            code = len(keys)
+            index[value] = code
+            keys.append(value)
+        return code
+
+    def _append_row(self, booking_id: str, amount: float, method: str, timestamp: float) -> str:
+        # Everything that can raise happens before the first column grows, so columns stay aligned
+        if method not in PAYMENT_METHODS:
+            raise ValueError(f"Unknown payment method: {method!r}")
+        transaction_id = str(uuid.uuid4())
+        row = len(self.amounts)
+        booking_code = self._encode(self._booking_index, self.booking_keys, str(booking_id))
+        method_code = self._encode(self._method_index, self.method_keys, method)
+        self.transaction_ids.append(transaction_id)
+        self.booking_codes.append(booking_code)
+        self.amounts.append(amount)
+        self.timestamps.append(timestamp)
+        self.method_codes.append(method_code)
+        self._rows_by_booking.setdefault(booking_code, []).append(row)
+        self._row_by_id[transaction_id] = row
+        return transaction_id
+
+    def append(self, booking_id: str, amount: float, method: str = "credit_card") -> str:
+        """Record one completed charge and return its transaction id"""
+        with self._lock:
+            return self._append_row(booking_id, float(amount), method, time.time())
+
+    def append_many(self, booking_ids: Sequence[str], amounts: Sequence[float],
+                    methods: Sequence[str]) -> List[str]:
+        """Record a batch of validated charges under a single lock acquisition"""
+        now = time.time()
+        with self._lock:
+            return [self._append_row(booking_id, float(amount), method, now)
+                    for booking_id, amount, method in zip(booking_ids, amounts, methods)]
+
+    def row(self, row: int) -> Dict[str, Any]:
+        return {
+            'id': self.transaction_ids[row],
+            'booking_id': self.booking_keys[self.booking_codes[row]],
+            'amount': self.amounts[row],
+            'status': 'completed',
+            'method': self.method_keys[self.method_codes[row]],
+            'timestamp': datetime.fromtimestamp(self.timestamps[row], tz=timezone.utc).isoformat()
+        }
+
+    def get(self, transaction_id: str) -> Optional[Dict[str, Any]]:
+        row = self._row_by_id.get(transaction_id)
+        return self.row(row) if row is not None else None
+
+    def history_rows(self, booking_id: str) -> Sequence[int]:
+        """Row numbers of one booking's transactions, oldest first (the live index: don't modify it)"""
+        code = self._booking_index.get(str(booking_id))
+        if code is None:
+            return ()
+        return self._rows_by_booking.get(code, ())
+
+    def history(self, booking_id: str) -> List[Dict[str, Any]]:
+        """Transactions of one booking, via the booking index instead of a full scan"""
+        return [self.row(row) for row in self.history_rows(booking_id)]
+
+    def settle(self) -> Dict[str, Any]:
+        """Fold every row appended since the last run into the per-booking and per-day totals"""
+        with self._settle_lock:
+            # Copy the new rows under the append lock: arrays exporting a buffer can't grow
+            with self._lock:
+                start = self.settled_rows
+                end = len(self.amounts)
+                if end == start:
+                    return {'rows_settled': 0, 'settled_rows': end}
+                amounts = np.frombuffer(self.amounts[start:end], dtype=np.float64)
+                codes = np.frombuffer(self.booking_codes[start:end], dtype=np.int64)
+                timestamps = np.frombuffer(self.timestamps[start:end], dtype=np.float64)
+                size = len(self.booking_keys)
+
+            days = (timestamps // SECONDS_PER_DAY).astype(np.int64)
+            if len(self.booking_totals) < size:
+                self.booking_totals = np.pad(self.booking_totals, (0, size - len(self.booking_totals)))
+                self.booking_counts = np.pad(self.booking_counts, (0, size - len(self.booking_counts)))
+            self.booking_totals += np.bincount(codes, weights=amounts, minlength=size)[:size]
+            self.booking_counts += np.bincount(codes, minlength=size)[:size]
+
+            unique_days, inverse = np.unique(days, return_inverse=True)
+            day_totals = np.bincount(inverse, weights=amounts)
+            day_counts = np.bincount(inverse)
+            for day, total, count in zip(unique_days.tolist(), day_totals.tolist(), day_counts.tolist()):
+                self.daily_totals[day] = self.daily_totals.get(day, 0.0) + total
+                self.daily_counts[day] = self.daily_counts.get(day, 0) + count
+
+            self.settled_rows = end
+            self.last_settled_at = time.time()
+            return {'rows_settled': end - start, 'settled_rows': end}
+
+    def booking_settlement(self, booking_id: str) -> Dict[str, Any]:
+        code = self._booking_index.get(str(booking_id))
+        with self._settle_lock:
+            settled = code is not None and code < len(self.booking_totals)
+            return {
+                'booking_id': booking_id,
+                'total': float(self.booking_totals[code]) if settled else 0.0,
+                'count': int(self.booking_counts[code]) if settled else 0
+            }
+
+    def daily_settlement(self, day: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Settled totals per UTC day (or of one YYYY-MM-DD day)"""
+        epoch_day = None
+        if day:
+            epoch_day = int(datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()) // SECONDS_PER_DAY
+        with self._settle_lock:
+            if epoch_day is not None:
+                days = [epoch_day] if epoch_day in self.daily_totals else []
+            else:
+                days = sorted(self.daily_totals)
+            return [{
+                'date': datetime.fromtimestamp(d * SECONDS_PER_DAY, tz=timezone.utc).date().isoformat(),
+                'total': round(self.daily_totals[d], 2),
+                'count': self.daily_counts[d]
+            } for d in days]
+
+
+def validate_batch(payments: List[Dict[str, Any]]) -> np.ndarray:
+    """
+    Validate a batch of charges in one pass. Returns a boolean mask of the
+    valid entries: a booking id, a finite, positive amount and a known
+    payment method (default credit_card) are required.
+    """
+    amounts = np.array([_to_float(p.get('amount')) for p in payments], dtype=np.float64)
+    has_booking = np.array([bool(p.get('booking_id')) for p in payments], dtype=bool)
+    known_method = np.array([valid_method(p.get('payment_method', 'credit_card')) for p in payments], dtype=bool)
+    return has_booking & known_method & np.isfinite(amounts) & (amounts > 0)
+
+
+def valid_method(method) -> bool:
+    return isinstance(method, str) and method in PAYMENT_METHODS
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def start_settlement_job(ledger: PaymentLedger, interval_seconds: float = 60.0) -> threading.Thread:
+    """Run ledger.settle() periodically in a daemon thread"""
+    def run():
+        while True:
+            time.sleep(interval_seconds)
+            ledger.settle()
+
+    thread = threading.Thread(target=run, name="payment-settlement", daemon=True)
+    thread.start()
+    return thread
@@ -1,42 +1,56 @@
 from flask import Flask, request, jsonify
-import uuid
 import datetime
 
+import health
+import json_codec
+import structured_log
+from analytics import DayGrid, parse_range
+from pagination import paginated_response
+from idempotency import IdempotencyCache, idempotent
+from loyalty import AccrualBatcher
+from payment_ledger import PAYMENT_METHODS, PaymentLedger, start_settlement_job, validate_batch, valid_method
+
 app = Flask(__name__)
+json_codec.install(app)
+structured_log.install(app)
+health.install(app, 'BeyPayment')
+log = structured_log.get_logger("payment")
+
+# Mock database: append-only columnar ledger instead of one dict per transaction
+ledger = PaymentLedger()
+idempotency_cache = IdempotencyCache()
+# Revenue per day and payment method, maintained on every accepted charge
+revenue = DayGrid(PAYMENT_METHODS)
+
+# Completed payments earn loyalty points; accruals go to the client service in batches
+loyalty_accruals = AccrualBatcher("http://localhost:5002/api/loyalty/accruals")
 
-# Mock database
-transactions = {}
+SETTLEMENT_INTERVAL_SECONDS = 60
+MAX_BATCH_SIZE = 5000
 
 class PaymentService:
     @app.route('/api/payments/process', methods=['POST'])
+    @idempotent(idempotency_cache)
     def process_payment():
         data = request.json
         booking_id = data.get('booking_id')
         amount = data.get('amount')
         payment_method = data.get('payment_method', 'credit_card')
-        
-        # Simulate payment processing logic
-        transaction_id = str(uuid.uuid4())
 
-        print(amount)
-        
         # Simple validation mock
-        if amount <= 0:
+        if amount is None or amount <= 0:
              return jsonify({'error': 'Invalid amount'}), 400
+        if not valid_method(payment_method):
+            return jsonify({'error': f"payment_method must be one of {', '.join(PAYMENT_METHODS)}"}), 400
+
+        transaction_id = ledger.append(booking_id, amount, payment_method)
+        revenue.add(datetime.date.today(), payment_method, float(amount))
+        if data.get('client_id'):
+            loyalty_accruals.add({'client_id': data['client_id'], 'kind': 'payment',
+                                  'amount': float(amount), 'source': transaction_id})
+
+        log.info("payment processed", booking_id=booking_id, amount=amount, method=payment_method)
 
-        transaction = {
-            'id': transaction_id,
-            'booking_id': booking_id,
-            'amount': amount,
-            'status': 'completed',
-            'method': payment_method,
-            'timestamp': datetime.datetime.now().isoformat()
-        }
-        
-        transactions[transaction_id] = transaction
-        
-        print(f"Payment processed for Booking {booking_id}: ${amount}")
-        
         return jsonify({
             'payment_id': transaction_id,
             'transaction_id': transaction_id,
@@ -44,10 +58,98 @@ class PaymentService:
             'message': 'Payment processed successfully'
         })
 
+    @app.route('/api/payments/batch', methods=['POST'])
+    @idempotent(idempotency_cache)
+    def process_payment_batch():
+        """Process many charges in one request: {"payments": [{booking_id, amount, payment_method}, ...]}"""
+        data = request.json or {}
+        payments = data.get('payments')
+        if not isinstance(payments, list) or not payments:
+            return jsonify({'error': 'payments must be a non-empty list'}), 400
+        if len(payments) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Batch too large (max {MAX_BATCH_SIZE})'}), 400
+        if not all(isinstance(p, dict) for p in payments):
+            return jsonify({'error': 'Each payment must be an object'}), 400
+
+        valid = validate_batch(payments)
+        accepted = [payments[i] for i in valid.nonzero()[0]]
+        transaction_ids = ledger.append_many(
+            [p['booking_id'] for p in accepted],
+            [p['amount'] for p in accepted],
+            [p.get('payment_method', 'credit_card') for p in accepted]
+        )
+        by_method = {}
+        for p in accepted:
+            method = p.get('payment_method', 'credit_card')
+            total, count = by_method.get(method, (0.0, 0))
+            by_method[method] = (total + float(p['amount']), count + 1)
+        today = datetime.date.today()
+        for method, (total, count) in by_method.items():
+            revenue.add(today, method, total, count)
+        for p, transaction_id in zip(accepted, transaction_ids):
+            if p.get('client_id'):
+                loyalty_accruals.add({'client_id': p['client_id'], 'kind': 'payment',
+                                      'amount': float(p['amount']), 'source': transaction_id})
+
+        results = []
+        ids = iter(transaction_ids)
+        for index, ok in enumerate(valid.tolist()):
+            if ok:
+                results.append({'index': index, 'status': 'success', 'transaction_id': next(ids)})
+            else:
+                results.append({'index': index, 'status': 'rejected', 'error': 'Invalid booking_id, amount or payment_method'})
+
+        return jsonify({
+            'accepted': len(transaction_ids),
+            'rejected': len(payments) - len(transaction_ids),
+            'results': results
+        })
+
     @app.route('/api/payment/history/<booking_id>', methods=['GET'])
     def get_payment_history(booking_id):
-        history = [t for t in transactions.values() if t['booking_id'] == booking_id]
-        return jsonify(history)
+        return paginated_response(ledger.history_rows(booking_id), render=ledger.row)
+
+    @app.route('/api/payments/settle', methods=['POST'])
+    def run_settlement():
+        """Fold new ledger rows into the settlement totals now instead of waiting for the next run"""
+        return jsonify(ledger.settle())
+
+    @app.route('/api/payments/settlement', methods=['GET'])
+    def get_settlement():
+        """Settled totals per day (optionally ?date=YYYY-MM-DD) or for one ?booking_id="""
+        booking_id = request.args.get('booking_id')
+        if booking_id:
+            return jsonify(ledger.booking_settlement(booking_id))
+        try:
+            days = ledger.daily_settlement(request.args.get('date'))
+        except ValueError:
+            return jsonify({'error': 'date must be YYYY-MM-DD'}), 400
+        return jsonify({
+            'days': days,
+            'settled_rows': ledger.settled_rows,
+            'pending_rows': len(ledger) - ledger.settled_rows,
+            'last_settled_at': datetime.datetime.fromtimestamp(ledger.last_settled_at).isoformat() if ledger.last_settled_at else None
+        })
+
+    @app.route('/api/analytics/revenue', methods=['GET'])
+    def get_revenue():
+        """Revenue over [?from, ?to) (default: last 30 days): total, per payment method and per day"""
+        try:
+            start, end = parse_range(request.args.get('from'), request.args.get('to'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        by_method = revenue.totals(start, end)
+        return jsonify({
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'total': round(sum(m['value'] for m in by_method.values()), 2),
+            'payments': sum(m['count'] for m in by_method.values()),
+            'by_method': {method: {'amount': round(m['value'], 2), 'payments': m['count']}
+                          for method, m in by_method.items()},
+            'by_day': [{'date': d['date'], 'amount': round(d['value'], 2), 'payments': d['count']}
+                       for d in revenue.daily(start, end)]
+        })
 
 if __name__ == '__main__':
-    app.run(port=5007, debug=True)
\ No newline at end of file
+    start_settlement_job(ledger, SETTLEMENT_INTERVAL_SECONDS)
+    app.run(port=5007, debug=True)
@@ -0,0 +1,134 @@
+"""
+Stay pricing: per-night rate calendars, occupancy and meal plans.
+
+The nightly rate of a room is its base price times a season factor (by day
+of year, optionally per room type) times a weekday factor, plus a surcharge
+for each guest above the base occupancy. Rates for many rooms and nights are
+computed as one NumPy matrix, so quoting all rooms, or all stays starting on
+each day of a week, costs a handful of array operations.
+"""
+
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from analytics import to_day
+
+# (first day, last day inclusive as MM-DD, factor, room types or None for all)
+DEFAULT_SEASONS = [
+    ('07-01', '08-31', 1.30, None),    # summer high season
+    ('12-20', '01-05', 1.25, None),    # year-end holidays
+    ('11-01', '02-28', 0.85, ('standard', 'superior')),  # low season; suites keep their rate
+]
+# Monday .. Sunday
+DEFAULT_WEEKDAY_FACTORS = (1.0, 1.0, 1.0, 1.0, 1.15, 1.15, 1.0)
+
+BASE_OCCUPANCY = 2
+EXTRA_GUEST_FACTOR = 0.2
+
+# Meal plan -> menu categories included per person per day
+MEAL_PLANS = {
+    'none': (),
+    'breakfast': ('breakfast',),
+    'half_board': ('breakfast', 'dinner'),
+    'full_board': ('breakfast', 'lunch', 'dinner'),
+}
+
+
+def meal_plan_costs(menu_items: Iterable[Dict[str, Any]]) -> Dict[str, float]:
+    """Daily cost per person of each meal plan: the cheapest menu item of every included category"""
+    cheapest: Dict[str, float] = {}
+    for item in menu_items:
+        category = item.get('category')
+        price = float(item.get('price', 0))
+        if category not in cheapest or price < cheapest[category]:
+            cheapest[category] = price
+    return {plan: round(sum(cheapest.get(category, 0.0) for category in categories), 2)
+            for plan, categories in MEAL_PLANS.items()
+            if all(category in cheapest for category in categories)}
+
+
+def _day_of_year(month_day: str) -> int:
+    # Day index in a leap year, so Feb 29 has its own slot
+    month, day = (int(part) for part in month_day.split('-'))
+    return date(2000, month, day).timetuple().tm_yday
+
+
+class PricingEngine:
+    def __init__(self, seasons: Sequence[Tuple] = DEFAULT_SEASONS,
+                 weekday_factors: Sequence[float] = DEFAULT_WEEKDAY_FACTORS,
+                 base_occupancy: int = BASE_OCCUPANCY, extra_guest_factor: float = EXTRA_GUEST_FACTOR):
+        self.seasons = [(_day_of_year(first), _day_of_year(last), factor, types)
+                        for first, last, factor, types in seasons]
+        self.weekday_factors = np.asarray(weekday_factors, dtype=np.float64)
+        self.base_occupancy = base_occupancy
+        self.extra_guest_factor = extra_guest_factor
+
+    def _calendar(self, start: date, days: int):
+        """Day-of-year (leap-year numbering) and weekday of each of `days` nights from `start`"""
+        ordinals = np.arange(start.toordinal(), start.toordinal() + days)
+        nights = [date.fromordinal(int(o)) for o in ordinals]
+        day_of_year = np.array([date(2000, d.month, d.day).timetuple().tm_yday for d in nights])
+        weekdays = (ordinals - 1) % 7  # date.fromordinal(1) is a Monday
+        return day_of_year, weekdays
+
+    def nightly_rates(self, base_prices: Sequence[float], room_types: Sequence[str],
+                      start: date, days: int, guests: int = 1) -> np.ndarray:
+        """[rooms x days] matrix of the rate of each room for each night from `start`"""
+        day_of_year, weekdays = self._calendar(start, days)
+        types = np.asarray(room_types, dtype=object)
+        factors = np.ones((len(types), days))
+        for first, last, factor, season_types in self.seasons:
+            if first <= last:
+                in_season = (day_of_year >= first) & (day_of_year <= last)
+            else:  # wraps over the new year
+                in_season = (day_of_year >= first) | (day_of_year <= last)
+            applies = np.ones(len(types), dtype=bool) if season_types is None else np.isin(types, season_types)
+            factors[np.ix_(applies, in_season)] *= factor
+        factors *= self.weekday_factors[weekdays]
+        extra_guests = max(guests - self.base_occupancy, 0)
+        occupancy_factor = 1.0 + self.extra_guest_factor * extra_guests
+        return np.asarray(base_prices, dtype=np.float64)[:, None] * factors * occupancy_factor
+
+    def quote(self, rooms: List[Dict[str, Any]], check_in, check_out, guests: int = 1,
+              meal_plan_daily_cost: float = 0.0) -> List[Dict[str, Any]]:
+        """Stay totals for each room for one stay"""
+        start, end = to_day(check_in), to_day(check_out)
+        nights = (end - start).days
+        if nights < 1:
+            raise ValueError("check_out must be after check_in")
+        rates = self.nightly_rates([r['price'] for r in rooms], [r['type'] for r in rooms], start, nights, guests)
+        room_totals = rates.sum(axis=1)
+        meals_total = float(meal_plan_daily_cost) * guests * nights
+        return [{
+            'room_id': room['id'],
+            'type': room['type'],
+            'nights': nights,
+            'nightly_rates': [round(float(rate), 2) for rate in rates[i]],
+            'room_total': round(float(room_totals[i]), 2),
+            'meals_total': round(meals_total, 2),
+            'total': round(float(room_totals[i]) + meals_total, 2),
+        } for i, room in enumerate(rooms)]
+
+    def search(self, rooms: List[Dict[str, Any]], first_check_in, days: int, nights: int, guests: int = 1,
+               meal_plan_daily_cost: float = 0.0) -> Dict[str, Any]:
+        """
+        Totals of an `nights`-night stay for every room and every check-in day in
+        [first_check_in, first_check_in + days), from one rate matrix and its
+        cumulative sum.
+        """
+        if days < 1 or nights < 1:
+            raise ValueError("days and nights must be at least 1")
+        start = to_day(first_check_in)
+        rates = self.nightly_rates([r['price'] for r in rooms], [r['type'] for r in rooms],
+                                   start, days + nights - 1, guests)
+        cumulative = np.concatenate([np.zeros((len(rooms), 1)), np.cumsum(rates, axis=1)], axis=1)
+        totals = cumulative[:, nights:nights + days] - cumulative[:, :days]
+        totals += float(meal_plan_daily_cost) * guests * nights
+        return {
+            'check_in_dates': [(start + timedelta(days=i)).isoformat() for i in range(days)],
+            'nights': nights,
+            'rooms': [{'room_id': room['id'], 'type': room['type'], 'totals': np.round(totals[i], 2).tolist()}
+                      for i, room in enumerate(rooms)],
+        }
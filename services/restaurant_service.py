@@ -1,8 +1,22 @@
 from flask import Flask, request, jsonify
 import uuid
-from datetime import datetime
+from datetime import date, datetime
+
+import health
+import json_codec
+import structured_log
+from compact_store import CATEGORY, FLOAT, OBJECT, TIMESTAMP, UUID, RecordTable
+from change_feed import ChangeFeed, conditional, poll_response, stream_response
+from kitchen import Kitchen
+from table_index import DEFAULT_HOLD_SECONDS, TableIndex
+from pagination import paginated_response
+from pricing import meal_plan_costs
+from idempotency import IdempotencyCache, idempotent
 
 app = Flask(__name__)
+json_codec.install(app)
+structured_log.install(app)
+health.install(app, 'BeyResto')
 
 # Mock database
 menu_items = {
@@ -13,22 +27,96 @@ menu_items = {
     '5': {'id': '5', 'name': 'Room Service - Premium', 'price': 120, 'category': 'room_service'}
 }
 
-restaurant_orders = {}
-tables = {'1': 'available', '2': 'available', '3': 'available', '4': 'available', '5': 'available'}
+restaurant_orders = RecordTable([
+    ('id', UUID), ('booking_id', UUID), ('room_number', CATEGORY), ('items', OBJECT),
+    ('total_amount', FLOAT), ('status', CATEGORY), ('order_type', CATEGORY), ('created_at', TIMESTAMP)
+], indexed=('booking_id',))
+idempotency_cache = IdempotencyCache()
+# Menu changes are versioned for ETags and published on the change feed
+menu_feed = ChangeFeed('menu')
+# Order status changes (kitchen progress and manual updates) for the POS
+order_feed = ChangeFeed('orders')
+
+
+def publish_order_status(order_id, status, detail=None):
+    restaurant_orders.update(order_id, status=status)
+    order_feed.publish('order_status', order_id, {'order_id': order_id, 'status': status, **(detail or {})})
+
+
+kitchen = Kitchen(on_status=publish_order_status)
+# Seats per table, with a time-slot index of holds and reservations
+tables = TableIndex({'1': 2, '2': 2, '3': 4, '4': 4, '5': 6})
+
+
+def _table_query(data):
+    """(date, time, guests, minutes) of a table search or hold; raises ValueError on bad input"""
+    day = date.fromisoformat(data['date']) if data.get('date') else date.today()
+    at = data.get('time') or datetime.now().strftime('%H:%M')
+    guests = int(data.get('guests', 1))
+    minutes = int(data['minutes']) if data.get('minutes') else None
+    if guests < 1 or (minutes is not None and minutes < 1):
+        raise ValueError('guests and minutes must be positive')
+    return day, at, guests, minutes
 
 class RestaurantService:
     @app.route('/api/restaurant/menu', methods=['GET'])
     def get_menu():
         category = request.args.get('category')
-        if category:
-            filtered_menu = [item for item in menu_items.values() if item['category'] == category]
-            return jsonify(filtered_menu)
-        return jsonify(list(menu_items.values()))
+
+        def build():
+            if category:
+                return paginated_response(menu_items, where=lambda item: item['category'] == category,
+                                          version=menu_feed.version)
+            return paginated_response(menu_items, version=menu_feed.version)
+
+        return conditional(menu_feed.etag(request.query_string), build, weak=True)
+
+    @app.route('/api/restaurant/menu/<item_id>', methods=['PUT'])
+    def update_menu_item(item_id):
+        """Update price, name or category of a menu item"""
+        item = menu_items.get(item_id)
+        if not item:
+            return jsonify({'error': 'Menu item not found'}), 404
+        data = request.json
+        for field in ('name', 'price', 'category'):
+            if field in data:
+                item[field] = data[field]
+        menu_feed.publish('menu_item_updated', item_id, item)
+        return jsonify(item)
+
+    @app.route('/api/restaurant/meal-plans', methods=['GET'])
+    def get_meal_plans():
+        """Daily cost per person of every meal plan the current menu can serve"""
+        return conditional(menu_feed.etag('meal-plans'), lambda: jsonify(meal_plan_costs(menu_items.values())))
+
+    @app.route('/api/restaurant/meal-plans/<plan>', methods=['GET'])
+    def get_meal_plan(plan):
+        costs = meal_plan_costs(menu_items.values())
+        if plan not in costs:
+            return jsonify({'error': 'Meal plan not available'}), 404
+        return jsonify({'plan': plan, 'daily_cost': costs[plan]})
+
+    @app.route('/api/restaurant/menu/changes', methods=['GET'])
+    def get_menu_changes():
+        """Long-poll for menu changes after ?since=<version>"""
+        return poll_response(menu_feed)
+
+    @app.route('/api/restaurant/menu/changes/stream', methods=['GET'])
+    def stream_menu_changes():
+        """Menu changes as Server-Sent Events"""
+        return stream_response(menu_feed)
 
     @app.route('/api/restaurant/order', methods=['POST'])
+    @idempotent(idempotency_cache)
     def create_order():
         data = request.json
         order_id = str(uuid.uuid4())
+        promised_at = None
+        if data.get('promised_at'):
+            try:
+                promised_at = datetime.fromisoformat(data['promised_at'])
+            except (TypeError, ValueError):
+                return jsonify({'error': 'promised_at must be an ISO datetime'}), 400
         
         order = {
             'id': order_id,
@@ -41,8 +129,11 @@ class RestaurantService:
             'created_at': datetime.now().isoformat()
         }
         
-        restaurant_orders[order_id] = order
-        return jsonify({'order_id': order_id, 'status': 'created'})
+        restaurant_orders.insert(order)
+        order_feed.publish('order_created', order_id, {'order_id': order_id, 'status': 'pending'})
+        tickets = kitchen.submit(order_id, [(item_id, menu_items[item_id]['category']) for item_id in order['items']],
+                                 order['order_type'], promised_at)
+        return jsonify({'order_id': order_id, 'status': 'created', 'tickets': len(tickets)})
 
     @app.route('/api/restaurant/order/<order_id>', methods=['GET'])
     def get_order(order_id):
@@ -53,21 +144,121 @@ class RestaurantService:
 
     @app.route('/api/restaurant/order/<order_id>/status', methods=['PUT'])
     def update_order_status(order_id):
-        data = request.json
-        if order_id in restaurant_orders:
-            restaurant_orders[order_id]['status'] = data.get('status')
-            return jsonify({'status': 'updated'})
-        return jsonify({'error': 'Order not found'}), 404
+        """Manual status change (e.g. delivered, cancelled); cancelling drops tickets not yet cooking"""
+        status = (request.json or {}).get('status')
+        if order_id not in restaurant_orders:
+            return jsonify({'error': 'Order not found'}), 404
+        if status == 'cancelled':
+            kitchen.cancel(order_id)
+        publish_order_status(order_id, status)
+        return jsonify({'status': 'updated'})
+
+    @app.route('/api/restaurant/order/<order_id>/tickets', methods=['GET'])
+    def get_order_tickets(order_id):
+        """Kitchen tickets of an order that are still queued or cooking"""
+        if order_id not in restaurant_orders:
+            return jsonify({'error': 'Order not found'}), 404
+        return jsonify(kitchen.order_tickets(order_id))
+
+    @app.route('/api/restaurant/orders/changes', methods=['GET'])
+    def get_order_changes():
+        """Long-poll for order status changes after ?since=<version>"""
+        return poll_response(order_feed)
+
+    @app.route('/api/restaurant/orders/changes/stream', methods=['GET'])
+    def stream_order_changes():
+        """Order status changes as Server-Sent Events, for the POS"""
+        return stream_response(order_feed)
+
+    @app.route('/api/restaurant/kitchen', methods=['GET'])
+    def get_kitchen():
+        """Cooks, busy cooks, waiting and completed tickets per station"""
+        return jsonify(kitchen.summary())
+
+    @app.route('/api/restaurant/kitchen/<station>/queue', methods=['GET'])
+    def get_station_queue(station):
+        if station not in kitchen.stations:
+            return jsonify({'error': 'Station not found'}), 404
+        limit = request.args.get('limit', 20, type=int)
+        return jsonify({'station': station, 'cooking': kitchen.cooking(station),
+                        'waiting': kitchen.queue(station, max(limit, 0))})
+
+    @app.route('/api/restaurant/kitchen/tickets/<ticket_id>/done', methods=['PUT'])
+    def complete_ticket(ticket_id):
+        """A cook finished a ticket; the station's next ticket is dispatched to them"""
+        ticket = kitchen.complete(ticket_id)
+        if ticket is None:
+            return jsonify({'error': 'Ticket not being prepared'}), 404
+        return jsonify(ticket)
+
+    @app.route('/api/restaurant/tables', methods=['GET'])
+    def get_tables():
+        return jsonify(tables.inventory())
 
     @app.route('/api/restaurant/tables/available', methods=['GET'])
     def get_available_tables():
-        available_tables = [table_id for table_id, status in tables.items() if status == 'available']
-        return jsonify(available_tables)
+        """Ids of the tables free for ?guests= at ?date= ?time= (default: now), smallest first"""
+        try:
+            day, at, guests, minutes = _table_query(request.args)
+            if not tables.in_service(at):
+                # Outside the service periods nothing is booked
+                return jsonify([t['id'] for t in tables.inventory() if t['seats'] >= guests])
+            free = tables.find(day, at, guests, minutes, limit=len(tables.table_ids))
+        except (KeyError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify([t['table_id'] for t in free])
+
+    @app.route('/api/restaurant/tables/find', methods=['GET'])
+    def find_tables():
+        """Best free tables for ?guests= at ?date=&time= (sitting of ?minutes=, default per period)"""
+        try:
+            day, at, guests, minutes = _table_query(request.args)
+            free = tables.find(day, at, guests, minutes, limit=request.args.get('limit', 5, type=int))
+        except (KeyError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'guests': guests, 'tables': free})
+
+    @app.route('/api/restaurant/tables/hold', methods=['POST'])
+    @idempotent(idempotency_cache)
+    def hold_table():
+        """Hold the best free table (or table_id) for ttl_seconds until it is confirmed"""
+        data = request.json or {}
+        try:
+            day, at, guests, minutes = _table_query(data)
+            hold = tables.hold(day, at, guests, minutes, data.get('table_id'),
+                               float(data.get('ttl_seconds', DEFAULT_HOLD_SECONDS)))
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        if hold is None:
+            return jsonify({'error': 'No table available'}), 409
+        return jsonify(hold)
+
+    @app.route('/api/restaurant/tables/holds/<hold_id>/confirm', methods=['POST'])
+    def confirm_table(hold_id):
+        data = request.json or {}
+        details = {field: data[field] for field in ('name', 'booking_id', 'phone') if field in data}
+        reservation = tables.confirm(hold_id, **details)
+        if reservation is None:
+            return jsonify({'error': 'Hold not found or expired'}), 404
+        return jsonify(reservation)
+
+    @app.route('/api/restaurant/tables/reservations/<reservation_id>', methods=['GET'])
+    def get_table_reservation(reservation_id):
+        reservation = tables.get(reservation_id)
+        if reservation is None:
+            return jsonify({'error': 'Reservation not found'}), 404
+        return jsonify(reservation)
+
+    @app.route('/api/restaurant/tables/reservations/<reservation_id>', methods=['DELETE'])
+    def release_table(reservation_id):
+        """Cancel a reservation or drop a hold"""
+        if not tables.release(reservation_id):
+            return jsonify({'error': 'Reservation not found'}), 404
+        return jsonify({'status': 'released'})
 
     @app.route('/api/restaurant/booking/<booking_id>/orders', methods=['GET'])
     def get_booking_orders(booking_id):
-        booking_orders = [order for order in restaurant_orders.values() if order.get('booking_id') == booking_id]
-        return jsonify(booking_orders)
+        return paginated_response(restaurant_orders.select_rows('booking_id', booking_id), render=restaurant_orders.record)
 
 if __name__ == '__main__':
     app.run(port=5008, debug=True)
\ No newline at end of file
@@ -2,7 +2,17 @@ from flask import Flask, request, jsonify
 from datetime import datetime, timedelta
 import json
 
+import health
+import json_codec
+import structured_log
+from change_feed import ChangeFeed, conditional, poll_response, stream_response
+from pagination import paginated_response
+from pricing import PricingEngine
+
 app = Flask(__name__)
+json_codec.install(app)
+structured_log.install(app)
+health.install(app, 'BeyRooms')
 
 # Mock database
 rooms = {
@@ -14,6 +24,26 @@ rooms = {
 }
 
 room_bookings = []
+# Every change to `rooms` is published here (version counter for ETags + change feed)
+room_feed = ChangeFeed('rooms')
+pricing = PricingEngine()
+MAX_SEARCH_DAYS = 31
+
+
+def _stay_args():
+    """guests and meal_plan_daily_cost (per person) from the query string"""
+    guests = int(request.args.get('guests', 1))
+    meal_cost = float(request.args.get('meal_plan_daily_cost', 0))
+    if guests < 1 or meal_cost < 0:
+        raise ValueError("guests must be at least 1 and meal_plan_daily_cost not negative")
+    return guests, meal_cost
+
+
+def _quotable_rooms():
+    """Available rooms, optionally narrowed to ?type="""
+    room_type = request.args.get('type')
+    return [room for room in rooms.values()
+            if room['status'] == 'available' and (not room_type or room['type'] == room_type)]
 
 class RoomService:
     @app.route('/api/rooms/available', methods=['GET'])
@@ -22,9 +52,53 @@ class RoomService:
         check_out = request.args.get('check_out')
         
         # Simple availability check
-        available_rooms = [room for room in rooms.values() if room['status'] == 'available']
-        print(available_rooms)
-        return jsonify(available_rooms)
+        return conditional(room_feed.etag(request.path, request.query_string),
+                           lambda: paginated_response(rooms, where=lambda room: room['status'] == 'available',
+                                                      version=room_feed.version),
+                           weak=True)
+
+    @app.route('/api/rooms/quote', methods=['GET'])
+    def quote_available_rooms():
+        """Stay totals of every available room for ?check_in=&check_out=, cheapest first"""
+        try:
+            guests, meal_cost = _stay_args()
+            quotes = pricing.quote(_quotable_rooms(), request.args.get('check_in', ''),
+                                   request.args.get('check_out', ''), guests, meal_cost)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(sorted(quotes, key=lambda quote: quote['total']))
+
+    @app.route('/api/rooms/search', methods=['GET'])
+    def search_rooms():
+        """
+        Availability plus price for a window of check-in days: the total of a
+        ?nights= stay for each available room and each of ?days= check-in days
+        from ?from=.
+        """
+        try:
+            guests, meal_cost = _stay_args()
+            days = int(request.args.get('days', 7))
+            nights = int(request.args.get('nights', 1))
+            if days > MAX_SEARCH_DAYS:
+                raise ValueError(f"days must not exceed {MAX_SEARCH_DAYS}")
+            result = pricing.search(_quotable_rooms(), request.args.get('from', ''), days, nights, guests, meal_cost)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(result)
+
+    @app.route('/api/rooms/<room_id>/quote', methods=['GET'])
+    def quote_room(room_id):
+        """Stay total of one room for ?check_in=&check_out=, whatever its current status"""
+        room = rooms.get(room_id)
+        if not room:
+            return jsonify({'error': 'Room not found'}), 404
+        try:
+            guests, meal_cost = _stay_args()
+            quote = pricing.quote([room], request.args.get('check_in', ''),
+                                  request.args.get('check_out', ''), guests, meal_cost)[0]
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(quote)
 
     @app.route('/api/rooms/<room_id>/block', methods=['POST'])
     def block_room(room_id):
@@ -38,6 +112,7 @@ class RoomService:
                 'booking_id': booking_id,
                 'blocked_until': datetime.now() + timedelta(hours=24)
             })
+            room_feed.publish('room_blocked', room_id, rooms[room_id])
             return jsonify({'status': 'room_blocked', 'room_id': room_id})
         return jsonify({'error': 'Room not available'}), 400
 
@@ -48,6 +123,7 @@ class RoomService:
             # Remove from room_bookings
             global room_bookings
             room_bookings = [rb for rb in room_bookings if rb['room_id'] != room_id]
+            room_feed.publish('room_released', room_id, rooms[room_id])
             return jsonify({'status': 'room_released', 'room_id': room_id})
         return jsonify({'error': 'Room not found'}), 404
 
@@ -55,12 +131,23 @@ class RoomService:
     def get_room(room_id):
         room = rooms.get(room_id)
         if room:
-            return jsonify(room)
+            return conditional(room_feed.item_etag(room_id), lambda: jsonify(room))
         return jsonify({'error': 'Room not found'}), 404
 
     @app.route('/api/rooms', methods=['GET'])
     def get_all_rooms():
-        return jsonify(list(rooms.values()))
+        return conditional(room_feed.etag(request.path, request.query_string),
+                           lambda: paginated_response(rooms, version=room_feed.version), weak=True)
+
+    @app.route('/api/rooms/changes', methods=['GET'])
+    def get_room_changes():
+        """Long-poll for room changes after ?since=<version>"""
+        return poll_response(room_feed)
+
+    @app.route('/api/rooms/changes/stream', methods=['GET'])
+    def stream_room_changes():
+        """Room changes as Server-Sent Events"""
+        return stream_response(room_feed)
     
     @app.route('/api/rooms/<room_id>/status', methods=['PUT'])
     def update_room_status(room_id):
@@ -69,6 +156,7 @@ class RoomService:
 
         if room_id in rooms:
             rooms[room_id]['status'] = new_status
+            room_feed.publish('room_status_changed', room_id, rooms[room_id])
             return jsonify({'id': room_id, 'status': new_status})
         return jsonify({'error': 'Room not found'}), 404
 
@@ -81,6 +169,7 @@ class RoomService:
         if room_id in rooms and rooms[room_id]['status'] == 'available':
             rooms[room_id]['status'] = 'occupied'
             rooms[room_id]['current_guest'] = client_id
+            room_feed.publish('room_assigned', room_id, rooms[room_id])
             return jsonify({'status': 'assigned', 'room_id': room_id})
         return jsonify({'error': 'Room not available'}), 400
 
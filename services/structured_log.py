@@ -0,0 +1,224 @@
+"""
+Structured, sampled logging shared by the Flask services and the job workers.
+
+Log calls only build a LogRecord and put it on a bounded queue; a background
+thread turns records into JSON lines and writes them out. If the output
+blocks (a full pipe) the queue fills up and further records are dropped and
+counted instead of stalling request handlers and job handlers.
+
+    log = structured_log.get_logger("payment")
+    log.info("payment processed", booking_id=booking_id, amount=amount)
+
+Every line carries the correlation fields bound for the current request or
+job (process_instance_key, job_key, task_type, ...): workers bind them per
+job, services bind them from the X-Process-Instance-Key / X-Job-Key headers
+that resilience.request forwards.
+
+Environment:
+    LOG_LEVEL     minimum level (default INFO)
+    LOG_SAMPLING  per-logger sample rates for records below WARNING,
+                  e.g. "werkzeug=0.1,resilience=0.5"
+    LOG_FILE      append to this file instead of stdout
+"""
+
+import atexit
+import contextvars
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+try:
+    import json_codec  # imported from a service script
+except ImportError:
+    from services import json_codec
+
+QUEUE_SIZE = 10000
+
+# Request header <-> correlation field
+CORRELATION_HEADERS = {
+    'X-Process-Instance-Key': 'process_instance_key',
+    'X-Job-Key': 'job_key',
+}
+
+_correlation: contextvars.ContextVar = contextvars.ContextVar('log_correlation', default={})
+_STANDARD_KWARGS = frozenset(('exc_info', 'stack_info', 'stacklevel', 'extra'))
+
+_listener: Optional[QueueListener] = None
+_configure_lock = threading.Lock()
+
+
+def bind(**fields: Any) -> contextvars.Token:
+    """Add correlation fields for the current request/job; returns a token for unbind()"""
+    return _correlation.set({**_correlation.get(), **{k: v for k, v in fields.items() if v is not None}})
+
+
+def unbind(token: contextvars.Token) -> None:
+    _correlation.reset(token)
+
+
+def correlation() -> Dict[str, Any]:
+    return _correlation.get()
+
+
+def correlation_headers() -> Dict[str, str]:
+    """Headers that carry the current correlation fields to another service"""
+    fields = _correlation.get()
+    return {header: str(fields[field]) for header, field in CORRELATION_HEADERS.items() if field in fields}
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a `rate` fraction of records below WARNING; warnings and errors always pass"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if random.random() < self.rate:
+            record.sample_rate = self.rate
+            return True
+        return False
+
+
+class _EnqueueHandler(QueueHandler):
+    """Capture the correlation fields and enqueue; never formats, never blocks"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.correlation = _correlation.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'correlation', {}))
+        entry.update(getattr(record, 'fields', {}))
+        if hasattr(record, 'sample_rate'):
+            entry['sample_rate'] = record.sample_rate
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json_codec.dumps(entry)
+
+
+class _WriterHandler(logging.StreamHandler):
+    """Runs on the listener thread; reports records the enqueue side had to drop"""
+
+    def __init__(self, stream, source: _EnqueueHandler):
+        super().__init__(stream)
+        self.source = source
+        self.reported = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        dropped = self.source.dropped
+        if dropped > self.reported:
+            self.stream.write(json_codec.dumps({
+                'ts': datetime.now().isoformat(timespec='milliseconds'), 'level': 'WARNING',
+                'logger': __name__, 'msg': 'log records dropped', 'dropped': dropped - self.reported
+            }) + self.terminator)
+            self.reported = dropped
+        super().emit(record)
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """Logger whose calls take keyword fields: log.info("msg", key=value)"""
+
+    def process(self, msg: Any, kwargs: Dict[str, Any]):
+        fields = {key: kwargs.pop(key) for key in list(kwargs) if key not in _STANDARD_KWARGS}
+        if fields:
+            kwargs['extra'] = {**(kwargs.get('extra') or {}), 'fields': fields}
+        return msg, kwargs
+
+
+def _sampling_from_env() -> Dict[str, float]:
+    rates = {}
+    for part in os.environ.get('LOG_SAMPLING', '').split(','):
+        name, _, rate = part.partition('=')
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def _stop() -> None:
+    try:
+        _listener.stop()
+    except queue.Full:
+        pass  # the writer is stuck; its daemon thread dies with the process
+
+
+def configure() -> None:
+    """Route the root logger through the queue (idempotent)"""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+        log_queue = queue.Queue(maxsize=QUEUE_SIZE)
+        enqueue = _EnqueueHandler(log_queue)
+        log_file = os.environ.get('LOG_FILE')
+        stream = open(log_file, 'a', encoding='utf-8', buffering=1) if log_file else sys.stdout
+        writer = _WriterHandler(stream, enqueue)
+        writer.setFormatter(JsonLinesFormatter())
+
+        root = logging.getLogger()
+        root.handlers = [enqueue]
+        root.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+        for name, rate in _sampling_from_env().items():
+            logging.getLogger(name).addFilter(SamplingFilter(rate))
+
+        _listener = QueueListener(log_queue, writer)
+        _listener.start()
+        atexit.register(_stop)
+
+
+def get_logger(name: str, sample_rate: Optional[float] = None) -> StructuredLogger:
+    """
+    Args:
+        name: Logger name (the `logger` field of every line)
+        sample_rate: Fraction of records below WARNING to keep; LOG_SAMPLING overrides it
+    """
+    configure()
+    logger = logging.getLogger(name)
+    if (sample_rate is not None and name not in _sampling_from_env()
+            and not any(isinstance(f, SamplingFilter) for f in logger.filters)):
+        logger.addFilter(SamplingFilter(sample_rate))
+    return StructuredLogger(logger, {})
+
+
+def install(app) -> None:
+    """Bind the correlation headers of each request to the service's log lines"""
+    from flask import g, request
+
+    configure()
+
+    @app.before_request
+    def _bind_correlation():
+        fields = {field: request.headers.get(header) for header, field in CORRELATION_HEADERS.items()}
+        g.log_correlation = bind(**fields)
+
+    @app.teardown_request
+    def _unbind_correlation(_exc):
+        token = g.pop('log_correlation', None)
+        if token is not None:
+            unbind(token)
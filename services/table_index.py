@@ -0,0 +1,232 @@
+"""
+Restaurant table inventory with a time-slot occupancy index.
+
+Each service period (breakfast, lunch, dinner) is cut into SLOT_MINUTES
+slots, few enough that one period of one table fits in a uint64 bitmap. A
+day is a (periods x tables) uint64 matrix, created on first use, so a full
+season for hundreds of tables is a few MB. "A table for N guests at 20:30"
+is one vectorized mask test over the tables of that period:
+
+    free = (seats >= N) & (bitmaps & wanted_slots == 0)
+
+and picks the smallest table that fits. Holds mark the slots at once and
+expire after their TTL unless confirmed; expired holds are released lazily
+on the next call.
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+import uuid
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SLOT_MINUTES = 15
+# Period: (opens, last slot ends, default sitting in minutes)
+PERIODS = {
+    'breakfast': ('07:00', '10:30', 60),
+    'lunch': ('12:00', '15:00', 90),
+    'dinner': ('18:30', '23:00', 120),
+}
+DEFAULT_HOLD_SECONDS = 300
+MAX_HOLD_SECONDS = 86400
+
+
+def _minutes(value: str) -> int:
+    hours, minutes = value.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def _clock(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class Slot:
+    """A run of slots within one service period of one day"""
+
+    def __init__(self, day: date, period: int, start: int, count: int):
+        self.day = day
+        self.period = period
+        self.start = start
+        self.count = count
+        self.mask = np.uint64(((1 << count) - 1) << start)
+
+
+class TableIndex:
+    def __init__(self, tables: Dict[str, int], periods: Dict[str, Tuple[str, str, int]] = PERIODS,
+                 slot_minutes: int = SLOT_MINUTES):
+        """
+        Args:
+            tables: Seats per table id
+            periods: Service periods, see PERIODS
+            slot_minutes: Slot length; every period must fit in 64 slots
+        """
+        self.slot_minutes = slot_minutes
+        self.period_names = list(periods)
+        self.period_bounds = [(_minutes(opens), _minutes(closes), sitting) for opens, closes, sitting in periods.values()]
+        for name, (opens, closes, _) in zip(self.period_names, self.period_bounds):
+            if (closes - opens) // slot_minutes > 64:
+                raise ValueError(f"{name}: more than 64 slots")
+        self.table_ids: List[str] = list(tables)
+        self._column = {table_id: i for i, table_id in enumerate(self.table_ids)}
+        self.seats = np.array([tables[t] for t in self.table_ids], dtype=np.int32)
+        self._days: Dict[int, np.ndarray] = {}
+        self.bookings: Dict[str, Dict[str, Any]] = {}
+        self._expiries: List[Tuple[float, int, str]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def add_table(self, table_id: str, seats: int) -> None:
+        with self._lock:
+            if table_id in self._column:
+                self.seats[self._column[table_id]] = seats
+                return
+            self._column[table_id] = len(self.table_ids)
+            self.table_ids.append(table_id)
+            self.seats = np.append(self.seats, np.int32(seats))
+            for ordinal, bitmaps in self._days.items():
+                self._days[ordinal] = np.hstack([bitmaps, np.zeros((bitmaps.shape[0], 1), dtype=np.uint64)])
+
+    def inventory(self) -> List[Dict[str, Any]]:
+        return [{'id': table_id, 'seats': int(seats)} for table_id, seats in zip(self.table_ids, self.seats)]
+
+    def in_service(self, at: str) -> bool:
+        """
+        Whether a sitting can start at `at` (HH:MM)
+
+        Raises:
+            ValueError: `at` is not HH:MM
+        """
+        start = _minutes(at)
+        return any(opens <= start < closes for opens, closes, _ in self.period_bounds)
+
+    def slot(self, day: date, at: str, minutes: Optional[int] = None) -> Slot:
+        """
+        The slots a sitting starting at `at` (HH:MM) occupies, cut at the end of its period
+
+        Raises:
+            ValueError: `at` is outside every service period
+        """
+        start = _minutes(at)
+        for period, (opens, closes, sitting) in enumerate(self.period_bounds):
+            if opens <= start < closes:
+                first = (start - opens) // self.slot_minutes
+                last = min(-(-(start + (minutes or sitting) - opens) // self.slot_minutes),
+                           (closes - opens) // self.slot_minutes)
+                return Slot(day, period, first, max(last - first, 1))
+        raise ValueError(f"{at} is outside the service periods")
+
+    def _bitmaps(self, day: date) -> np.ndarray:
+        ordinal = day.toordinal()
+        bitmaps = self._days.get(ordinal)
+        if bitmaps is None:
+            bitmaps = self._days[ordinal] = np.zeros((len(self.period_bounds), len(self.table_ids)), dtype=np.uint64)
+        return bitmaps
+
+    def _free(self, slot: Slot, guests: int) -> np.ndarray:
+        """Columns of the tables that seat `guests` and are free for `slot`, smallest table first"""
+        bitmaps = self._days.get(slot.day.toordinal())
+        fits = self.seats >= guests
+        if bitmaps is not None:
+            fits &= (bitmaps[slot.period] & slot.mask) == 0
+        columns = np.flatnonzero(fits)
+        return columns[np.argsort(self.seats[columns], kind='stable')]
+
+    def find(self, day: date, at: str, guests: int, minutes: Optional[int] = None, limit: int = 5) -> List[Dict[str, Any]]:
+        """Free tables for `guests` at `at`, best fit (fewest seats) first"""
+        slot = self.slot(day, at, minutes)
+        with self._lock:
+            self._expire()
+            columns = self._free(slot, guests)[:limit]
+            return [self._describe(int(column), slot) for column in columns]
+
+    def hold(self, day: date, at: str, guests: int, minutes: Optional[int] = None, table_id: Optional[str] = None,
+             ttl: float = DEFAULT_HOLD_SECONDS) -> Optional[Dict[str, Any]]:
+        """
+        Reserve the best free table (or `table_id`) until confirmed or `ttl` seconds pass
+
+        Returns:
+            The hold, or None if no table fits
+
+        Raises:
+            ValueError: `at` is outside the service periods, or `ttl` is not in (0, MAX_HOLD_SECONDS]
+        """
+        if not (math.isfinite(ttl) and 0 < ttl <= MAX_HOLD_SECONDS):
+            raise ValueError(f"ttl_seconds must be in (0, {MAX_HOLD_SECONDS}]")
+        slot = self.slot(day, at, minutes)
+        with self._lock:
+            self._expire()
+            columns = self._free(slot, guests)
+            if table_id is not None:
+                column = self._column.get(table_id)
+                columns = columns[columns == column] if column is not None else columns[:0]
+            if not len(columns):
+                return None
+            column = int(columns[0])
+            # Build the hold first: the slots are only marked once nothing else can fail
+            booking = self._describe(column, slot)
+            expires = time.time() + ttl
+            booking.update({'id': str(uuid.uuid4()), 'guests': guests, 'status': 'held',
+                            'expires_at': datetime.fromtimestamp(expires).isoformat(),
+                            '_slot': slot, '_column': column})
+            self._bitmaps(day)[slot.period, column] |= slot.mask
+            self.bookings[booking['id']] = booking
+            heapq.heappush(self._expiries, (expires, next(self._sequence), booking['id']))
+            return self.public(booking)
+
+    def confirm(self, booking_id: str, **details: Any) -> Optional[Dict[str, Any]]:
+        """Turn a live hold into a reservation; None if it does not exist or has expired"""
+        with self._lock:
+            self._expire()
+            booking = self.bookings.get(booking_id)
+            if booking is None or booking['status'] != 'held':
+                return None
+            booking.update(details, status='confirmed', expires_at=None,
+                           confirmed_at=datetime.now().isoformat())
+            return self.public(booking)
+
+    def release(self, booking_id: str) -> bool:
+        """Free the slots of a hold or reservation"""
+        with self._lock:
+            booking = self.bookings.pop(booking_id, None)
+            if booking is None:
+                return False
+            slot = booking['_slot']
+            self._bitmaps(slot.day)[slot.period, booking['_column']] &= ~slot.mask
+            return True
+
+    def get(self, booking_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._expire()
+            booking = self.bookings.get(booking_id)
+            return self.public(booking) if booking else None
+
+    @staticmethod
+    def public(booking: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in booking.items() if not key.startswith('_')}
+
+    def _describe(self, column: int, slot: Slot) -> Dict[str, Any]:
+        opens = self.period_bounds[slot.period][0]
+        return {
+            'table_id': self.table_ids[column],
+            'seats': int(self.seats[column]),
+            'date': slot.day.isoformat(),
+            'period': self.period_names[slot.period],
+            'start': _clock(opens + slot.start * self.slot_minutes),
+            'end': _clock(opens + (slot.start + slot.count) * self.slot_minutes)
+        }
+
+    def _expire(self) -> None:
+        # Caller holds the lock
+        now = time.time()
+        while self._expiries and self._expiries[0][0] <= now:
+            _, _, booking_id = heapq.heappop(self._expiries)
+            booking = self.bookings.get(booking_id)
+            if booking is not None and booking['status'] == 'held':
+                del self.bookings[booking_id]
+                slot = booking['_slot']
+                self._days[slot.day.toordinal()][slot.period, booking['_column']] &= ~slot.mask
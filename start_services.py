@@ -2,45 +2,44 @@
 """
 Start all Hotel Bey services for development/testing.
 Run this before running the demo.
+
+    python start_services.py                   # one process per service
+    python start_services.py --single-process  # all services in app_host.py
 """
 
-import subprocess
+import argparse
 import sys
 import time
-import os
 
-SERVICES = [
-    ("BeyBooking", 5001, "services/booking_service.py"),
-    ("BeyRooms", 5002, "services/room_service.py"),
-    ("BeyResto", 5003, "services/restaurant_service.py"),
-    ("BeyClient", 5004, "services/client_service.py"),
-    ("BeyPayment", 5005, "services/payment_service.py"),
-    ("BeyAccounting", 5006, "services/accounting_service.py"),
-]
+from service_launcher import SERVICES, launch_all, report, stop_all
+
+APP_HOST = {"name": "AppHost", "port": 5000, "file": "app_host.py"}
 
 def main():
+    parser = argparse.ArgumentParser(description="Start all Hotel Bey services")
+    parser.add_argument("--single-process", action="store_true",
+                        help="Serve every service from one app_host.py process (same ports and paths)")
+    args = parser.parse_args()
+
     print("=" * 60)
     print("  HOTEL BEY - Starting All Services")
     print("=" * 60)
-    
-    processes = []
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    for name, port, file in SERVICES:
-        print(f"  Starting {name} on port {port}...")
-        proc = subprocess.Popen(
-            [sys.executable, file],
-            cwd=base_dir
-        )
-        processes.append((name, proc))
-        time.sleep(0.5)
-    
+
+    # Everything starts at once; each service is awaited on /api/ready
+    results = launch_all([APP_HOST] if args.single_process else SERVICES)
+    report(results)
+
+    if any(r["error"] for r in results):
+        print("\nSome services failed to start, stopping the others...")
+        stop_all(results)
+        sys.exit(1)
+
     print("\n" + "=" * 60)
-    print("  All services started!")
+    print("  All services ready!")
     print("=" * 60)
     print("\nServices running:")
-    for name, port, _ in SERVICES:
-        print(f"  - {name}: http://localhost:{port}")
+    for service in SERVICES:
+        print(f"  - {service['name']}: http://localhost:{service['port']}")
     
     print("\nPress Ctrl+C to stop all services...")
     
@@ -49,10 +48,8 @@ def main():
             time.sleep(1)
     except KeyboardInterrupt:
         print("\n\nStopping services...")
-        for name, proc in processes:
-            proc.terminate()
+        stop_all(results)
         print("Done.")
 
 if __name__ == "__main__":
     main()
-
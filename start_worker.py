@@ -26,7 +26,9 @@ def main():
     )
     
     try:
+        # Ctrl+C/SIGTERM drain the worker and return; KeyboardInterrupt only if it came before startup
         asyncio.run(worker.run())
+        print("\nWorker stopped.")
     except KeyboardInterrupt:
         print("\nWorker stopped.")
     except Exception as e:
@@ -0,0 +1,310 @@
+"""
+Variable slimming for job workers.
+
+pyzeebe fetches every process variable for a handler that takes **kwargs, and
+merges whatever a handler returns into the process instance. Both grow with
+the process state. ProjectingWorker registers tasks so that:
+
+  - only the variables named in the handler signature are fetched
+    (**kwargs and the Job parameter are ignored),
+  - with outputs=[...], only those keys of the returned dict are completed
+    back to Zeebe; anything else is dropped with a one-time warning,
+  - log lines written while a job runs carry its correlation fields
+    (process_instance_key, job_key, task_type), and so do the requests it
+    makes through resilience,
+  - a job runs against its lock expiry minus COMPLETE_MARGIN: every
+    downstream call is capped by what is left, a job whose lock expired while
+    it waited for a slot is dropped without running, and a handler still busy
+    at the deadline is cancelled. The job is then neither completed nor
+    failed; Zeebe has already made it available to another worker.
+
+serve() runs the worker until SIGTERM or SIGINT and then drains it: polling
+stops at once, jobs that were activated but not started and jobs still
+running after DRAIN_GRACE seconds are failed with their retries unchanged and
+no backoff, so the broker hands them to another worker right away instead of
+after the job timeout.
+
+Handlers registered with fusable=True can also be chained into one composite
+task type with fused_task(). The chain runs in a single job, so a model that
+uses the composite saves one activate/complete round-trip through the broker
+per step it replaces. A failed composite job is retried from the first step,
+so only handlers that are pure or idempotent may be fused.
+"""
+
+import asyncio
+import functools
+import inspect
+import signal
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from pyzeebe import Job, ZeebeWorker
+
+import deadlines
+from deadlines import DeadlineExceeded
+from services import structured_log
+
+# Seconds of the job's lock kept back for the complete/fail call to reach the broker
+COMPLETE_MARGIN = 1.0
+# Seconds running jobs get to finish once a drain starts
+DRAIN_GRACE = 10.0
+
+log = structured_log.get_logger("task_io")
+
+
+def input_variables(handler: Callable) -> List[str]:
+    """Variable names a handler reads: its named parameters, minus the Job"""
+    names = []
+    for param in inspect.signature(handler).parameters.values():
+        if param.kind in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD):
+            continue
+        if param.annotation is Job or param.name == "self":
+            continue
+        names.append(param.name)
+    return names
+
+
+def project(task_type: str, handler: Callable, outputs: Optional[Iterable[str]]) -> Callable:
+    """Wrap a handler so that only `outputs` keys of its result are returned"""
+    allowed = frozenset(outputs) if outputs is not None else None
+    warned = set()
+
+    def apply(result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        result = result or {}
+        if allowed is None:
+            return result
+        for key in result:
+            if key not in allowed and key not in warned:
+                warned.add(key)
+                log.warning("dropping undeclared output", task_type=task_type, output=key)
+        return {key: value for key, value in result.items() if key in allowed}
+
+    if inspect.iscoroutinefunction(handler):
+        run = handler
+    else:
+        # Run sync handlers on the default executor like pyzeebe does, but with
+        # the job's context so the correlation fields and deadline reach the thread
+        async def run(*args, **kwargs):
+            return await asyncio.to_thread(handler, *args, **kwargs)
+
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        budget = deadlines.remaining()
+        if budget is not None and budget <= 0:
+            raise DeadlineExceeded(f"{task_type}: job lock expired before the handler started")
+        try:
+            # A cancelled thread runs on, but its next resilience call fails fast
+            result = await asyncio.wait_for(run(*args, **kwargs), budget)
+        except asyncio.TimeoutError:
+            if deadlines.expired():
+                raise DeadlineExceeded(f"{task_type}: job lock expired, handler cancelled") from None
+            raise
+        if deadlines.expired():
+            raise DeadlineExceeded(f"{task_type}: job lock expired before the handler returned")
+        return apply(result)
+    return wrapper
+
+
+def job_deadline(job: Job) -> Optional[float]:
+    """Monotonic time by which the job must be reported: its lock expiry minus COMPLETE_MARGIN"""
+    if not job.deadline:
+        return None
+    return time.monotonic() + job.deadline / 1000 - time.time() - COMPLETE_MARGIN
+
+
+async def bind_job(job: Job) -> Job:
+    """pyzeebe `before` decorator: correlation fields and the deadline for everything the job runs"""
+    structured_log.bind(process_instance_key=job.process_instance_key, job_key=job.key,
+                        task_type=job.type, bpmn_process_id=job.bpmn_process_id)
+    at = job_deadline(job)
+    if at is not None:
+        deadlines.bind(at)
+    return job
+
+
+class FusableStep:
+    """A registered handler that fused_task() may run as one step of a chain"""
+
+    def __init__(self, task_type: str, handler: Callable, inputs: List[str], outputs: Optional[Iterable[str]]):
+        self.task_type = task_type
+        self.handler = handler
+        self.inputs = inputs
+        self.outputs = frozenset(outputs) if outputs is not None else None
+
+    def run(self, variables: Dict[str, Any]) -> Dict[str, Any]:
+        result = self.handler(**{name: variables[name] for name in self.inputs if name in variables}) or {}
+        if self.outputs is None:
+            return result
+        return {key: value for key, value in result.items() if key in self.outputs}
+
+
+class ProjectingWorker(ZeebeWorker):
+    """ZeebeWorker whose task() fetches only declared inputs and projects outputs, and which drains on shutdown"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fusable: Dict[str, FusableStep] = {}
+        self._running: Dict[asyncio.Task, Job] = {}
+
+    def task(self, task_type: str, outputs: Optional[Iterable[str]] = None,
+             variables_to_fetch: Optional[Iterable[str]] = None, fusable: bool = False, **kwargs):
+        """
+        Args:
+            task_type: The task type
+            outputs: Keys of the handler result to send back (None: send all)
+            variables_to_fetch: Override the inputs taken from the signature
+            fusable: Also offer the handler to fused_task(); it must be a
+                sync function that is pure or idempotent and takes no Job
+            **kwargs: Passed to ZeebeWorker.task
+        """
+        register = super().task
+
+        def decorator(handler: Callable) -> Callable:
+            fetch = list(variables_to_fetch) if variables_to_fetch is not None else input_variables(handler)
+            if not fetch:
+                raise ValueError(f"{task_type}: handler declares no input variables; "
+                                 "pass variables_to_fetch explicitly")
+            if fusable:
+                takes_job = any(p.annotation is Job for p in inspect.signature(handler).parameters.values())
+                if inspect.iscoroutinefunction(handler) or takes_job:
+                    raise ValueError(f"{task_type}: only sync handlers without a Job parameter can be fused")
+                self.fusable[task_type] = FusableStep(task_type, handler, fetch, outputs)
+            before = [bind_job, self._track, *(kwargs.pop("before", None) or [])]
+            register(task_type=task_type, variables_to_fetch=fetch, before=before,
+                     **kwargs)(project(task_type, handler, outputs))
+            return handler
+
+        return decorator
+
+    async def _track(self, job: Job) -> Job:
+        """`before` decorator: remember the asyncio task running the job until it ends"""
+        running = asyncio.current_task()
+        self._running[running] = job
+        running.add_done_callback(lambda done: self._running.pop(done, None))
+        return job
+
+    async def serve(self, grace: float = DRAIN_GRACE) -> None:
+        """
+        work() until SIGTERM or SIGINT, then drain(); a second signal ends the grace period early
+
+        Args:
+            grace: Seconds running jobs get to finish before they are failed
+        """
+        loop = asyncio.get_running_loop()
+        stop, hurry = asyncio.Event(), asyncio.Event()
+
+        def on_signal() -> None:
+            (hurry if stop.is_set() else stop).set()
+
+        installed = []
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(signum, on_signal)
+                installed.append(signum)
+            except (NotImplementedError, RuntimeError):  # Windows, or not the main thread
+                pass
+        working = asyncio.ensure_future(self.work())
+        stopping = asyncio.ensure_future(stop.wait())
+        try:
+            await asyncio.wait({working, stopping}, return_when=asyncio.FIRST_COMPLETED)
+            if not working.done():
+                await self.drain(grace, hurry)
+            await working
+        finally:
+            stopping.cancel()
+            for signum in installed:
+                loop.remove_signal_handler(signum)
+
+    async def drain(self, grace: float = DRAIN_GRACE, hurry: Optional[asyncio.Event] = None) -> None:
+        """
+        Stop activating jobs, give running jobs `grace` seconds, and hand every other job back
+
+        Args:
+            grace: Seconds running jobs get to finish
+            hurry: Set to end the grace period early
+        """
+        log.info("draining worker", running=len(self._running), grace=grace)
+        # Stop the pollers and executors; work() cancels the pending activations
+        for poller in [*self._job_pollers, *self._job_streamers, *self._job_executors]:
+            poller.stop_event.set()
+        self._stop_event.set()
+        await asyncio.sleep(0)
+
+        queued = 0
+        for executor in self._job_executors:
+            while not executor.jobs.empty():
+                job = executor.jobs.get_nowait()
+                await self._release(job, "worker shutting down before the job started")
+                executor.jobs.task_done()
+                executor.task_state.remove(job)
+                queued += 1
+
+        # An executor marks a job done when its task ends, so joining the queues
+        # also waits for tasks that were created but have not reached _track yet
+        waits = [asyncio.ensure_future(asyncio.gather(*(executor.jobs.join() for executor in self._job_executors)))]
+        if hurry is not None:
+            waits.append(asyncio.ensure_future(hurry.wait()))
+        await asyncio.wait(waits, timeout=grace, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in waits:
+            waiter.cancel()
+        # Let a task created during the last step register before taking the snapshot
+        await asyncio.sleep(0)
+        unfinished = {task: job for task, job in self._running.items() if not task.done()}
+        for task in unfinished:
+            task.cancel()
+        for job in unfinished.values():
+            await self._release(job, "worker shutting down, job interrupted")
+        log.info("worker drained", interrupted=len(unfinished), released=queued + len(unfinished))
+
+    async def _release(self, job: Job, reason: str) -> None:
+        """Fail a job for an immediate retry elsewhere, without using up one of its retries"""
+        try:
+            await self.zeebe_adapter.fail_job(job_key=job.key, retries=job.retries, message=reason,
+                                              retry_back_off_ms=0, variables={})
+        except Exception as e:
+            # Already completed, or its lock expired: either way it is no longer ours
+            log.warning("could not release job", job_key=job.key, task_type=job.type, error=str(e))
+
+    def fused_task(self, task_type: str, steps: Iterable[str], outputs: Optional[Iterable[str]] = None,
+                   **kwargs) -> Callable:
+        """
+        Register a composite task type that runs fusable tasks in order in one job.
+
+        Each step sees the job variables plus the outputs of the steps before
+        it; the job completes with the merged outputs of all steps. Only the
+        variables no earlier step produces are fetched.
+
+        Args:
+            task_type: The composite task type
+            steps: Task types registered with fusable=True, in run order
+            outputs: Keys of the merged result to send back (default: the
+                declared outputs of every step)
+            **kwargs: Passed to ZeebeWorker.task
+        """
+        chain = []
+        for step in steps:
+            if step not in self.fusable:
+                raise ValueError(f"{task_type}: {step} is not registered with fusable=True")
+            chain.append(self.fusable[step])
+        if not chain:
+            raise ValueError(f"{task_type}: no steps to fuse")
+
+        fetch, produced, declared = [], set(), set()
+        for step in chain:
+            fetch += [name for name in step.inputs if name not in produced and name not in fetch]
+            produced |= step.outputs if step.outputs is not None else set()
+            declared = None if declared is None or step.outputs is None else declared | step.outputs
+        if outputs is None and declared is not None:
+            outputs = sorted(declared)
+
+        def run_chain(**variables) -> Dict[str, Any]:
+            merged: Dict[str, Any] = {}
+            for step in chain:
+                result = step.run(variables)
+                variables.update(result)
+                merged.update(result)
+            return merged
+
+        run_chain.__name__ = run_chain.__qualname__ = "fused_" + task_type.replace("-", "_")
+        self.task(task_type, outputs=outputs, variables_to_fetch=fetch, **kwargs)(run_chain)
+        return run_chain
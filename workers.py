@@ -1,6 +1,14 @@
 import asyncio
-import requests
-from pyzeebe import ZeebeWorker, create_insecure_channel
+from pyzeebe import Job, create_insecure_channel
+
+import resilience
+from resilience import idempotency_headers, resilience_exception_handler, start_metrics_server
+from services import structured_log
+from task_io import ProjectingWorker
+
+METRICS_PORT = 9101
+
+log = structured_log.get_logger("workers")
 
 def validate_input(first_name: str = "", last_name: str = "", email: str = "", check_in: str = "", check_out: str = "", **kwargs):
     missing_fields = [f for f, val in zip(
@@ -12,27 +20,30 @@ def validate_input(first_name: str = "", last_name: str = "", email: str = "", c
     return {"valid": True}
 
 
-def search_client(email: str = "", **kwargs):
-    if not email:
+def search_client(email: str = "", first_name: str = "", last_name: str = "", phone: str = "", **kwargs):
+    # Fuzzy match: a guest booking with another email is still found by name + phone
+    params = {k: v for k, v in {"email": email, "first_name": first_name, "last_name": last_name, "phone": phone}.items() if v}
+    if not params:
         return {"clientFound": False}
-    response = requests.get("http://localhost:5002/api/clients/search", params={"email": email})
-    if response.status_code == 200 and response.json():
-        client_data = response.json()[0]
-        return {"clientFound": True, "client_id": client_data.get("id")}
+    response = resilience.get("client", "http://localhost:5002/api/clients/search", params=params)
+    matches = resilience.json_body(response) if response.status_code == 200 else []
+    if matches:
+        return {"clientFound": True, "client_id": matches[0].get("id")}
     return {"clientFound": False}
 
 
-def create_client(first_name: str = "", last_name: str = "", email: str = "", phone: str = None, **kwargs):
+def create_client(job: Job, first_name: str = "", last_name: str = "", email: str = "", phone: str = None, **kwargs):
     data = {"first_name": first_name, "last_name": last_name, "email": email, "phone": phone}
-    response = requests.post("http://localhost:5002/api/clients/create", json=data)
+    response = resilience.post("client", "http://localhost:5002/api/clients/create", json=data,
+                               headers=idempotency_headers(job))
     response.raise_for_status()
-    return {"client_id": response.json().get("client_id")}
+    return {"client_id": resilience.json_body(response).get("client_id")}
 
 
 def check_room_availability(check_in: str = "", check_out: str = "", **kwargs):
-    response = requests.get("http://localhost:5009/api/rooms/available", params={"check_in": check_in, "check_out": check_out})
+    response = resilience.get("rooms", "http://localhost:5009/api/rooms/available", params={"check_in": check_in, "check_out": check_out})
     response.raise_for_status()
-    rooms = response.json()
+    rooms = resilience.json_body(response)
     return {"roomAvailable": bool(rooms), "selected_room_id": rooms[1]["id"] if rooms else None}
 
 
@@ -46,10 +57,10 @@ def check_reservation_type(guests: int = 1, room_type: str = "standard", **kwarg
 def check_meal_plan(meal_plan: str = "none", **kwargs):
     if meal_plan.lower() == "none":
         return {"meal_plan_valid": True, "meal_plan_daily_cost": 0}
-    response = requests.get("http://localhost:5008/api/restaurant/menu", params={"category": meal_plan})
-    items = response.json()
-    if items:
-        return {"meal_plan_valid": True, "meal_plan_daily_cost": items[0]["price"]}
+    # Daily cost per person of the whole plan (e.g. half board = breakfast + dinner)
+    response = resilience.get("restaurant", f"http://localhost:5008/api/restaurant/meal-plans/{meal_plan.lower()}")
+    if response.status_code == 200:
+        return {"meal_plan_valid": True, "meal_plan_daily_cost": resilience.json_body(response)["daily_cost"]}
     return {"meal_plan_valid": False, "meal_plan_daily_cost": 0}
 
 
@@ -57,86 +68,97 @@ def block_room(selected_room_id: str = "", booking_id = "", **kwargs):
     # Convert booking_id to string if it's not already
     booking_id_str = str(booking_id) if booking_id else ""
     
-    print(f"Blocking room: room_id={selected_room_id}, booking_id={booking_id_str}")
-    
+    log.info("blocking room", room_id=selected_room_id, booking_id=booking_id_str)
+
     # Only send booking_id in the payload, room_id is in the URL
     payload = {"booking_id": booking_id_str}
-    response = requests.post(f"http://localhost:5009/api/rooms/{selected_room_id}/block", json=payload)
+    response = resilience.post("rooms", f"http://localhost:5009/api/rooms/{selected_room_id}/block", json=payload)
     
     if response.status_code != 200:
-        print(f"Error response from room service: {response.status_code}")
-        print(f"Response body: {response.text}")
+        log.warning("room service refused block", status=response.status_code, body=response.text)
     
     response.raise_for_status()
     return {"room_blocked": True, "room_id": selected_room_id}
 
-def create_booking(client_id: str = "", room_id: str = "", check_in: str = "", check_out: str = "", guests: int = 1, **kwargs):
+def create_booking(job: Job, client_id: str = "", room_id: str = "", check_in: str = "", check_out: str = "", guests: int = 1,
+                   meal_plan_daily_cost: float = 0, **kwargs):
+    # Price the whole stay (every night, occupancy, meal plan) before creating the booking
+    quote_resp = resilience.get("rooms", f"http://localhost:5009/api/rooms/{room_id}/quote", params={
+        "check_in": check_in, "check_out": check_out, "guests": guests,
+        "meal_plan_daily_cost": meal_plan_daily_cost or 0
+    })
+    quote_resp.raise_for_status()
+    quote = resilience.json_body(quote_resp)
+    total_amount = quote["total"]
+
     data = {
         "client_id": client_id,
         "room_id": room_id,
+        "room_type": quote["type"],
         "check_in": check_in,
         "check_out": check_out,
-        "guests": guests
+        "guests": guests,
+        "total_amount": total_amount
     }
-    response = requests.post("http://localhost:5001/api/booking/create", json=data)
+    response = resilience.post("booking", "http://localhost:5001/api/booking/create", json=data,
+                               headers=idempotency_headers(job))
     response.raise_for_status()
-    result = response.json()
-    booking_id = result.get("booking_id")
-
-
-    # Fetch the room price from room service
-    room_resp = requests.get(f"http://localhost:5009/api/rooms/{room_id}")
-    room_resp.raise_for_status()
-    room = room_resp.json()
-    
-    total_amount = room.get("price", 0) 
-    print("total_amount", total_amount)
+    result = resilience.json_body(response)
     return {
-        "booking_id": booking_id,
+        "booking_id": result.get("booking_id"),
         "status": result.get("status"),
         "total_amount": total_amount
     }
 
 
-def process_payment(booking_id: str = "", total_amount: float = 0, **kwargs):
+def process_payment(job: Job, booking_id: str = "", total_amount: float = 0, client_id: str = "", **kwargs):
     if total_amount <= 0:
         raise ValueError(f"Invalid total_amount: {total_amount}")
     
-    data = {"booking_id": booking_id, "amount": total_amount, "payment_method": "credit_card"}
-    response = requests.post("http://localhost:5007/api/payment/process", json=data)
+    # client_id lets the payment service accrue loyalty points
+    data = {"booking_id": booking_id, "amount": total_amount, "payment_method": "credit_card", "client_id": client_id}
+    response = resilience.post("payment", "http://localhost:5007/api/payments/process", json=data,
+                               headers=idempotency_headers(job))
     response.raise_for_status()
-    result = response.json()
+    result = resilience.json_body(response)
     return {"payment_status": result.get("status"), "transaction_id": result.get("transaction_id")}
 
 
 
-def generate_accounting(booking_id: str = "", first_name: str = "", last_name: str = "", email: str = "", total_amount: float = 0, **kwargs):
+def generate_accounting(job: Job, booking_id: str = "", first_name: str = "", last_name: str = "", email: str = "", total_amount: float = 0, **kwargs):
     data = {"booking_id": booking_id, "client_data": {"first_name": first_name, "last_name": last_name, "email": email}, "total_amount": total_amount}
-    response = requests.post("http://localhost:5006/api/accounting/generate-confirmation", json=data)
+    response = resilience.post("accounting", "http://localhost:5006/api/accounting/generate-confirmation", json=data,
+                               headers=idempotency_headers(job))
     response.raise_for_status()
-    result = response.json()
+    result = resilience.json_body(response)
     return {"confirmation_doc_id": result.get("document_id"), "confirmation_sent": True}
 
 
 async def main():
     # Create channel inside the async context
     channel = create_insecure_channel(grpc_address="localhost:26500")
-    worker = ZeebeWorker(channel)
+    worker = ProjectingWorker(channel, exception_handler=resilience_exception_handler)
+    start_metrics_server(METRICS_PORT)
     
-    # Register all task handlers
-    worker.task(task_type="validate-input")(validate_input)
-    worker.task(task_type="search-client")(search_client)
-    worker.task(task_type="create-client")(create_client)
-    worker.task(task_type="check-room-availability")(check_room_availability)
-    worker.task(task_type="check-reservation-type")(check_reservation_type)
-    worker.task(task_type="check-meal-plan")(check_meal_plan)
-    worker.task(task_type="block-room")(block_room)
-    worker.task(task_type="create-booking")(create_booking)
-    worker.task(task_type="process-payment")(process_payment)
-    worker.task(task_type="generate-accounting")(generate_accounting)
+    # Register all task handlers; inputs come from the signatures, outputs are projected
+    worker.task(task_type="validate-input", outputs=["valid"], fusable=True)(validate_input)
+    worker.task(task_type="search-client", outputs=["clientFound", "client_id"])(search_client)
+    worker.task(task_type="create-client", outputs=["client_id"])(create_client)
+    worker.task(task_type="check-room-availability", outputs=["roomAvailable", "selected_room_id"])(check_room_availability)
+    worker.task(task_type="check-reservation-type", outputs=["reservation_type", "requires_manager_approval"],
+                fusable=True)(check_reservation_type)
+    worker.task(task_type="check-meal-plan", outputs=["meal_plan_valid", "meal_plan_daily_cost"])(check_meal_plan)
+    worker.task(task_type="block-room", outputs=["room_id"])(block_room)
+    worker.task(task_type="create-booking", outputs=["booking_id", "total_amount"])(create_booking)
+    worker.task(task_type="process-payment", outputs=["payment_status", "transaction_id"])(process_payment)
+    worker.task(task_type="generate-accounting", outputs=["confirmation_doc_id"])(generate_accounting)
+
+    # Pure steps fused into one job (hotel-reservation-process-fused.bpmn)
+    worker.fused_task(task_type="validate-reservation", steps=["validate-input", "check-reservation-type"])
     
-    print("🚀 Camunda 8 workers running...")
-    await worker.work()
+    log.info("reservation workers running")
+    # Drains on SIGTERM/Ctrl+C: in-flight jobs finish or go straight back to the broker
+    await worker.serve()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -1,15 +1,28 @@
-from pyzeebe import ZeebeWorker, create_insecure_channel, create_camunda_cloud_channel, Job
+from pyzeebe import create_insecure_channel, create_camunda_cloud_channel, Job
 from pyzeebe.task import task
-import requests
 from typing import Dict, Any, Optional
 import os
 import asyncio
+from datetime import date
+
+import resilience
+from deadlines import DeadlineExceeded
+from resilience import DependencyUnavailableError, idempotency_headers, resilience_exception_handler, start_metrics_server
+from services import structured_log
+from task_io import ProjectingWorker
+
+log = structured_log.get_logger("zeebe_worker")
+
+# The best-effort HQ push takes at most this much of the job's remaining lock time;
+# every other call may use all of it (task_io.bind_job)
+ESB_PUSH_TIMEOUT = 5.0
 
 class HotelServiceWorker:
     def __init__(self, 
                  zeebe_address: str = "localhost:26500",
                  services_base_url: str = "http://localhost",
                  use_camunda_cloud: bool = False,
+                 metrics_port: Optional[int] = 9100,
                  **cloud_kwargs):
         """
         Initialize Zeebe job worker
@@ -18,56 +31,64 @@ class HotelServiceWorker:
             zeebe_address: Zeebe broker address
             services_base_url: Base URL for Flask microservices
             use_camunda_cloud: Whether to use Camunda Cloud
+            metrics_port: Port for the downstream guard metrics (None to disable)
             **cloud_kwargs: Camunda Cloud credentials
         """
         self.services_base_url = services_base_url
+        self.metrics_port = metrics_port
         
         if use_camunda_cloud:
-            self.worker = ZeebeWorker(
-                create_camunda_cloud_channel(**cloud_kwargs)
+            self.worker = ProjectingWorker(
+                create_camunda_cloud_channel(**cloud_kwargs),
+                exception_handler=resilience_exception_handler
             )
         else:
             channel = create_insecure_channel(zeebe_address)
-            self.worker = ZeebeWorker(channel)
+            self.worker = ProjectingWorker(channel, exception_handler=resilience_exception_handler)
         
         self._register_handlers()
     
     def _register_handlers(self):
-        """Register all job handlers"""
+        """Register all job handlers; each declares the variables it sends back"""
         
-        @self.worker.task(task_type="validate-input")
+        @self.worker.task(task_type="validate-input", outputs=["valid"])
         async def validate_input(job: Job, first_name: str, last_name: str, email: str, check_in: str, check_out: str) -> Dict[str, Any]:
             """Validate reservation input"""
-            print(f"[Zeebe] Validating input for {email}...")
+            log.info("validating input", email=email)
             # PyZeebe injects variables as arguments if names match
             if not email or not check_in:
                  raise ValueError(f"Missing required fields")
             
             return {"valid": True}
         
-        @self.worker.task(task_type="search-client")
+        @self.worker.task(task_type="search-client", outputs=["clientFound", "client_id"])
         async def search_client(job: Job, email: str) -> Dict[str, Any]:
             """Search for existing client by email"""
-            print(f"[Zeebe] Searching client: {email}")
+            log.info("searching client", email=email)
             
             url = f"{self.services_base_url}:5004/api/clients/search"
             try:
-                response = requests.get(url, params={"email": email})
-                if response.status_code == 200 and response.json():
-                    client = response.json()[0]
+                response = resilience.get("client", url, params={"email": email})
+                matches = resilience.json_body(response) if response.status_code == 200 else []
+                if matches:
+                    client = matches[0]
                     return {
                         "clientFound": True,
                         "client_id": client.get("id")
                     }
+            except (DependencyUnavailableError, DeadlineExceeded):
+                # Don't report "not found" while the service is unreachable,
+                # that would create a duplicate client; a lost job is abandoned
+                raise
             except Exception as e:
-                print(f"Service Error: {e}")
+                log.warning("client search failed", error=str(e))
             
             return {"clientFound": False}
         
-        @self.worker.task(task_type="create-client")
+        @self.worker.task(task_type="create-client", outputs=["client_id", "clientFound"])
         async def create_client(job: Job, first_name: str, last_name: str, email: str, phone: str) -> Dict[str, Any]:
             """Create new client"""
-            print(f"[Zeebe] Creating client: {email}")
+            log.info("creating client", email=email)
             client_data = {
                 "first_name": first_name,
                 "last_name": last_name,
@@ -76,24 +97,24 @@ class HotelServiceWorker:
             }
             
             url = f"{self.services_base_url}:5004/api/clients/create"
-            response = requests.post(url, json=client_data)
+            response = resilience.post("client", url, json=client_data, headers=idempotency_headers(job))
             response.raise_for_status()
             
-            result = response.json()
+            result = resilience.json_body(response)
             return {"client_id": result.get("client_id"), "clientFound": True}
         
-        @self.worker.task(task_type="check-room-availability")
+        @self.worker.task(task_type="check-room-availability", outputs=["roomAvailable", "selected_room_id"])
         async def check_room_availability(job: Job, check_in: str, check_out: str) -> Dict[str, Any]:
             """Check room availability"""
-            print(f"[Zeebe] Checking rooms...")
+            log.info("checking rooms", check_in=check_in, check_out=check_out)
             
             url = f"{self.services_base_url}:5002/api/rooms/available"
             params = {"check_in": check_in, "check_out": check_out}
             
-            response = requests.get(url, params=params)
+            response = resilience.get("rooms", url, params=params)
             response.raise_for_status()
             
-            available_rooms = response.json()
+            available_rooms = resilience.json_body(response)
             room_available = len(available_rooms) > 0
             
             result = {
@@ -105,16 +126,16 @@ class HotelServiceWorker:
             
             return result
         
-        @self.worker.task(task_type="block-room")
+        @self.worker.task(task_type="block-room", outputs=["room_blocked"])
         async def block_room(job: Job, selected_room_id: int) -> Dict[str, Any]:
             """Block a room for booking"""
-            print(f"[Zeebe] Blocking room {selected_room_id}...")
+            log.info("blocking room", room_id=selected_room_id)
             
             import time
             temp_booking_id = f"temp_{int(time.time())}"
             
             url = f"{self.services_base_url}:5002/api/rooms/{selected_room_id}/block"
-            response = requests.post(url, json={
+            response = resilience.post("rooms", url, json={
                 "room_id": selected_room_id,
                 "booking_id": temp_booking_id
             })
@@ -122,129 +143,140 @@ class HotelServiceWorker:
             
             return {"room_blocked": True}
         
-        @self.worker.task(task_type="create-booking")
-        async def create_booking(job: Job, client_id: int, selected_room_id: int, check_in: str, check_out: str) -> Dict[str, Any]:
+        @self.worker.task(task_type="create-booking", outputs=["booking_id", "total_amount"])
+        async def create_booking(job: Job, client_id: int, selected_room_id: int, check_in: str, check_out: str,
+                                 guests: int = 1) -> Dict[str, Any]:
             """Create booking record"""
-            print(f"[Zeebe] Creating Booking...")
+            log.info("creating booking", room_id=selected_room_id)
+            quote_url = f"{self.services_base_url}:5002/api/rooms/{selected_room_id}/quote"
+            quote_resp = resilience.get("rooms", quote_url, params={
+                "check_in": check_in, "check_out": check_out, "guests": guests
+            })
+            quote_resp.raise_for_status()
+            quote = resilience.json_body(quote_resp)
+            total_amount = float(quote["total"])
+
             booking_data = {
                 "client_id": client_id,
                 "room_id": selected_room_id,
+                "room_type": quote["type"],
                 "check_in": check_in,
                 "check_out": check_out,
-                "guests": 1
+                "guests": guests,
+                "total_amount": total_amount
             }
             
             url = f"{self.services_base_url}:5001/api/booking/create"
-            response = requests.post(url, json=booking_data)
+            response = resilience.post("booking", url, json=booking_data, headers=idempotency_headers(job))
             response.raise_for_status()
             
-            result = response.json()
+            result = resilience.json_body(response)
             booking_id = result.get("booking_id")
-            print(f" >>> BOOKING CONFIRMED: ID {booking_id} <<<")
+            log.info("booking confirmed", booking_id=booking_id, total_amount=total_amount)
             
             return {
                 "booking_id": booking_id,
-                "status": "confirmed"
+                "status": "confirmed",
+                "total_amount": total_amount
             }
 
         # --- NEW: Payment Handler ---
-        @self.worker.task(task_type="process-payment")
-        async def process_payment(job: Job, booking_id: int, email: str) -> Dict[str, Any]:
+        @self.worker.task(task_type="process-payment", outputs=["payment_id", "payment_status"])
+        async def process_payment(job: Job, booking_id: int, email: str, total_amount: float) -> Dict[str, Any]:
             """Process payment for the booking"""
-            print(f"[Zeebe] Processing Payment for Booking {booking_id}...")
+            log.info("processing payment", booking_id=booking_id, amount=total_amount)
             
             # Using port 5005 for Payment Service
             url = f"{self.services_base_url}:5005/api/payments/process"
             
             payment_payload = {
                 "booking_id": booking_id,
-                "amount": 150.0, # Hardcoded for demo
+                "amount": total_amount,
                 "currency": "USD",
                 "client_email": email
             }
 
             try:
-                response = requests.post(url, json=payment_payload)
+                response = resilience.post("payment", url, json=payment_payload, headers=idempotency_headers(job))
                 response.raise_for_status()
-                data = response.json()
-                print(f" >>> PAYMENT SUCCESS: {data.get('payment_id')} <<<")
+                data = resilience.json_body(response)
+                log.info("payment succeeded", payment_id=data.get('payment_id'))
                 return {"payment_id": data.get("payment_id"), "payment_status": "PAID"}
+            except (DependencyUnavailableError, DeadlineExceeded):
+                raise
             except Exception as e:
                 # If payment fails, throw error so Zeebe can handle retries or incidents
                 raise Exception(f"Payment Failed: {str(e)}")
 
         # --- NEW: Accounting Handler ---
-        @self.worker.task(task_type="generate-accounting")
-        async def generate_accounting(job: Job, booking_id: int, payment_id: int) -> Dict[str, Any]:
+        @self.worker.task(task_type="generate-accounting", outputs=["invoice_id"])
+        async def generate_accounting(job: Job, booking_id: int, payment_id: int, total_amount: float) -> Dict[str, Any]:
             """Generate Invoice"""
-            print(f"[Zeebe] Generating Invoice for Payment {payment_id}...")
+            log.info("generating invoice", payment_id=payment_id)
             
             # Using port 5006 for Accounting Service
             url = f"{self.services_base_url}:5006/api/invoices/create"
             
             invoice_payload = {
                 "booking_id": booking_id,
-                "payment_id": payment_id
+                "payment_id": payment_id,
+                "total_amount": total_amount
             }
 
-            response = requests.post(url, json=invoice_payload)
+            response = resilience.post("accounting", url, json=invoice_payload, headers=idempotency_headers(job))
             response.raise_for_status()
-            data = response.json()
+            data = resilience.json_body(response)
             
-            print(f" >>> INVOICE GENERATED: {data.get('invoice_id')} <<<")
+            log.info("invoice generated", invoice_id=data.get('invoice_id'))
             
             # Trigger ESB sync to HQ (Central DB + SAP)
             try:
                 esb_url = f"{self.services_base_url}:8280/api/v1/finance/transaction"
                 sync_payload = {
                     "booking_id": booking_id,
-                    "amount": 150.0,
-                    "date": "2024-01-15",
+                    "amount": total_amount,
+                    "date": date.today().isoformat(),
                     "invoice_id": data.get("invoice_id")
                 }
-                requests.post(esb_url, json=sync_payload, timeout=5)
-                print(f" >>> ESB SYNC: Pushed to HQ <<<")
+                resilience.post("esb", esb_url, json=sync_payload, timeout=ESB_PUSH_TIMEOUT)
+                log.info("transaction pushed to HQ")
+            except DeadlineExceeded:
+                raise
             except Exception as e:
-                print(f" >>> ESB SYNC: Failed (non-blocking) - {e} <<<")
+                log.warning("HQ transaction push failed (non-blocking)", error=str(e))
             
             return {"invoice_id": data.get("invoice_id")}
 
         # --- NEW: ESB Data Sync Handler (for manual sync triggers) ---
-        @self.worker.task(task_type="sync-to-hq")
+        @self.worker.task(task_type="sync-to-hq", outputs=["synced"])
         async def sync_to_hq(job: Job, booking_id: str, client_id: str) -> Dict[str, Any]:
             """Sync data to HQ via ESB"""
-            print(f"[Zeebe] Syncing to HQ via ESB...")
+            log.info("syncing guest profile to HQ", client_id=client_id)
             
             esb_url = f"{self.services_base_url}:8280/api/v1/sync/guest-profile"
             
             try:
-                response = requests.post(esb_url, json={
+                response = resilience.post("esb", esb_url, json={
                     "client_id": client_id,
                     "booking_id": booking_id,
                     "branch": "SOUSSE"
-                }, timeout=10)
+                })
                 response.raise_for_status()
-                print(f" >>> HQ SYNC COMPLETE <<<")
+                log.info("HQ sync complete")
                 return {"synced": True}
+            except DeadlineExceeded:
+                raise
             except Exception as e:
-                print(f" >>> HQ SYNC FAILED: {e} <<<")
+                log.warning("HQ sync failed", error=str(e))
                 return {"synced": False, "error": str(e)}
 
     
     async def run(self):
-        """Start the worker"""
-        print("Zeebe Job Worker started...")
-        print("Registered task types:")
-        print("  - validate-input")
-        print("  - search-client")
-        print("  - create-client")
-        print("  - check-room-availability")
-        print("  - block-room")
-        print("  - create-booking")
-        print("  - process-payment")
-        print("  - generate-accounting")
-        print("  - sync-to-hq (ESB integration)")
-        await self.worker.work()
+        """Start the worker; returns once a SIGTERM/Ctrl+C drain has finished"""
+        if self.metrics_port:
+            start_metrics_server(self.metrics_port)
+        log.info("zeebe job worker started", task_types=[task.type for task in self.worker.tasks])
+        await self.worker.serve()
 
 
 if __name__ == "__main__":
@@ -255,5 +287,6 @@ if __name__ == "__main__":
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         loop.run_until_complete(worker.run())
+        print("\nWorker stopped.")
     except KeyboardInterrupt:
         print("\nStopping worker...")
\ No newline at end of file